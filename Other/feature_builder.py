@@ -0,0 +1,163 @@
+import os
+import sys
+import logging
+import argparse
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # repo root, for the shared modules
+from asof_join import asof_join
+from cache_manager import content_key
+from columnar_cache import ColumnarStore, write_columnar
+from data_loader import MarketDataLoader
+
+FEATURES = [
+    'bidVolume', 'bidPrice', 'askVolume', 'askPrice',
+    'price', 'volume', 'bid_ask_spread', 'volume_imbalance'
+]
+TARGET = 'next_price'
+FEATURE_VERSION = 1  # bump whenever engineer_features changes, old shards then stop matching
+PERIODS = [f"Period{i}" for i in range(1, 16)]  # same periods 1-15 the model was trained on
+STOCKS = ['A', 'B', 'C', 'D', 'E']
+
+_worker_loader: Optional[MarketDataLoader] = None
+
+
+def engineer_features(market_data: pd.DataFrame, trade_data: pd.DataFrame) -> pd.DataFrame:
+    """Same features and target as model.preprocess_data, for one (period, stock) session."""
+    merged = asof_join(market_data, trade_data, on='timestamp', direction='nearest')
+    merged['bid_ask_spread'] = merged['askPrice'] - merged['bidPrice']
+    merged['volume_imbalance'] = merged['bidVolume'] - merged['askVolume']
+    merged[TARGET] = merged['price'].shift(-1)
+    return merged[FEATURES + [TARGET]].dropna().reset_index(drop=True)
+
+
+def _init_worker(cache_dir: Optional[str]) -> None:
+    # one loader per worker process, like batch_backtest
+    global _worker_loader
+    _worker_loader = MarketDataLoader(cache_dir=cache_dir)
+
+
+def shard_key(data_dir: str, stock: str) -> str:
+    """Content key of a session's CSVs plus the feature definition, so any change to either gives a new shard."""
+    files = sorted(Path(data_dir).glob(f"market_data_{stock}*.csv")) + [Path(data_dir) / f"trade_data_{stock}.csv"]
+    salt = f"v{FEATURE_VERSION}|{','.join(FEATURES)}|{TARGET}"
+    return content_key(files, salt)
+
+
+def build_shard(base_dir: str, shard_dir: str, period: str, stock: str,
+                cache_dir: Optional[str] = None) -> Tuple[str, str, Optional[Path], bool]:
+    """Engineer one (period, stock) and write it as a columnar shard (typed, one file per column).
+
+    Returns (period, stock, shard path or None, whether it had to be built).
+    """
+    data_dir = os.path.join(base_dir, period, stock)
+    path = Path(shard_dir) / f"{period}_{stock}_{shard_key(data_dir, stock)}"
+    if ColumnarStore.exists(path):
+        return period, stock, path, False
+
+    loader = _worker_loader if _worker_loader is not None else MarketDataLoader(cache_dir=cache_dir)
+    market_data = loader.load_market_data(data_dir, stock)
+    trade_data = loader.load_trade_data(data_dir, stock)
+    if market_data is None or market_data.empty or trade_data is None or trade_data.empty:
+        return period, stock, None, False
+
+    write_columnar(engineer_features(market_data, trade_data), path)
+    return period, stock, path, True
+
+
+def find_sessions(base_dir: str, periods: List[str], stocks: List[str]) -> List[Tuple[str, str]]:
+    """(period, stock) pairs that have both feeds."""
+    sessions = []
+    for period in periods:
+        for stock in stocks:
+            data_dir = Path(base_dir) / period / stock
+            if any(data_dir.glob(f"market_data_{stock}*.csv")) and (data_dir / f"trade_data_{stock}.csv").exists():
+                sessions.append((period, stock))
+    return sessions
+
+
+def build_feature_shards(base_dir: str, shard_dir: str, periods: Optional[List[str]] = None,
+                         stocks: Optional[List[str]] = None, max_workers: Optional[int] = None,
+                         cache_dir: Optional[str] = None) -> Dict[Tuple[str, str], Path]:
+    """Make sure every session has an up to date shard, building the missing ones in a process pool."""
+    Path(shard_dir).mkdir(parents=True, exist_ok=True)
+    sessions = find_sessions(base_dir, periods or PERIODS, stocks or STOCKS)
+    shards = {}
+    todo = []
+    for period, stock in sessions:
+        path = Path(shard_dir) / f"{period}_{stock}_{shard_key(os.path.join(base_dir, period, stock), stock)}"
+        if ColumnarStore.exists(path):
+            shards[(period, stock)] = path
+        else:
+            todo.append((period, stock))
+    print(f"{len(shards)} feature shards cached, {len(todo)} to build")
+
+    if todo:
+        with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count(),
+                                 initializer=_init_worker, initargs=(cache_dir,)) as executor:
+            futures = [executor.submit(build_shard, base_dir, shard_dir, period, stock) for period, stock in todo]
+            for future in as_completed(futures):
+                try:
+                    period, stock, path, _ = future.result()
+                except Exception as e:
+                    logging.error(f"Feature shard failed: {e}")
+                    continue
+                if path is not None:
+                    shards[(period, stock)] = path
+
+    return dict(sorted(shards.items()))
+
+
+def load_feature_matrix(shards: Dict[Tuple[str, str], Path],
+                        features: Optional[List[str]] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """X (rows x features) and y, copied straight out of the memory-mapped shards into one preallocated array.
+
+    X is float32, the precision the prices are loaded in and what the random forest
+    converts to internally anyway.
+    """
+    features = features or FEATURES
+    stores = [ColumnarStore(path) for path in shards.values()]
+    n_rows = sum(len(store) for store in stores)
+    X = np.empty((n_rows, len(features)), dtype=np.float32)
+    y = np.empty(n_rows, dtype=np.float64)
+    offset = 0
+    for store in stores:
+        rows = slice(offset, offset + len(store))
+        for j, name in enumerate(features):
+            X[rows, j] = store.column(name)
+        y[rows] = store.column(TARGET)
+        offset += len(store)
+    return X, y
+
+
+def load_training_frame(base_dir: str, shard_dir: str = './feature_cache', **kwargs) -> pd.DataFrame:
+    """Features + target of every session as one frame, the drop-in for load_trading_data + preprocess_data."""
+    shards = build_feature_shards(base_dir, shard_dir, **kwargs)
+    X, y = load_feature_matrix(shards)
+    frame = pd.DataFrame(X, columns=FEATURES, copy=False)
+    frame[TARGET] = y
+    return frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build (or refresh) the cached per-session feature shards")
+    parser.add_argument('--data-dir', default=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'TrainingData'))
+    parser.add_argument('--shard-dir', default='./feature_cache')
+    parser.add_argument('--cache-dir', default=None, help="market/trade data cache for the loaders")
+    parser.add_argument('--periods', nargs='*')
+    parser.add_argument('--stocks', nargs='*')
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    shards = build_feature_shards(args.data_dir, args.shard_dir, args.periods, args.stocks,
+                                  args.workers, args.cache_dir)
+    X, y = load_feature_matrix(shards)
+    print(f"{len(shards)} shards, X {X.shape}, y {y.shape}")
+
+
+if __name__ == '__main__':
+    main()
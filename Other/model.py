@@ -6,8 +6,14 @@ from sklearn.ensemble import RandomForestRegressor
 from sklearn.metrics import mean_squared_error
 import glob
 import os
+import sys
 import joblib
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # repo root, for the shared modules
+from asof_join import asof_join_grouped
+from feature_builder import load_training_frame
+from model_server import get_predictor
+
 
 def save_model(results, output_dir='./models'):
     """
@@ -32,31 +38,9 @@ def save_model(results, output_dir='./models'):
     print(f"Scaler saved to: {scaler_path}")
 
 def load_model_and_predict(market_data):
-    """Load saved model and predict on market data"""
+    """Predict on market data with the saved model, loaded once and kept warm (see model_server)"""
     try:
-        # Load model and scaler
-        model = joblib.load('./models/stock_prediction_model.joblib')
-        scaler = joblib.load('./models/feature_scaler.joblib')
-        
-        # Prepare features like in training
-        X = pd.DataFrame()
-        X['bidVolume'] = market_data['bidVolume']
-        X['bidPrice'] = market_data['bidPrice'] 
-        X['askVolume'] = market_data['askVolume']
-        X['askPrice'] = market_data['askPrice']
-        X['price'] = (market_data['bidPrice'] + market_data['askPrice']) / 2  # Mid price
-        X['volume'] = market_data['bidVolume'] + market_data['askVolume']  # Total volume
-        X['bid_ask_spread'] = market_data['askPrice'] - market_data['bidPrice']
-        X['volume_imbalance'] = market_data['bidVolume'] - market_data['askVolume']
-        
-        # Scale features
-        X_scaled = scaler.transform(X)
-        
-        # Make predictions
-        predictions = model.predict(X_scaled)
-        
-        return predictions
-        
+        return get_predictor('./models').predict(market_data)
     except Exception as e:
         print(f"Error in prediction: {str(e)}")
 
@@ -111,6 +95,23 @@ def load_trading_data(base_path):
     
     return market_data, trade_data
 
+def load_feature_data(base_path, shard_dir='./feature_cache'):
+    """
+    Cached, parallel replacement for load_trading_data + preprocess_data
+
+    Features are built per (period, location) in a process pool and cached as
+    typed shards, so re-running with unchanged data and features skips all CSV
+    parsing and feature engineering.
+
+    Args:
+        base_path (str): Base directory containing trading data
+        shard_dir (str): Where the feature shards are cached
+
+    Returns:
+        pd.DataFrame: Features and next_price target, ready for train_price_prediction_model
+    """
+    return load_training_frame(base_path, shard_dir)
+
 def preprocess_data(market_data, trade_data):
     """
     Preprocess and merge market and trade data
@@ -127,11 +128,12 @@ def preprocess_data(market_data, trade_data):
     market_data['timestamp'] = pd.to_datetime(market_data['timestamp'], format='%H:%M:%S.%f', errors='coerce')
     trade_data['timestamp'] = pd.to_datetime(trade_data['timestamp'], format='%H:%M:%S.%f', errors='coerce')
     
-    # Merge data based on timestamp
-    merged_data = pd.merge_asof(
-        market_data.sort_values('timestamp'), 
-        trade_data.sort_values('timestamp'),
-        on='timestamp', 
+    # Merge data based on timestamp, per (period, location) session so ticks never get matched across sessions
+    merged_data = asof_join_grouped(
+        market_data,
+        trade_data,
+        by=['period', 'location'],
+        on='timestamp',
         direction='nearest'
     )
     
@@ -139,8 +141,8 @@ def preprocess_data(market_data, trade_data):
     merged_data['bid_ask_spread'] = merged_data['askPrice'] - merged_data['bidPrice']
     merged_data['volume_imbalance'] = merged_data['bidVolume'] - merged_data['askVolume']
     
-    # Create target variable (next microsecond price)
-    merged_data['next_price'] = merged_data['price'].shift(-1)
+    # Create target variable (next microsecond price), within the session
+    merged_data['next_price'] = merged_data.groupby(['period', 'location'])['price'].shift(-1)
     
     # Drop rows with NaN
     merged_data.dropna(inplace=True)
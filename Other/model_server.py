@@ -0,0 +1,264 @@
+import os
+import json
+import queue
+import socket
+import struct
+import argparse
+import threading
+import socketserver
+import numpy as np
+import pandas as pd
+import joblib
+from concurrent.futures import Future
+from typing import List, Optional, Sequence
+
+# same features load_model_and_predict always built, in the order the scaler was fit on
+FEATURES = [
+    'bidVolume', 'bidPrice', 'askVolume', 'askPrice',
+    'price', 'volume', 'bid_ask_spread', 'volume_imbalance'
+]
+RAW_COLUMNS = ['bidVolume', 'bidPrice', 'askVolume', 'askPrice']  # all the features derive from these
+DEFAULT_SOCKET = '/tmp/stock_overflow_model.sock'
+
+_HEADER = struct.Struct('<q')  # row count, -1 on the reply means an error message follows
+
+_predictors = {}  # model_dir -> ModelPredictor, loaded once per process
+
+
+class ModelPredictor:
+    """Warm model + scaler, loaded once, that predicts straight from market data.
+
+    Features go into a reused float32 buffer and get scaled in place, so a call
+    allocates nothing but the predictions themselves.
+    """
+
+    def __init__(self, model, scaler):
+        self.model = model
+        self.scaler = scaler
+        self._buffer = np.empty((0, len(FEATURES)), dtype=np.float32)
+        self._lock = threading.Lock()  # the buffer is shared, one predict at a time
+        # StandardScaler as plain arrays, so scaling works in place on float32
+        mean = getattr(scaler, 'mean_', None)
+        scale = getattr(scaler, 'scale_', None)
+        self._mean = None if mean is None else np.asarray(mean, dtype=np.float32)
+        self._scale = None if scale is None else np.asarray(scale, dtype=np.float32)
+
+    @classmethod
+    def load(cls, model_dir: str = './models', mmap: bool = True) -> 'ModelPredictor':
+        """Load the saved model and scaler; with mmap the forest's big node arrays stay on disk, shared between processes."""
+        mmap_mode = 'r' if mmap else None
+        model = joblib.load(os.path.join(model_dir, 'stock_prediction_model.joblib'), mmap_mode=mmap_mode)
+        scaler = joblib.load(os.path.join(model_dir, 'feature_scaler.joblib'))
+        return cls(model, scaler)
+
+    def build_features(self, raw: np.ndarray) -> np.ndarray:
+        """(n, 4) bid/ask volumes and prices -> scaled (n, 8) float32 features, a view of the shared buffer."""
+        n = len(raw)
+        if len(self._buffer) < n:
+            self._buffer = np.empty((max(n, 2 * len(self._buffer)), len(FEATURES)), dtype=np.float32)
+        X = self._buffer[:n]
+
+        bid_volume, bid_price, ask_volume, ask_price = (raw[:, i] for i in range(4))
+        X[:, 0] = bid_volume
+        X[:, 1] = bid_price
+        X[:, 2] = ask_volume
+        X[:, 3] = ask_price
+        np.add(bid_price, ask_price, out=X[:, 4])
+        X[:, 4] *= 0.5  # mid price
+        np.add(bid_volume, ask_volume, out=X[:, 5])  # total volume
+        np.subtract(ask_price, bid_price, out=X[:, 6])  # spread
+        np.subtract(bid_volume, ask_volume, out=X[:, 7])  # imbalance
+
+        if self._mean is not None and self._scale is not None:
+            X -= self._mean
+            X /= self._scale
+        else:
+            X[:] = self.scaler.transform(X)
+        return X
+
+    def predict_raw(self, raw: np.ndarray) -> np.ndarray:
+        with self._lock:
+            return np.asarray(self.model.predict(self.build_features(raw)), dtype=np.float64)
+
+    def predict(self, market_data: pd.DataFrame) -> np.ndarray:
+        return self.predict_raw(raw_columns(market_data))
+
+    def predict_batch(self, frames: Sequence[pd.DataFrame]) -> List[np.ndarray]:
+        """One model call for several frames, split back per frame."""
+        raws = [raw_columns(frame) for frame in frames]
+        predictions = self.predict_raw(np.concatenate(raws)) if raws else np.empty(0)
+        return np.split(predictions, np.cumsum([len(raw) for raw in raws])[:-1])
+
+
+def get_predictor(model_dir: str = './models', mmap: bool = True) -> ModelPredictor:
+    """The process-wide warm predictor for `model_dir`, loaded on first use."""
+    key = os.path.abspath(model_dir)
+    if key not in _predictors:
+        _predictors[key] = ModelPredictor.load(model_dir, mmap)
+    return _predictors[key]
+
+
+def raw_columns(market_data: pd.DataFrame) -> np.ndarray:
+    raw = np.empty((len(market_data), len(RAW_COLUMNS)), dtype=np.float32)
+    for i, col in enumerate(RAW_COLUMNS):
+        raw[:, i] = market_data[col].to_numpy()
+    return raw
+
+
+class MicroBatcher:
+    """Coalesces concurrent predict requests into one model call.
+
+    A background thread waits for the first request, then keeps collecting for
+    up to `max_wait` seconds or `max_rows` rows, predicts them together and
+    resolves every request's Future with its own slice.
+    """
+
+    def __init__(self, predictor: ModelPredictor, max_rows: int = 65536, max_wait: float = 0.002):
+        self.predictor = predictor
+        self.max_rows = max_rows
+        self.max_wait = max_wait
+        self._queue: 'queue.Queue' = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, raw: np.ndarray) -> Future:
+        future = Future()
+        self._queue.put((raw, future))
+        return future
+
+    def predict(self, raw: np.ndarray) -> np.ndarray:
+        return self.submit(raw).result()
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            rows = len(item[0])
+            while rows < self.max_rows:
+                try:
+                    item = self._queue.get(timeout=self.max_wait)
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)  # finish this batch first, stop on the next loop
+                    break
+                batch.append(item)
+                rows += len(item[0])
+            self._predict(batch)
+
+    def _predict(self, batch) -> None:
+        try:
+            predictions = self.predictor.predict_raw(np.concatenate([raw for raw, _ in batch]))
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        offset = 0
+        for raw, future in batch:
+            future.set_result(predictions[offset:offset + len(raw)])
+            offset += len(raw)
+
+
+def _recv_exact(sock: socket.socket, n: int) -> bytes:
+    data = bytearray()
+    while len(data) < n:
+        part = sock.recv(n - len(data))
+        if not part:
+            raise ConnectionError("connection closed mid-message")
+        data += part
+    return bytes(data)
+
+
+class _RequestHandler(socketserver.BaseRequestHandler):
+    # request: row count + (n, 4) float32 raw columns, reply: row count + n float64 predictions
+    def handle(self):
+        while True:
+            try:
+                (n,) = _HEADER.unpack(_recv_exact(self.request, _HEADER.size))
+            except ConnectionError:
+                return
+            raw = np.frombuffer(_recv_exact(self.request, n * len(RAW_COLUMNS) * 4), dtype=np.float32)
+            try:
+                predictions = self.server.batcher.predict(raw.reshape(n, len(RAW_COLUMNS)))
+                self.request.sendall(_HEADER.pack(len(predictions)) + predictions.astype('<f8').tobytes())
+            except Exception as e:
+                message = json.dumps({'error': str(e)}).encode()
+                self.request.sendall(_HEADER.pack(-1) + struct.pack('<i', len(message)) + message)
+
+
+class ModelServer(socketserver.ThreadingUnixStreamServer):
+    """Local Unix-socket front end so the viewer and backtests share one warm model.
+
+    Every connection gets a thread, all of them feed the same MicroBatcher.
+    """
+    daemon_threads = True
+
+    def __init__(self, predictor: ModelPredictor, socket_path: str = DEFAULT_SOCKET, **batch_options):
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        self.batcher = MicroBatcher(predictor, **batch_options)
+        super().__init__(socket_path, _RequestHandler)
+
+    def server_close(self):
+        super().server_close()
+        self.batcher.close()
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+
+
+class ModelClient:
+    """Talks to a ModelServer, one persistent connection."""
+
+    def __init__(self, socket_path: str = DEFAULT_SOCKET):
+        self.socket_path = socket_path
+        self._sock: Optional[socket.socket] = None
+
+    def _connect(self) -> socket.socket:
+        if self._sock is None:
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._sock.connect(self.socket_path)
+        return self._sock
+
+    def predict(self, market_data: pd.DataFrame) -> np.ndarray:
+        raw = raw_columns(market_data)
+        sock = self._connect()
+        sock.sendall(_HEADER.pack(len(raw)) + raw.astype('<f4').tobytes())
+        (n,) = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+        if n < 0:
+            (length,) = struct.unpack('<i', _recv_exact(sock, 4))
+            raise RuntimeError(json.loads(_recv_exact(sock, length))['error'])
+        return np.frombuffer(_recv_exact(sock, n * 8), dtype='<f8')
+
+    def close(self) -> None:
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the price prediction model over a local Unix socket")
+    parser.add_argument('--model-dir', default='./models')
+    parser.add_argument('--socket', default=DEFAULT_SOCKET)
+    parser.add_argument('--no-mmap', action='store_true', help="load the forest into memory instead of mapping it")
+    parser.add_argument('--max-batch-rows', type=int, default=65536)
+    parser.add_argument('--max-wait-ms', type=float, default=2.0)
+    args = parser.parse_args()
+
+    predictor = ModelPredictor.load(args.model_dir, mmap=not args.no_mmap)
+    with ModelServer(predictor, args.socket, max_rows=args.max_batch_rows,
+                     max_wait=args.max_wait_ms / 1000) as server:
+        print(f"Serving model from {args.model_dir} on {args.socket}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()
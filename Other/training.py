@@ -1,34 +1,43 @@
 import pandas as pd
 import numpy as np
-from scipy.stats import linregress
+import os
+import sys
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # repo root, for the shared modules
+from rolling_stats import IndicatorSpec, indicator_block, rolling_linregress
 
-def calculate_technical_indicators(df):
-    """Calculate technical indicators for prediction"""
-    df = df.copy()
-    
+
+WINDOWS = [5, 10, 20, 50]
+# per window: bollinger style bands on the mid price, momentum, and volatility of its tick changes
+INDICATORS = [
+    spec for window in WINDOWS for spec in (
+        IndicatorSpec(f'ma_{window}', 'mean', 'mid_price', window),
+        IndicatorSpec(f'std_{window}', 'std', 'mid_price', window),
+        IndicatorSpec(f'upper_band_{window}', 'upper_band', 'mid_price', window),
+        IndicatorSpec(f'lower_band_{window}', 'lower_band', 'mid_price', window),
+        IndicatorSpec(f'momentum_{window}', 'momentum', 'mid_price', window),
+        IndicatorSpec(f'roc_{window}', 'roc', 'mid_price', window),
+        IndicatorSpec(f'volatility_{window}', 'std', 'price_change', window),
+    )
+]
+
+
+def calculate_technical_indicators(df, indicators=INDICATORS):
+    """Calculate technical indicators for prediction, all windows in one float32 block"""
     # Basic price features
-    df['mid_price'] = (df['bidPrice'] + df['askPrice']) / 2
-    df['spread'] = df['askPrice'] - df['bidPrice']
-    df['price_change'] = df['mid_price'].diff()
+    mid_price = (df['bidPrice'] + df['askPrice']) / 2
+    price_change = mid_price.diff()
+    base = pd.DataFrame({
+        'mid_price': mid_price,
+        'spread': df['askPrice'] - df['bidPrice'],
+        'price_change': price_change,
+    }, index=df.index)
     
     # Rolling statistics
-    windows = [5, 10, 20, 50]
-    for window in windows:
-        # Price-based indicators
-        df[f'ma_{window}'] = df['mid_price'].rolling(window=window).mean()
-        df[f'std_{window}'] = df['mid_price'].rolling(window=window).std()
-        df[f'upper_band_{window}'] = df[f'ma_{window}'] + (df[f'std_{window}'] * 2)
-        df[f'lower_band_{window}'] = df[f'ma_{window}'] - (df[f'std_{window}'] * 2)
-        
-        # Momentum indicators
-        df[f'momentum_{window}'] = df['mid_price'].diff(window)
-        df[f'roc_{window}'] = df['mid_price'].pct_change(window) * 100
-        
-        # Volatility indicators
-        df[f'volatility_{window}'] = df['price_change'].rolling(window=window).std()
-        
-    return df
+    block = indicator_block({'mid_price': mid_price.to_numpy(), 'price_change': price_change.to_numpy()}, indicators)
+    rolling = pd.DataFrame(block, columns=[spec.column for spec in indicators], index=df.index, copy=False)
+    df = df.drop(columns=[*base.columns, *rolling.columns], errors='ignore')  # recomputed, like reassigning them would
+    return pd.concat([df, base, rolling], axis=1)
 
 def predict_price_changes(market_data):
     """
@@ -42,19 +51,11 @@ def predict_price_changes(market_data):
         # Prepare data
         df = calculate_technical_indicators(market_data)
         
-        # Linear regression on recent price trend
+        # Linear regression on the previous 20 mid prices, projected one step ahead
         window_size = 20
-        df['predicted_price'] = np.nan
-        
-        for i in range(window_size, len(df)):
-            y = df['mid_price'].iloc[i-window_size:i].values
-            X = np.arange(window_size).reshape(-1, 1)
-            
-            slope, intercept, _, _, _ = linregress(X.flatten(), y)
-            next_point = window_size
-            prediction = slope * next_point + intercept
-            
-            df.iloc[i, df.columns.get_loc('predicted_price')] = prediction
+        fit = rolling_linregress(df['mid_price'].to_numpy(), window_size)
+        # fit i covers rows i-19..i, so it's the prediction for row i+1
+        df['predicted_price'] = pd.Series(fit.prediction, index=df.index).shift(1)
         
         # Add confidence bands
         df['prediction_std'] = df['std_20']
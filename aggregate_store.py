@@ -0,0 +1,258 @@
+import os
+import json
+import shutil
+import logging
+import tempfile
+import threading
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from cache_manager import fingerprint_file
+from columnar_cache import ColumnarStore, swap_into, write_columnar
+from data_loader import MarketDataLoader
+
+RESOLUTIONS = {'1s': 1_000_000_000, '10s': 10_000_000_000, '1m': 60_000_000_000}  # bar name -> width in ns
+FEEDS = ('market', 'trade')
+AGGREGATE_VERSION = 1  # bump when the bar columns or rules change, old entries then get rebuilt
+STATE_NAME = 'state.json'
+
+# how each bar column combines when bars get merged or rolled up into wider ones;
+# first/last pick the value of the bar with the earliest first_time / latest last_time
+_COMMON_RULES = {
+    'first_time': 'min', 'last_time': 'max',
+    'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last',
+}
+RULES = {
+    'market': {  # OHLC of the mid price, plus the raw bid/ask extremes, spread and volumes
+        **_COMMON_RULES,
+        'bid_low': 'min', 'bid_high': 'max', 'ask_low': 'min', 'ask_high': 'max',
+        'spread_min': 'min', 'spread_max': 'max', 'spread_sum': 'sum',
+        'ticks': 'sum', 'bid_volume': 'sum', 'ask_volume': 'sum',
+    },
+    'trade': {  # OHLC of the trade price, vwap = notional / volume
+        **_COMMON_RULES,
+        'trades': 'sum', 'volume': 'sum', 'notional': 'sum',
+    },
+}
+
+
+def _tick_bars(chunk: pd.DataFrame, feed: str) -> pd.DataFrame:
+    """Every tick as a one-tick bar, so ticks and bars go through the same rollup."""
+    times = chunk['timestamp'].to_numpy()
+    if feed == 'market':
+        bid = chunk['bidPrice'].to_numpy(dtype=np.float64)
+        ask = chunk['askPrice'].to_numpy(dtype=np.float64)
+        mid = (bid + ask) / 2
+        spread = ask - bid
+        return pd.DataFrame({
+            'time': times, 'first_time': times, 'last_time': times,
+            'open': mid, 'high': mid, 'low': mid, 'close': mid,
+            'bid_low': bid, 'bid_high': bid, 'ask_low': ask, 'ask_high': ask,
+            'spread_min': spread, 'spread_max': spread, 'spread_sum': spread,
+            'ticks': np.ones(len(chunk), dtype=np.int64),
+            'bid_volume': chunk['bidVolume'].to_numpy(dtype=np.int64),
+            'ask_volume': chunk['askVolume'].to_numpy(dtype=np.int64),
+        })
+    price = chunk['price'].to_numpy(dtype=np.float64)
+    volume = chunk['volume'].to_numpy(dtype=np.int64)
+    return pd.DataFrame({
+        'time': times, 'first_time': times, 'last_time': times,
+        'open': price, 'high': price, 'low': price, 'close': price,
+        'trades': np.ones(len(chunk), dtype=np.int64), 'volume': volume, 'notional': price * volume,
+    })
+
+
+def _empty_bars(feed: str) -> pd.DataFrame:
+    empty = pd.DataFrame({'timestamp': np.empty(0, dtype='datetime64[ns]')})
+    for column, dtype in MarketDataLoader.FEEDS[feed][1].items():
+        if column != 'timestamp':
+            empty[column] = np.empty(0, dtype=dtype)
+    return _tick_bars(empty, feed)
+
+
+def rollup(bars: pd.DataFrame, width_ns: int, feed: str) -> pd.DataFrame:
+    """Merge bars (or one-tick bars) into `width_ns` wide buckets, sorted by bucket start.
+
+    Works for bars that overlap too, e.g. the same second coming from two files:
+    open/close follow first_time/last_time, ties keep the input order.
+    """
+    rules = RULES[feed]
+    if bars.empty:
+        return bars[['time', *rules]].reset_index(drop=True)
+    start = bars['time'].to_numpy().astype('datetime64[ns]').view(np.int64)
+    bucket = (start // width_ns * width_ns).view('datetime64[ns]')
+
+    first_order = np.lexsort((bars['first_time'].to_numpy(), bucket))
+    last_order = np.lexsort((bars['last_time'].to_numpy(), bucket))
+    by_first = bars.iloc[first_order].groupby(bucket[first_order], sort=True)
+    by_last = bars.iloc[last_order].groupby(bucket[last_order], sort=True)
+
+    out = {}
+    for column, rule in rules.items():
+        grouped = by_last if rule == 'last' else by_first
+        out[column] = getattr(grouped[column], rule)().to_numpy()
+    index = np.unique(bucket)
+    return pd.DataFrame({'time': index, **out})
+
+
+class AggregateStore:
+    """Per (period, stock) OHLC bars and summaries, so overview charts never touch the ticks.
+
+    Each entry holds market and trade bars at every RESOLUTIONS width, one columnar
+    store each, plus a state file with the fingerprint of every CSV folded in. A new
+    CSV gets aggregated on its own and merged into the existing 1s bars; a CSV that
+    changed or vanished means the entry is rebuilt. Entries are written to a temp
+    directory and swapped in whole, so readers never see half an update.
+    """
+
+    def __init__(self, path, loader: Optional[MarketDataLoader] = None):
+        self.path = Path(path)
+        self.loader = loader or MarketDataLoader(cache_dir=None, memory_budget=None)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def default_path(cache_dir: Optional[str], base_dir: str) -> Path:
+        """Next to the tick cache (its own dir, so cache eviction never sweeps it), else under base_dir."""
+        if cache_dir:
+            return Path(cache_dir).resolve().parent / 'aggregates'
+        return Path(base_dir) / 'aggregates'
+
+    def entry_path(self, period: str, stock: str) -> Path:
+        return self.path / f"{period}_{stock}"
+
+    def _source_files(self, data_dir: str, stock: str, feed: str) -> List[Path]:
+        prefix = MarketDataLoader.FEEDS[feed][0]
+        try:
+            return sorted(Path(data_dir) / f for f in os.listdir(data_dir)
+                          if f.startswith(f"{prefix}_{stock}") and f.endswith('.csv'))
+        except FileNotFoundError:
+            return []
+
+    def _read_state(self, entry: Path) -> Optional[Dict]:
+        try:
+            with (entry / STATE_NAME).open('r') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return state if state.get('version') == AGGREGATE_VERSION else None
+
+    @staticmethod
+    def _file_record(path: Path, known: Optional[Dict] = None) -> Dict:
+        stat = path.stat()
+        if known and known['size'] == stat.st_size and known['mtime_ns'] == stat.st_mtime_ns:
+            return known
+        return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'fingerprint': fingerprint_file(path)}
+
+    def update(self, data_dir: str, period: str, stock: str) -> Optional[Path]:
+        """Bring the entry up to date with the CSVs in `data_dir`, None if there are none."""
+        with self._lock:
+            entry = self.entry_path(period, stock)
+            state = self._read_state(entry)
+            known = state['files'] if state else {feed: {} for feed in FEEDS}
+
+            files = {feed: {p.name: self._file_record(p, known[feed].get(p.name))
+                            for p in self._source_files(data_dir, stock, feed)} for feed in FEEDS}
+            if not any(files.values()):
+                return None
+
+            rebuild = state is None or any(
+                name not in files[feed] or files[feed][name]['fingerprint'] != record['fingerprint']
+                for feed in FEEDS for name, record in known[feed].items()
+            ) or not all(ColumnarStore.exists(entry / f"{feed}_1s") for feed in FEEDS)
+            new = {feed: [name for name in files[feed] if rebuild or name not in known[feed]] for feed in FEEDS}
+            if not any(new.values()):
+                if files != known:  # only mtimes moved, remember them so the next check skips fingerprinting
+                    self._write_state(entry, files)
+                return entry
+
+            bars = {}
+            for feed in FEEDS:
+                parts = [] if rebuild else [ColumnarStore(entry / f"{feed}_1s").to_frame()]
+                for name in new[feed]:
+                    for chunk in self.loader.read_file_chunks(Path(data_dir) / name, feed):
+                        parts.append(rollup(_tick_bars(chunk, feed), RESOLUTIONS['1s'], feed))
+                parts = [part for part in parts if not part.empty]
+                bars[feed] = rollup(pd.concat(parts, ignore_index=True), RESOLUTIONS['1s'], feed) \
+                    if parts else _empty_bars(feed)
+            self._write_entry(entry, bars, files)
+            return entry
+
+    def _write_state(self, entry: Path, files: Dict) -> None:
+        fd, tmp = tempfile.mkstemp(dir=entry, prefix=f"{STATE_NAME}.tmp-")
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'version': AGGREGATE_VERSION, 'files': files}, f)
+        os.replace(tmp, entry / STATE_NAME)
+
+    def _write_entry(self, entry: Path, bars: Dict[str, pd.DataFrame], files: Dict) -> None:
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        tmp = Path(tempfile.mkdtemp(dir=entry.parent, prefix=f"{entry.name}.tmp-"))  # unique per writer, see ColumnarWriter
+        try:
+            for feed, second_bars in bars.items():
+                for name, width_ns in RESOLUTIONS.items():
+                    # wider bars from the 1s ones, much cheaper than going back to the ticks
+                    resolution = second_bars if name == '1s' else rollup(second_bars, width_ns, feed)
+                    write_columnar(resolution, tmp / f"{feed}_{name}")
+            self._write_state(tmp, files)
+            swap_into(tmp, entry)
+        except Exception:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+
+    def bars(self, data_dir: str, period: str, stock: str, resolution: str = '1m', feed: str = 'market',
+             columns: Optional[List[str]] = None) -> Optional[pd.DataFrame]:
+        """Bars of one session with the derived columns (spread_mean for market, vwap for trades)."""
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"Unknown resolution {resolution!r}, expected one of {list(RESOLUTIONS)}")
+        if feed not in FEEDS:
+            raise ValueError(f"Unknown feed {feed!r}, expected one of {FEEDS}")
+        try:
+            entry = self.update(data_dir, period, stock)
+        except Exception as e:
+            logging.error(f"Error updating aggregates for {period}/{stock}: {e}")
+            return None
+        if entry is None:
+            return None
+
+        df = ColumnarStore(entry / f"{feed}_{resolution}").to_frame(columns)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            if feed == 'market' and {'spread_sum', 'ticks'} <= set(df.columns):
+                df['spread_mean'] = df['spread_sum'] / df['ticks']
+            if feed == 'trade' and {'notional', 'volume'} <= set(df.columns):
+                df['vwap'] = df['notional'] / df['volume']
+        return df
+
+    def summary(self, data_dir: str, period: str, stock: str) -> Optional[Dict]:
+        """Whole-session aggregates (min/max bid/ask, spread stats, volumes, trade vwap) from the 1m bars."""
+        market = self.bars(data_dir, period, stock, '1m', 'market')
+        if market is None:
+            return None
+        trade = self.bars(data_dir, period, stock, '1m', 'trade')
+        return summarize(market, trade)
+
+
+def summarize(market: pd.DataFrame, trade: Optional[pd.DataFrame] = None) -> Dict:
+    """Collapse market (and trade) bars of any width into one dict of session figures."""
+    summary = {}
+    if not market.empty:
+        ticks = int(market['ticks'].sum())
+        summary.update({
+            'first_time': market['first_time'].min(), 'last_time': market['last_time'].max(),
+            'open': market['open'].iloc[0], 'close': market['close'].iloc[-1],
+            'high': market['high'].max(), 'low': market['low'].min(),
+            'bid_low': market['bid_low'].min(), 'bid_high': market['bid_high'].max(),
+            'ask_low': market['ask_low'].min(), 'ask_high': market['ask_high'].max(),
+            'spread_min': market['spread_min'].min(), 'spread_max': market['spread_max'].max(),
+            'spread_mean': market['spread_sum'].sum() / ticks,
+            'ticks': ticks,
+            'bid_volume': int(market['bid_volume'].sum()), 'ask_volume': int(market['ask_volume'].sum()),
+        })
+    if trade is not None and not trade.empty:
+        volume = int(trade['volume'].sum())
+        summary.update({
+            'trades': int(trade['trades'].sum()), 'trade_volume': volume,
+            'trade_low': trade['low'].min(), 'trade_high': trade['high'].max(),
+            'vwap': trade['notional'].sum() / volume if volume else np.nan,
+        })
+    return summary
@@ -0,0 +1,222 @@
+import os
+import logging
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+
+from columnar_cache import ColumnarStore, ColumnarFrame, write_columnar
+from data_loader import MarketDataLoader
+
+DIRECTIONS = ('backward', 'forward', 'nearest')
+STOCKS = ['A', 'B', 'C', 'D', 'E']
+PERIODS = [f"Period{i}" for i in range(1, 21)]
+
+
+def _to_ns(values) -> np.ndarray:
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.datetime64):
+        return values.astype('datetime64[ns]').view(np.int64)
+    return values.astype(np.int64)
+
+
+def _tolerance_ns(tolerance) -> Optional[int]:
+    if tolerance is None:
+        return None
+    if isinstance(tolerance, (int, np.integer)):
+        return int(tolerance)
+    return int(pd.Timedelta(tolerance).value)
+
+
+def asof_positions(left_times, right_times, direction: str = 'backward', tolerance=None) -> np.ndarray:
+    """For every left time, the row of `right_times` it joins to, -1 where there is none.
+
+    Both sides must be sorted. backward takes the last right row at or before the left
+    time, forward the first one at or after it, nearest whichever is closer (backward
+    on a tie), all like pd.merge_asof. `tolerance` (Timedelta, '500ms' or int ns) caps
+    the distance, inclusive.
+
+    Matching is a binary search per left row (searchsorted), O(n log m), not a linear
+    merge walk over both sides: that would need a Python or compiled loop, while one
+    searchsorted call runs entirely in numpy and is as fast at session sizes.
+    """
+    if direction not in DIRECTIONS:
+        raise ValueError(f"Unknown direction {direction!r}, expected one of {DIRECTIONS}")
+    left = _to_ns(left_times)
+    right = _to_ns(right_times)
+    nat = np.iinfo(np.int64).min
+    n_right = len(right)
+    if n_right == 0:
+        return np.full(len(left), -1, dtype=np.int64)
+
+    if direction in ('backward', 'nearest'):
+        backward = np.searchsorted(right, left, 'right') - 1
+    if direction in ('forward', 'nearest'):
+        forward = np.searchsorted(right, left, 'left')
+
+    if direction == 'backward':
+        pos = backward
+        valid = pos >= 0
+    elif direction == 'forward':
+        pos = forward
+        valid = pos < n_right
+    else:
+        has_back = backward >= 0
+        has_fwd = forward < n_right
+        back_dist = left - right[np.maximum(backward, 0)]
+        fwd_dist = right[np.minimum(forward, n_right - 1)] - left
+        use_back = has_back & (~has_fwd | (back_dist <= fwd_dist))
+        pos = np.where(use_back, backward, forward)
+        valid = has_back | has_fwd
+
+    pos = np.where(valid, pos, 0)
+    valid &= left != nat
+    tol = _tolerance_ns(tolerance)
+    if tol is not None:
+        valid &= np.abs(left - right[pos]) <= tol
+    return np.where(valid, pos, -1).astype(np.int64)
+
+
+def _sorted_on(df: pd.DataFrame, on: str) -> pd.DataFrame:
+    times = _to_ns(df[on].to_numpy())
+    if len(times) > 1 and (np.diff(times) < 0).any():
+        return df.iloc[np.argsort(times, kind='stable')]
+    return df
+
+
+def asof_join(left: pd.DataFrame, right: pd.DataFrame, on: str = 'timestamp', direction: str = 'backward',
+              tolerance=None, suffixes: Tuple[str, str] = ('_x', '_y')) -> pd.DataFrame:
+    """As-of join of one session: every left row plus the matching right row's columns (NaN if none).
+
+    Both sides get sorted on `on` if they aren't already, rows with a missing right time are dropped.
+    """
+    left = _sorted_on(left, on).reset_index(drop=True)
+    right = right[right[on].notna()]
+    right = _sorted_on(right, on).reset_index(drop=True)
+    pos = asof_positions(left[on].to_numpy(), right[on].to_numpy(), direction, tolerance)
+
+    result = {}
+    overlap = (set(left.columns) & set(right.columns)) - {on}
+    for col in left.columns:
+        result[f"{col}{suffixes[0]}" if col in overlap else col] = left[col].to_numpy()
+    for col in right.columns:
+        if col == on:
+            continue
+        # -1 fills NaN/NaT, ints get promoted to float64 like merge_asof does
+        values = pd.api.extensions.take(right[col].to_numpy(), pos, allow_fill=True)
+        result[f"{col}{suffixes[1]}" if col in overlap else col] = values
+    return pd.DataFrame(result, copy=False)
+
+
+def asof_join_grouped(left: pd.DataFrame, right: pd.DataFrame, by: Sequence[str], on: str = 'timestamp',
+                      direction: str = 'backward', tolerance=None, suffixes: Tuple[str, str] = ('_x', '_y'),
+                      max_workers: Optional[int] = None) -> pd.DataFrame:
+    """asof_join per group of `by` keys (period, stock...), groups run on a thread pool.
+
+    Rows only ever join within their own group, so ticks from unrelated sessions never
+    meet. Left groups with no right rows come back with NaN right columns.
+    """
+    by = list(by)
+    right_groups = {key: group.drop(columns=by) for key, group in right.groupby(by, sort=False)}
+    right_empty = right.iloc[:0].drop(columns=by)
+    left_groups = list(left.groupby(by, sort=True))
+
+    def join(item):
+        key, group = item
+        return asof_join(group, right_groups.get(key, right_empty), on, direction, tolerance, suffixes)
+
+    with ThreadPoolExecutor(max_workers=max_workers or min(8, os.cpu_count() or 1)) as executor:
+        parts = list(executor.map(join, left_groups))
+    if not parts:
+        return asof_join(left.iloc[:0], right_empty, on, direction, tolerance, suffixes)
+    return pd.concat(parts, ignore_index=True)
+
+
+class MergedBook:
+    """Columnar store of quote/trade as-of joined timelines, one entry per (period, stock).
+
+    Every entry is a regular columnar cache directory, so it memory maps, slices by
+    time (ColumnarFrame.between) and can be read column by column by training code
+    and the strategy alike.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def entry_path(self, period: str, stock: str) -> Path:
+        return self.path / f"{period}_{stock}"
+
+    def groups(self) -> List[Tuple[str, str]]:
+        if not self.path.exists():
+            return []
+        return sorted(tuple(p.name.rsplit('_', 1)) for p in self.path.iterdir() if ColumnarStore.exists(p))
+
+    def load(self, period: str, stock: str, columns: Optional[List[str]] = None, lazy: bool = False):
+        path = self.entry_path(period, stock)
+        if not ColumnarStore.exists(path):
+            return None
+        store = ColumnarStore(path)
+        return ColumnarFrame(store, columns) if lazy else store.to_frame(columns)
+
+    def to_frame(self, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """Every group stacked, with period and stock columns in front."""
+        parts = []
+        for period, stock in self.groups():
+            df = self.load(period, stock, columns)
+            df.insert(0, 'stock', stock)
+            df.insert(0, 'period', period)
+            parts.append(df)
+        return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+
+
+_worker_loader: Optional[MarketDataLoader] = None
+
+
+def _init_worker(cache_dir: Optional[str]) -> None:
+    # one loader per worker process, like batch_backtest
+    global _worker_loader
+    _worker_loader = MarketDataLoader(cache_dir=cache_dir)
+
+
+def merge_book_entry(base_dir: str, out_dir: str, period: str, stock: str, direction: str = 'backward',
+                     tolerance=None, cache_dir: Optional[str] = None) -> Optional[Path]:
+    """Join one (period, stock)'s quotes with its trades and write the result into the merged book."""
+    loader = _worker_loader if _worker_loader is not None else MarketDataLoader(cache_dir=cache_dir)
+
+    data_dir = os.path.join(base_dir, period, stock)
+    market_data = loader.load_market_data(data_dir, stock)
+    trade_data = loader.load_trade_data(data_dir, stock)
+    if market_data is None or market_data.empty or trade_data is None:
+        return None
+
+    merged = asof_join(market_data, trade_data, 'timestamp', direction, tolerance)
+    path = MergedBook(out_dir).entry_path(period, stock)
+    write_columnar(merged, path)
+    return path
+
+
+def build_merged_book(base_dir: str, out_dir: str, periods: Optional[List[str]] = None,
+                      stocks: Optional[List[str]] = None, direction: str = 'backward', tolerance=None,
+                      max_workers: Optional[int] = None, cache_dir: Optional[str] = None) -> MergedBook:
+    """Build the merged book for every (period, stock) that has both feeds, groups in parallel processes."""
+    if direction not in DIRECTIONS:
+        raise ValueError(f"Unknown direction {direction!r}, expected one of {DIRECTIONS}")
+    Path(out_dir).mkdir(parents=True, exist_ok=True)
+    jobs = [(period, stock) for period in (periods or PERIODS) for stock in (stocks or STOCKS)
+            if any((Path(base_dir) / period / stock).glob(f"market_data_{stock}*.csv"))
+            and (Path(base_dir) / period / stock / f"trade_data_{stock}.csv").exists()]
+
+    with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count(),
+                             initializer=_init_worker, initargs=(cache_dir,)) as executor:
+        futures = {
+            executor.submit(merge_book_entry, base_dir, out_dir, period, stock, direction, tolerance): (period, stock)
+            for period, stock in jobs
+        }
+        for future in as_completed(futures):
+            period, stock = futures[future]
+            try:
+                future.result()
+            except Exception as e:
+                logging.error(f"As-of join failed for {period}/{stock}: {e}")
+    return MergedBook(out_dir)
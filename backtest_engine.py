@@ -0,0 +1,182 @@
+import numpy as np
+import pandas as pd
+from typing import List, Tuple, Optional
+
+from position_book import PositionBook, PositionTuple
+
+TRADE_COLUMNS = ['id', 'key', 'size', 'entry_row', 'entry_time', 'entry_price',
+                 'exit_row', 'exit_time', 'exit_price', 'pnl']
+
+
+class BacktestEngine:
+    """Event-driven, array-backed replay of TradingStrategy's entry and exit rules.
+
+    Open positions live in a PositionBook and PnL is written into a
+    preallocated buffer. The loop only stops on rows where an entry signal can
+    fire or where an open position crosses its stop loss / take profit; every
+    row in between is filled with one vectorized mark-to-market.
+
+    Every closed position goes into a trade ledger (`trades` after a run), and
+    the pnl frame carries the realized PnL and the equity curve next to the
+    open-position PnL.
+    """
+
+    SCAN_BLOCK = 256  # first block size when searching forward for an exit, doubles every miss
+
+    def __init__(self, strategy, portfolio_value: float = 1_000_000):
+        self.strategy = strategy
+        self.portfolio_value = portfolio_value
+        self.trades = pd.DataFrame(columns=TRADE_COLUMNS)
+
+    def run(self, signals_df: pd.DataFrame,
+            open_positions: Optional[List[PositionTuple]] = None) -> Tuple[pd.DataFrame, List[PositionTuple]]:
+        """Replay the signals and return (pnl_df, positions still open at the end).
+
+        Arithmetic mirrors the old per-row loop exactly (same scalar types, same
+        summation order), so the PnL series is identical to it.
+        """
+        n = len(signals_df)
+        self.trades = pd.DataFrame(columns=TRADE_COLUMNS)
+        if n == 0:
+            return pd.DataFrame([]), list(open_positions or [])
+
+        index = signals_df.index
+        times = signals_df['timestamp'].to_numpy() if 'timestamp' in signals_df.columns else np.asarray(index)
+        mid = signals_df['mid_price'].to_numpy()
+        bid = signals_df['bidPrice'].to_numpy()
+        ask = signals_df['askPrice'].to_numpy()
+        atr = signals_df['atr'].to_numpy()
+        long_signal = signals_df['long_signal'].to_numpy(dtype=bool, na_value=False)
+        short_signal = signals_df['short_signal'].to_numpy(dtype=bool, na_value=False)
+        entry_rows = np.flatnonzero(long_signal | short_signal)
+
+        seeds = list(open_positions or [])
+        max_positions = self.strategy.MAX_POSITIONS
+        capacity = max(max_positions, 0) + len(seeds) + 1
+
+        book = PositionBook(capacity, price_dtype=mid.dtype)
+        exit_row = np.full(capacity, n, dtype=np.int64)  # per slot, the row its stop or target gets hit
+        entry_row = np.full(capacity, -1, dtype=np.int64)  # -1 for positions carried in from a previous run
+        closed: List[tuple] = []  # (id, key, size, entry_row, entry_price, exit_row), see TRADE_COLUMNS
+
+        pnl = np.zeros(n, dtype=np.result_type(mid.dtype, np.float32))
+        scratch = np.empty(n, dtype=pnl.dtype)
+
+        def open_slot(key, price, size, entry_time, sl, tp, first_row):
+            slot = book.open(price, size, entry_time, sl, tp, key)
+            exit_row[slot] = self._first_exit(mid, first_row, size > 0, sl, tp)
+            entry_row[slot] = first_row - 1
+
+        def mark_to_market(start, end):
+            out = pnl[start:end]
+            if not book.slots:
+                out[:] = 0
+                return
+            buf = scratch[start:end]
+            # one position at a time in open order, same summation order as the old per-row loop
+            for i, slot in enumerate(book.slots):
+                target = out if i == 0 else buf
+                np.subtract(mid[start:end], book.records['entry_price'][slot], out=target)
+                target *= int(book.records['size'][slot])  # python int on purpose, a numpy int would change the float promotion
+                if i > 0:
+                    out += buf
+
+        for key, price, size, entry_time, sl, tp in seeds:
+            open_slot(key, price, size, entry_time, sl, tp, 0)
+
+        row = 0
+        while row < n:
+            next_exit = int(exit_row[book.slots].min()) if book.slots else n
+            next_entry = n
+            if len(book) < max_positions:
+                k = np.searchsorted(entry_rows, row)
+                if k < len(entry_rows):
+                    next_entry = int(entry_rows[k])
+
+            event = min(next_exit, next_entry)
+            if event > row:
+                mark_to_market(row, event)
+            if event >= n:
+                break
+
+            # exits first, exactly like update_positions
+            for slot in [s for s in book.slots if exit_row[s] == event]:
+                record = book.records[slot]
+                closed.append((int(record['id']), book.keys[slot], int(record['size']), int(entry_row[slot]),
+                               float(record['entry_price']), event))
+                book.close(slot)
+
+            if len(book) < max_positions and (long_signal[event] or short_signal[event]):
+                is_long = bool(long_signal[event])
+                current_price = mid[event]
+                sl = self._stop_loss(mid, bid, ask, atr, event, is_long)
+                size = self.strategy.calculate_position_size(current_price, sl, self.portfolio_value)
+                tp = self.strategy.calculate_take_profit(current_price, sl, is_long)
+                timestamp = index[event]
+                open_slot(f"{'long' if is_long else 'short'}_{timestamp}", current_price,
+                          size if is_long else -size, timestamp, sl, tp, event + 1)
+
+            mark_to_market(event, event + 1)
+            row = event + 1
+
+        self.trades = self._ledger(closed, mid, times)
+        realized = np.zeros(n, dtype=np.float64)
+        np.add.at(realized, self.trades['exit_row'].to_numpy(dtype=np.int64), self.trades['pnl'].to_numpy(dtype=np.float64))
+        np.cumsum(realized, out=realized)
+
+        pnl_df = pd.DataFrame({
+            'timestamp': times,
+            'pnl': pnl.astype(np.float64),  # open positions only
+            'pnl_percentage': ((pnl / self.portfolio_value) * 100).astype(np.float64),
+            'realized_pnl': realized,
+            'equity': self.portfolio_value + realized + pnl
+        })
+        remaining = book.to_tuples()
+        return pnl_df, remaining
+
+    @staticmethod
+    def _ledger(closed: List[tuple], mid: np.ndarray, times: np.ndarray) -> pd.DataFrame:
+        """Trade ledger from the closed positions, exit at the mid price of the exit row."""
+        if not closed:
+            return pd.DataFrame(columns=TRADE_COLUMNS)
+        ids, keys, sizes, entry_rows, entry_prices, exit_rows = (np.asarray(c) for c in zip(*closed))
+        exit_prices = mid[exit_rows].astype(np.float64)
+        entry_times = times[np.maximum(entry_rows, 0)]
+        if np.issubdtype(entry_times.dtype, np.datetime64):
+            entry_times[entry_rows < 0] = np.datetime64('NaT')
+        return pd.DataFrame({
+            'id': ids, 'key': keys, 'size': sizes,
+            'entry_row': entry_rows, 'entry_time': entry_times, 'entry_price': entry_prices,
+            'exit_row': exit_rows, 'exit_time': times[exit_rows], 'exit_price': exit_prices,
+            'pnl': (exit_prices - entry_prices) * sizes
+        })
+
+    @staticmethod
+    def _stop_loss(mid: np.ndarray, bid: np.ndarray, ask: np.ndarray, atr: np.ndarray,
+                   index: int, is_long: bool) -> float:
+        """Array version of TradingStrategy.calculate_stop_loss (fmin/fmax skip NaNs like pandas)."""
+        price = mid[index]
+        if is_long:
+            recent_low = np.fmin.reduce(bid[max(0, index - 20):index + 1])
+            return min(price - 2 * atr[index], recent_low)
+        else:
+            recent_high = np.fmax.reduce(ask[max(0, index - 20):index + 1])
+            return max(price + 2 * atr[index], recent_high)
+
+    def _first_exit(self, price: np.ndarray, start: int, is_long: bool,
+                    stop_loss: float, take_profit: float) -> int:
+        """First row >= start where the position gets stopped out or hits its target, len(price) if never."""
+        n = len(price)
+        block = self.SCAN_BLOCK
+        while start < n:
+            end = min(n, start + block)
+            window = price[start:end]
+            if is_long:
+                hit = (window <= stop_loss) | (window >= take_profit)
+            else:
+                hit = (window >= stop_loss) | (window <= take_profit)
+            if hit.any():
+                return start + int(np.argmax(hit))
+            start = end
+            block *= 2
+        return n
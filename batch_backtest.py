@@ -0,0 +1,163 @@
+import os
+import csv
+import time
+import logging
+import argparse
+import pandas as pd
+from pathlib import Path
+from typing import Optional, List, Tuple, Set, Dict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from data_loader import MarketDataLoader
+from trading_strategy import TradingStrategy, calculate_trading_metrics
+
+STOCKS = ['A', 'B', 'C', 'D', 'E']
+PERIODS = [f"Period{i}" for i in range(1, 21)]
+RESULT_COLUMNS = [
+    'period', 'stock', 'rows', 'total_return', 'return_percentage', 'max_drawdown',
+    'sharpe_ratio', 'sortino_ratio', 'trades', 'win_rate', 'profit_factor', 'avg_win', 'avg_loss',
+    'expectancy', 'elapsed_seconds', 'status', 'error'
+]
+
+_worker_loader: Optional[MarketDataLoader] = None
+
+
+def _init_worker(cache_dir: Optional[str], memory_budget: Optional[int] = MarketDataLoader.DEFAULT_MEMORY_BUDGET) -> None:
+    # one loader per worker process, so its file-list cache survives across jobs
+    global _worker_loader
+    _worker_loader = MarketDataLoader(cache_dir=cache_dir, memory_budget=memory_budget)
+
+
+def run_backtest_job(base_dir: str, period: str, stock: str, cache_dir: Optional[str] = None,
+                     memory_budget: Optional[int] = MarketDataLoader.DEFAULT_MEMORY_BUDGET) -> Dict:
+    """Backtest one (period, stock) and return a flat metrics row. Never raises, errors end up in the row."""
+    loader = _worker_loader if _worker_loader is not None else MarketDataLoader(cache_dir=cache_dir, memory_budget=memory_budget)
+    row = {'period': period, 'stock': stock, 'status': 'ok', 'error': ''}
+    start = time.perf_counter()
+
+    try:
+        data_dir = os.path.join(base_dir, period, stock)
+        market_data = loader.load_market_data(data_dir, stock)
+        if market_data is None or market_data.empty:
+            row.update(status='no_data', rows=0)
+        else:
+            strategy = TradingStrategy()
+            pnl_data = strategy.calculate_pnl(market_data)
+            metrics = calculate_trading_metrics(pnl_data, strategy.trades)
+            row['rows'] = len(market_data)
+            row.update({name: float(value) for name, value in metrics.items()})
+    except Exception as e:
+        logging.error(f"Backtest failed for {period}/{stock}: {e}")
+        row.update(status='error', error=str(e))
+
+    row['elapsed_seconds'] = round(time.perf_counter() - start, 4)
+    return row
+
+
+def find_jobs(base_dir: str, periods: List[str], stocks: List[str]) -> List[Tuple[str, str]]:
+    """All (period, stock) pairs that have market data, biggest first so the pool doesn't idle on a long tail."""
+    jobs = []
+    for period in periods:
+        for stock in stocks:
+            data_dir = Path(base_dir) / period / stock
+            if not data_dir.is_dir():
+                continue
+            size = sum(f.stat().st_size for f in data_dir.glob(f"market_data_{stock}*.csv"))
+            if size > 0:
+                jobs.append((size, period, stock))
+    jobs.sort(reverse=True)
+    return [(period, stock) for _, period, stock in jobs]
+
+
+def load_completed(results_path: Path) -> Set[Tuple[str, str]]:
+    """(period, stock) pairs already finished in a previous run, failed jobs get retried."""
+    if not results_path.exists():
+        return set()
+    try:
+        done = pd.read_csv(results_path, dtype={'period': str, 'stock': str})
+    except (pd.errors.EmptyDataError, FileNotFoundError):
+        return set()
+    done = done[done['status'] != 'error']
+    return set(zip(done['period'], done['stock']))
+
+
+def upgrade_results(results_path: Path) -> None:
+    """Rewrite a results file from an older version with the current RESULT_COLUMNS header.
+
+    Rows keep their values; columns the old version didn't have stay empty (--no-resume recomputes them).
+    """
+    if not results_path.exists() or results_path.stat().st_size == 0:
+        return
+    with results_path.open(newline='') as f:
+        header = next(csv.reader(f), [])
+    if header == RESULT_COLUMNS:
+        return
+    old = pd.read_csv(results_path, dtype={'period': str, 'stock': str})
+    tmp_path = results_path.with_suffix(results_path.suffix + '.tmp')
+    old.reindex(columns=RESULT_COLUMNS).to_csv(tmp_path, index=False)
+    os.replace(tmp_path, results_path)
+    logging.warning(f"Upgraded {results_path} to the current columns, {len(old)} earlier rows lack the new metrics")
+
+
+def run_batch(base_dir: str, results_path: str, periods: Optional[List[str]] = None,
+              stocks: Optional[List[str]] = None, max_workers: Optional[int] = None,
+              cache_dir: Optional[str] = None, resume: bool = True,
+              memory_budget: Optional[int] = MarketDataLoader.DEFAULT_MEMORY_BUDGET) -> pd.DataFrame:
+    """Fan (period, stock) backtests out over a process pool, appending each result as it finishes.
+
+    ``memory_budget`` is per worker process, anything bigger gets spilled to disk by the loader.
+    """
+    results_path = Path(results_path)
+    results_path.parent.mkdir(parents=True, exist_ok=True)
+    if not resume and results_path.exists():
+        results_path.unlink()
+    upgrade_results(results_path)  # appending under an older, shorter header would misalign every new row
+
+    completed = load_completed(results_path)
+    jobs = [job for job in find_jobs(base_dir, periods or PERIODS, stocks or STOCKS) if job not in completed]
+    print(f"{len(jobs)} jobs to run, {len(completed)} already done")
+
+    write_header = not results_path.exists() or results_path.stat().st_size == 0
+    with results_path.open('a', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_COLUMNS, extrasaction='ignore')
+        if write_header:
+            writer.writeheader()
+            f.flush()
+
+        if jobs:
+            with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count(),
+                                     initializer=_init_worker, initargs=(cache_dir, memory_budget)) as executor:
+                futures = {
+                    executor.submit(run_backtest_job, base_dir, period, stock, cache_dir, memory_budget): (period, stock)
+                    for period, stock in jobs
+                }
+                for i, future in enumerate(as_completed(futures), 1):
+                    row = future.result()
+                    writer.writerow(row)
+                    f.flush()  # a kill mid-sweep only loses the jobs still in flight
+                    print(f"[{i}/{len(jobs)}] {row['period']}/{row['stock']}: {row['status']} ({row['elapsed_seconds']}s)")
+
+    return pd.read_csv(results_path, dtype={'period': str, 'stock': str})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless multi-period, multi-stock backtest sweep")
+    parser.add_argument('--data-dir', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'TrainingData'))
+    parser.add_argument('--results', default='backtest_results.csv')
+    parser.add_argument('--cache-dir', default='./cache')
+    parser.add_argument('--periods', nargs='*', help="e.g. Period1 Period7 (default: all 20)")
+    parser.add_argument('--stocks', nargs='*', help="e.g. A B (default: all 5)")
+    parser.add_argument('--workers', type=int, default=None, help="default: one per core")
+    parser.add_argument('--memory-budget', type=float, default=MarketDataLoader.DEFAULT_MEMORY_BUDGET / 1e9,
+                        help="GB of parsed data each worker keeps in memory before spilling to disk (default: 7)")
+    parser.add_argument('--no-resume', action='store_true', help="start over instead of skipping finished jobs")
+    args = parser.parse_args()
+
+    results = run_batch(args.data_dir, args.results, args.periods, args.stocks,
+                        args.workers, args.cache_dir, resume=not args.no_resume,
+                        memory_budget=int(args.memory_budget * 1e9))
+    print(results.sort_values(['period', 'stock']).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
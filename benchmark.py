@@ -0,0 +1,410 @@
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+import numpy as np
+import pandas as pd
+from typing import Callable, Dict, List, Optional, Tuple
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, 'TrainingData')
+BASELINE = os.path.join(BASE_DIR, 'benchmarks', 'baseline.json')
+DEFAULT_SESSIONS = ['Period1/B', 'Period2/A', 'Period7/A']  # a small, a large and the best looking session
+CHUNK_SIZES = [50_000, 100_000, 250_000, 500_000, 1_000_000, 2_000_000]
+REGRESSION_THRESHOLD = 0.10  # median slower than baseline by more than this fraction = regression...
+MIN_SLOWDOWN_MS = 10.0  # ...and by more than this much, a few ms either way is noise for the short cases
+DEFAULT_REPEATS = 5
+
+
+def _max_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 ** 2 if sys.platform == 'darwin' else rss / 1024  # bytes on macOS, KB on Linux
+
+
+def _proc_status_mb(field: str) -> Optional[float]:
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) / 1024  # kB
+    except OSError:
+        pass
+    return None
+
+
+def _reset_peak_rss() -> bool:
+    """Restart the kernel's peak RSS (VmHWM) so it only covers what runs next. Linux only."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+class _Case:
+    """One benchmark: `setup` builds the inputs (untimed), `run` is timed and returns the rows it processed."""
+
+    def __init__(self, name: str, setup: Callable, run: Callable, description: str):
+        self.name = name
+        self.setup = setup
+        self.run = run
+        self.description = description
+
+
+def _loader(cache_dir: Optional[str] = None):
+    from data_loader import MarketDataLoader
+    return MarketDataLoader(cache_dir=cache_dir)
+
+
+def _market_data(data_dir: str, stock: str) -> pd.DataFrame:
+    return _loader().load_market_data(data_dir, stock)
+
+
+def _setup_csv(data_dir: str, stock: str, scratch: str):
+    return _loader(), data_dir, stock
+
+
+def _setup_cache(data_dir: str, stock: str, scratch: str):
+    loader = _loader(os.path.join(scratch, 'cache'))
+    loader.load_market_data(data_dir, stock)  # populates the cache, the timed run is a pure cache hit
+    return _loader(os.path.join(scratch, 'cache')), data_dir, stock
+
+
+def _run_load(loader, data_dir: str, stock: str) -> int:
+    df = loader.load_market_data(data_dir, stock)
+    return len(df)
+
+
+def _setup_strategy(data_dir: str, stock: str, scratch: str):
+    from trading_strategy import TradingStrategy
+    return TradingStrategy(), _market_data(data_dir, stock)
+
+
+def _run_signals(strategy, market_data: pd.DataFrame) -> int:
+    strategy.calculate_signals(market_data)
+    return len(market_data)
+
+
+def _run_pnl(strategy, market_data: pd.DataFrame) -> int:
+    strategy.calculate_pnl(market_data)
+    return len(market_data)
+
+
+def _setup_market(data_dir: str, stock: str, scratch: str):
+    return (_market_data(data_dir, stock),)
+
+
+def _run_predictions(market_data: pd.DataFrame) -> int:
+    from price_prediction import predict_price_changes
+    predict_price_changes(market_data)
+    return len(market_data)
+
+
+def _plot_harness():
+    """Just enough of a MarketDataViewer for its plot methods, on a headless Agg figure."""
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from market_data_viewer import MarketDataViewer
+    from plot_lod import LODManager
+
+    class Harness:
+        _set_element = MarketDataViewer._set_element
+        _plot_bid_price = MarketDataViewer._plot_bid_price
+        _plot_ask_price = MarketDataViewer._plot_ask_price
+        _plot_pnl = MarketDataViewer._plot_pnl
+        _plot_min_max_lines = MarketDataViewer._plot_min_max_lines
+        _plot_overview = MarketDataViewer._plot_overview
+
+        def __init__(self):
+            self.figure = Figure(figsize=(12, 9))
+            FigureCanvasAgg(self.figure)
+            self.ax_price, self.ax_pnl = self.figure.subplots(2, 1, height_ratios=[2, 1])
+            self.price_lod = LODManager(self.ax_price)
+            self.plot_elements = {}
+
+    harness = Harness()
+    harness.figure.canvas.draw()  # the first draw loads fonts and such, keep that out of the timing
+    return harness
+
+
+def _setup_plot_prices(data_dir: str, stock: str, scratch: str):
+    return _plot_harness(), _market_data(data_dir, stock), stock
+
+
+def _run_plot_prices(harness, market_data: pd.DataFrame, stock: str) -> int:
+    harness._plot_bid_price(market_data, stock)
+    harness._plot_ask_price(market_data, stock)
+    harness.figure.canvas.draw()
+    return len(market_data)
+
+
+def _setup_plot_pnl(data_dir: str, stock: str, scratch: str):
+    from trading_strategy import TradingStrategy, calculate_trading_metrics
+    pnl_data = TradingStrategy().calculate_pnl(_market_data(data_dir, stock))
+    return _plot_harness(), pnl_data, calculate_trading_metrics(pnl_data), stock
+
+
+def _run_plot_pnl(harness, pnl_data: pd.DataFrame, metrics: Dict, stock: str) -> int:
+    harness._plot_pnl(pnl_data, metrics, stock, True)
+    harness.figure.canvas.draw()
+    return len(pnl_data)
+
+
+def _setup_plot_overview(data_dir: str, stock: str, scratch: str):
+    from aggregate_store import AggregateStore
+    store = AggregateStore(os.path.join(scratch, 'aggregates'))
+    store.update(data_dir, 'bench', stock)  # built untimed, the viewer reads a warm store
+    return _plot_harness(), store, data_dir, stock
+
+
+def _run_plot_overview(harness, store, data_dir: str, stock: str) -> int:
+    from aggregate_store import summarize
+    bars = store.bars(data_dir, 'bench', stock, '1m')
+    harness._plot_min_max_lines(summarize(bars), stock)
+    harness._plot_overview(bars, stock)
+    harness.figure.canvas.draw()
+    return int(bars['ticks'].sum())
+
+
+CASES = {case.name: case for case in [
+    _Case('load_csv', _setup_csv, _run_load, "market data straight from the CSVs, no cache"),
+    _Case('load_cache', _setup_cache, _run_load, "market data from a populated columnar cache"),
+    _Case('calculate_signals', _setup_strategy, _run_signals, "TradingStrategy.calculate_signals"),
+    _Case('calculate_pnl', _setup_strategy, _run_pnl, "TradingStrategy.calculate_pnl (signals included)"),
+    _Case('predict_price_changes', _setup_market, _run_predictions, "price_prediction.predict_price_changes"),
+    _Case('plot_prices', _setup_plot_prices, _run_plot_prices, "viewer bid + ask lines, Agg render"),
+    _Case('plot_pnl', _setup_plot_pnl, _run_plot_pnl, "viewer PnL line, Agg render"),
+    _Case('plot_overview', _setup_plot_overview, _run_plot_overview, "viewer min/max + 1m overview from aggregates, Agg render"),
+]}
+
+
+def run_case_here(case_name: str, session: str, chunk_size: Optional[int] = None) -> Dict:
+    """Run one case once in this process; meant to be the only thing a fresh child process does."""
+    if chunk_size:
+        from data_loader import MarketDataLoader
+        MarketDataLoader.CHUNK_SIZE = chunk_size
+    case = CASES[case_name]
+    stock = session.split('/')[-1]
+    scratch = tempfile.mkdtemp(prefix='bench-')
+    try:
+        inputs = case.setup(os.path.join(DATA_DIR, session), stock, scratch)
+        # RSS right before the timed call and its peak during it, so setup's own peak doesn't count;
+        # without /proc the process-wide ru_maxrss is all there is
+        hwm = _reset_peak_rss()
+        setup_rss = _proc_status_mb('VmRSS') if hwm else _max_rss_mb()
+        start = time.perf_counter()
+        rows = case.run(*inputs)
+        seconds = time.perf_counter() - start
+        peak_rss = _proc_status_mb('VmHWM') if hwm else _max_rss_mb()
+        return {'seconds': seconds, 'rows': rows, 'peak_rss_mb': peak_rss, 'setup_rss_mb': setup_rss,
+                'rss_method': 'vmhwm' if hwm else 'ru_maxrss'}
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+def run_child(case_name: str, session: str, chunk_size: Optional[int] = None) -> Dict:
+    """Time a case once in its own interpreter, so peak RSS and caches start clean."""
+    cmd = [sys.executable, os.path.abspath(__file__), '--child', case_name, session]
+    if chunk_size:
+        cmd += ['--chunk-size', str(chunk_size)]
+    proc = subprocess.run(cmd, capture_output=True, text=True, cwd=BASE_DIR)
+    if proc.returncode != 0:
+        raise RuntimeError(f"{case_name} on {session} failed:\n{proc.stderr.strip()}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def summarize_runs(case_name: str, session: str, chunk_size: Optional[int], runs: List[Dict]) -> Dict:
+    """One result from a case's runs: fastest and median time, the worst peak RSS."""
+    seconds = [run['seconds'] for run in runs]
+    best = min(seconds)
+    rows = runs[0]['rows']
+    return {
+        'case': case_name, 'session': session, 'chunk_size': chunk_size,
+        'rows': rows, 'repeats': len(runs),
+        'seconds_min': best, 'seconds_median': float(np.median(seconds)), 'seconds': seconds,
+        'rows_per_sec': rows / best if best > 0 else None,
+        'peak_rss_mb': max(run['peak_rss_mb'] for run in runs),  # during the timed call
+        'rss_above_setup_mb': max(run['peak_rss_mb'] - run['setup_rss_mb'] for run in runs),
+        'rss_method': runs[0]['rss_method'],
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, cwd=BASE_DIR)
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def environment() -> Dict:
+    from data_loader import MarketDataLoader
+    return {
+        'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__,
+        'platform': platform.platform(), 'machine': platform.machine(), 'cpus': os.cpu_count(),
+        'commit': _git_commit(), 'chunk_size': MarketDataLoader.CHUNK_SIZE,
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def run_suite(cases: List[str], sessions: List[str], repeats: int,
+              chunk_sizes: Optional[List[int]] = None) -> Dict:
+    """Every case `repeats` times, round robin, so a busy spell on the machine costs each case one run, not all of them."""
+    jobs = [(case, session, chunk_size) for case in cases for session in sessions
+            for chunk_size in (chunk_sizes or [None])]
+    runs = {job: [] for job in jobs}
+    for repeat in range(1, repeats + 1):
+        for job in jobs:
+            if runs[job] is None:
+                continue  # failed in an earlier round
+            try:
+                runs[job].append(run_child(*job))
+            except Exception as e:
+                logging.error(f"Benchmark {_label(*job)} failed: {e}")
+                runs[job] = None
+        print(f"round {repeat}/{repeats} done")
+
+    results = []
+    for job in jobs:
+        if not runs[job]:
+            continue
+        result = summarize_runs(*job, runs[job])
+        results.append(result)
+        print(f"{_label(*job)}: {result['seconds_median'] * 1000:.1f} ms median, "
+              f"{result['rows_per_sec'] or 0:,.0f} rows/s, peak {result['peak_rss_mb']:.0f} MB")
+    return {'environment': environment(), 'results': results}
+
+
+def _label(case: str, session: str, chunk_size: Optional[int]) -> str:
+    return f"{case} {session}" + (f" chunk={chunk_size}" if chunk_size else "")
+
+
+def _result_key(result: Dict) -> Tuple:
+    return result['case'], result['session'], result.get('chunk_size')
+
+
+def compare(current: Dict, baseline: Dict, threshold: float = REGRESSION_THRESHOLD,
+            min_slowdown_ms: float = MIN_SLOWDOWN_MS) -> List[Dict]:
+    """Per shared (case, session, chunk size): median time and memory against the baseline.
+
+    A regression has to be both `threshold` and `min_slowdown_ms` slower, the
+    2-80 ms cases easily move a few ms between runs and that alone shouldn't
+    fail the suite.
+    """
+    previous = {_result_key(r): r for r in baseline.get('results', [])}
+    rows = []
+    for result in current['results']:
+        old = previous.get(_result_key(result))
+        if old is None:
+            continue
+        old_ms, current_ms = old['seconds_median'] * 1000, result['seconds_median'] * 1000
+        ratio = current_ms / old_ms if old_ms > 0 else float('inf')
+        rows.append({
+            'case': result['case'], 'session': result['session'], 'chunk_size': result.get('chunk_size'),
+            'baseline_ms': old_ms, 'current_ms': current_ms,
+            'time_ratio': ratio,
+            'rss_delta_mb': result['peak_rss_mb'] - old['peak_rss_mb'],
+            'regression': ratio > 1 + threshold and current_ms - old_ms > min_slowdown_ms,
+        })
+    return rows
+
+
+def baseline_mismatch(current: Dict, baseline: Dict) -> List[str]:
+    """Environment fields that differ from the baseline's, timings across machines only compare so far."""
+    old = baseline.get('environment', {})
+    new = current.get('environment', {})
+    return [f"{key}: {old.get(key)} -> {new.get(key)}" for key in ('machine', 'cpus', 'python', 'numpy', 'pandas')
+            if old.get(key) != new.get(key)]
+
+
+def print_comparison(rows: List[Dict]) -> None:
+    if not rows:
+        print("Nothing in common with the baseline")
+        return
+    print(f"\nmedian times\n{'case':<24}{'session':<12}{'baseline ms':>12}{'current ms':>12}{'ratio':>8}{'RSS +MB':>9}")
+    for row in rows:
+        flag = '  REGRESSION' if row['regression'] else ''
+        print(f"{row['case']:<24}{row['session']:<12}{row['baseline_ms']:>12.1f}{row['current_ms']:>12.1f}"
+              f"{row['time_ratio']:>8.2f}{row['rss_delta_mb']:>9.1f}{flag}")
+
+
+def print_sweep(results: List[Dict]) -> None:
+    print(f"\n{'session':<12}{'chunk size':>12}{'ms':>10}{'rows/s':>14}{'peak MB':>9}")
+    for result in sorted(results, key=lambda r: (r['session'], r['chunk_size'] or 0)):
+        print(f"{result['session']:<12}{result['chunk_size'] or 0:>12,}{result['seconds_min'] * 1000:>10.1f}"
+              f"{result['rows_per_sec'] or 0:>14,.0f}{result['peak_rss_mb']:>9.0f}")
+    for session in sorted({r['session'] for r in results}):
+        best = min((r for r in results if r['session'] == session), key=lambda r: r['seconds_min'])
+        print(f"fastest for {session}: CHUNK_SIZE = {best['chunk_size']:,}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the loader, indicator, prediction, backtest and plotting hot paths")
+    parser.add_argument('--cases', nargs='*', choices=list(CASES), help="default: all of them")
+    parser.add_argument('--sessions', nargs='*', default=DEFAULT_SESSIONS, help="Period/Stock under TrainingData")
+    parser.add_argument('--repeats', type=int, default=DEFAULT_REPEATS,
+                        help="runs per case, each in a fresh process; the median is compared against the baseline")
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline', default=BASELINE,
+                        help="results to compare against, exits 1 on a regression ('' to skip; default: the committed baseline)")
+    parser.add_argument('--update-baseline', action='store_true', help="also write the results over --baseline")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help="fraction slower than baseline that counts as a regression")
+    parser.add_argument('--min-slowdown-ms', type=float, default=MIN_SLOWDOWN_MS,
+                        help="and the least slowdown in ms that does")
+    parser.add_argument('--sweep-chunk-size', nargs='*', type=int, metavar='ROWS',
+                        help=f"time the CSV load at each CHUNK_SIZE (default {CHUNK_SIZES})")
+    parser.add_argument('--list', action='store_true', help="list the cases and exit")
+    parser.add_argument('--child', nargs=2, metavar=('CASE', 'SESSION'), help=argparse.SUPPRESS)
+    parser.add_argument('--chunk-size', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_case_here(*args.child, chunk_size=args.chunk_size)))
+        return
+    if args.list:
+        for case in CASES.values():
+            print(f"{case.name:<24}{case.description}")
+        return
+
+    if args.sweep_chunk_size is not None:
+        report = run_suite(['load_csv'], args.sessions, args.repeats, args.sweep_chunk_size or CHUNK_SIZES)
+        print_sweep(report['results'])
+    else:
+        report = run_suite(args.cases or list(CASES), args.sessions, args.repeats)
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline updated: {args.baseline}")
+    elif args.baseline:
+        if not os.path.exists(args.baseline):
+            print(f"No baseline at {args.baseline}, run with --update-baseline to create one")
+            return
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        for difference in baseline_mismatch(report, baseline):
+            print(f"Baseline environment differs, {difference}")
+        rows = compare(report, baseline, args.threshold, args.min_slowdown_ms)
+        print_comparison(rows)
+        if any(row['regression'] for row in rows):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+import os
+import shutil
+import logging
+import threading
+from hashlib import blake2b
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from columnar_cache import ColumnarStore
+
+
+def fingerprint_file(path, block_size: int = 1 << 16, samples: int = 8) -> str:
+    """Content fingerprint of one file: its size plus `samples` evenly spaced blocks.
+
+    Small files are hashed whole. Touching or re-copying a file keeps its fingerprint,
+    editing it almost always changes it (the first and last blocks are always sampled).
+    """
+    size = os.path.getsize(path)
+    digest = blake2b(str(size).encode(), digest_size=16)
+    with open(path, 'rb') as f:
+        if size <= block_size * samples:
+            digest.update(f.read())
+        else:
+            last = size - block_size
+            for i in range(samples):
+                f.seek(last * i // (samples - 1))
+                digest.update(f.read(block_size))
+    return digest.hexdigest()
+
+
+def content_key(files: List[Path], salt: str = '', fingerprint=fingerprint_file) -> str:
+    """Key for a set of files from their names and fingerprints, missing files are skipped."""
+    digest = blake2b(salt.encode(), digest_size=16)
+    for path in files:
+        try:
+            digest.update(f"{Path(path).name}:{fingerprint(path)}".encode())
+        except OSError:
+            continue
+    return digest.hexdigest()
+
+
+class CacheManager:
+    """Content-addressed cache keys, LRU eviction under a size budget and hit/miss stats.
+
+    An entry is a columnar store or a pickle directly inside the cache dir, anything
+    else in there (time indexes, writers' temp dirs) is never counted or evicted. Its
+    mtime is its last use (touched on every hit), so recency survives restarts and is
+    shared between processes without an index file.
+    """
+
+    DEFAULT_MAX_BYTES = 4 * 1024 ** 3  # 4GB, plenty for all periods of all stocks
+    FILE_SUFFIXES = ('.pkl',)  # file entries, every other entry is a columnar store directory
+
+    def __init__(self, cache_dir, max_bytes: Optional[int] = DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._fingerprints: Dict[Tuple[str, int, int], str] = {}  # (path, size, mtime_ns) -> fingerprint
+        self._stats = {'hits': 0, 'misses': 0, 'bytes_read': 0, 'bytes_written': 0,
+                       'load_time': 0.0, 'evictions': 0, 'bytes_evicted': 0}
+
+    def key(self, files: List[Path], salt: str = '') -> str:
+        """Cache key for a set of source files, from their names and contents (not their mtimes).
+
+        `salt` folds in anything else the cached result depends on, like the parse schema.
+        """
+        return content_key(files, salt, self._fingerprint)
+
+    def _fingerprint(self, path) -> str:
+        st = os.stat(path)
+        memo_key = (str(path), st.st_size, st.st_mtime_ns)  # only saves the re-read, the key itself ignores mtime
+        fingerprint = self._fingerprints.get(memo_key)
+        if fingerprint is None:
+            fingerprint = fingerprint_file(path)
+            with self._lock:
+                self._fingerprints[memo_key] = fingerprint
+        return fingerprint
+
+    def record_hit(self, entry: Path, seconds: float, nbytes: Optional[int] = None) -> None:
+        """Count a cache read and mark `entry` as most recently used."""
+        if nbytes is None:
+            nbytes = self._entry_size(entry)
+        with self._lock:
+            self._stats['hits'] += 1
+            self._stats['bytes_read'] += nbytes
+            self._stats['load_time'] += seconds
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+
+    def record_miss(self) -> None:
+        with self._lock:
+            self._stats['misses'] += 1
+
+    def record_store(self, entry: Path) -> None:
+        """Count a freshly written entry, then evict down to the budget (never the new entry)."""
+        with self._lock:
+            self._stats['bytes_written'] += self._entry_size(entry)
+        self.evict(keep=(entry,))
+
+    def entries(self) -> List[Tuple[Path, int, float]]:
+        """(path, bytes, last use) for every entry, least recently used first."""
+        result = []
+        for path in self.cache_dir.iterdir():
+            if not self.is_entry(path):
+                continue
+            try:
+                result.append((path, self._entry_size(path), path.stat().st_mtime))
+            except OSError:
+                continue
+        return sorted(result, key=lambda entry: entry[2])
+
+    @classmethod
+    def is_entry(cls, path: Path) -> bool:
+        if '.tmp-' in path.name:  # half-written columnar entry of some other process
+            return False
+        if path.suffix in cls.FILE_SUFFIXES:
+            return path.is_file()
+        return ColumnarStore.exists(path)
+
+    def total_bytes(self) -> int:
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self, max_bytes: Optional[int] = None, keep=()) -> int:
+        """Drop least recently used entries until the cache fits the budget, returns bytes freed."""
+        budget = self.max_bytes if max_bytes is None else max_bytes
+        if budget is None:
+            return 0
+
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        keep = {Path(k) for k in keep}
+        freed = 0
+        for path, size, _ in entries:
+            if total - freed <= budget:
+                break
+            if path in keep:
+                continue
+            try:
+                if path.is_dir():
+                    shutil.rmtree(path)
+                else:
+                    path.unlink()
+            except OSError as e:
+                logging.error(f"Error evicting cache entry {path}: {e}")
+                continue
+            freed += size
+            with self._lock:
+                self._stats['evictions'] += 1
+                self._stats['bytes_evicted'] += size
+        return freed
+
+    def clear(self) -> int:
+        return self.evict(max_bytes=0)
+
+    def stats(self) -> Dict:
+        """Hits, misses, bytes read/written/evicted and time spent loading from cache, plus current size."""
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        stats['avg_load_time'] = stats['load_time'] / stats['hits'] if stats['hits'] else 0.0
+        entries = self.entries()
+        stats['entries'] = len(entries)
+        stats['total_bytes'] = sum(size for _, size, _ in entries)
+        stats['max_bytes'] = self.max_bytes
+        return stats
+
+    @staticmethod
+    def _entry_size(path: Path) -> int:
+        path = Path(path)
+        if path.is_dir():
+            return sum(f.stat().st_size for f in path.iterdir() if f.is_file())
+        return path.stat().st_size
+
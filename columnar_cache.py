@@ -0,0 +1,231 @@
+import os
+import json
+import shutil
+import logging
+import tempfile
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Optional, List, Dict, Iterable
+
+from timestamp_parser import to_session_time
+
+MANIFEST_NAME = 'manifest.json'
+FORMAT_VERSION = 1
+
+
+class ColumnarWriter:
+    """Writes DataFrame chunks into one raw, typed binary file per column.
+
+    Everything goes into a temporary directory first and is only renamed into
+    place by close(), so a crashed write never leaves a half-built cache entry.
+    The temp directory is unique per writer, two threads caching the same entry
+    (a cancelled load still running next to its replacement) never share one.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._tmp_path = Path(tempfile.mkdtemp(dir=self.path.parent, prefix=f"{self.path.name}.tmp-"))
+        self._files: Dict[str, object] = {}
+        self._dtypes: Dict[str, np.dtype] = {}
+        self._columns: List[str] = []
+        self._length = 0
+
+    def append(self, df: pd.DataFrame) -> None:
+        if not self._columns:
+            self._columns = list(df.columns)
+            for col in self._columns:
+                self._dtypes[col] = np.dtype(df[col].dtype)
+                self._files[col] = (self._tmp_path / f"{col}.bin").open('wb')
+        elif list(df.columns) != self._columns:
+            raise ValueError(f"Chunk columns {list(df.columns)} do not match {self._columns}")
+
+        for col in self._columns:
+            dtype = np.dtype(df[col].dtype)
+            if dtype != self._dtypes[col] and not np.can_cast(dtype, self._dtypes[col], 'safe'):
+                self._widen(col, np.promote_types(self._dtypes[col], dtype))
+            values = np.ascontiguousarray(df[col].to_numpy(dtype=self._dtypes[col]))
+            self._files[col].write(values.tobytes())
+        self._length += len(df)
+
+    def _widen(self, col: str, dtype: np.dtype) -> None:
+        # a later chunk got downcast less aggressively (int8 then int16...), rewrite what's there in the wider type
+        self._files[col].close()
+        file_path = self._tmp_path / f"{col}.bin"
+        np.fromfile(file_path, dtype=self._dtypes[col]).astype(dtype).tofile(file_path)
+        self._dtypes[col] = dtype
+        self._files[col] = file_path.open('ab')
+
+    def close(self) -> Path:
+        for f in self._files.values():
+            f.close()
+
+        manifest = {
+            'version': FORMAT_VERSION,
+            'length': self._length,
+            'columns': [
+                {'name': col, 'dtype': self._dtypes[col].str, 'file': f"{col}.bin"}
+                for col in self._columns
+            ]
+        }
+        with (self._tmp_path / MANIFEST_NAME).open('w') as f:
+            json.dump(manifest, f)
+
+        swap_into(self._tmp_path, self.path)
+        return self.path
+
+    def abort(self) -> None:
+        for f in self._files.values():
+            f.close()
+        shutil.rmtree(self._tmp_path, ignore_errors=True)
+
+
+class ColumnarStore:
+    """Read-only view over a columnar cache entry, every column is memory mapped.
+
+    Opening a store only reads the manifest; the column files are paged in by the
+    OS as they get touched, so asking for two columns never reads the others.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with (self.path / MANIFEST_NAME).open('r') as f:
+            manifest = json.load(f)
+
+        if manifest.get('version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported columnar cache version {manifest.get('version')} in {self.path}")
+
+        self._length = int(manifest['length'])
+        self._specs = {c['name']: c for c in manifest['columns']}
+        self._arrays: Dict[str, np.ndarray] = {}
+
+    @staticmethod
+    def exists(path) -> bool:
+        return (Path(path) / MANIFEST_NAME).exists()
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self._specs)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def column(self, name: str) -> np.ndarray:
+        if name not in self._arrays:
+            spec = self._specs[name]
+            dtype = np.dtype(spec['dtype'])
+            if self._length == 0:
+                self._arrays[name] = np.empty(0, dtype=dtype)
+            else:
+                # copy-on-write mapping: callers can scribble on the frame without touching the cache file
+                mapped = np.memmap(self.path / spec['file'], dtype=dtype, mode='c', shape=(self._length,))
+                self._arrays[name] = mapped.view(np.ndarray)
+        return self._arrays[name]
+
+    def to_frame(self, columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        names = self.columns if columns is None else [c for c in columns if c in self._specs]
+        return pd.DataFrame({name: self.column(name) for name in names}, copy=False)
+
+
+def swap_into(tmp_path: Path, path: Path) -> None:
+    """Move the finished directory `tmp_path` to `path`, replacing whatever is there.
+
+    The old directory is renamed away before it's deleted, so readers and other
+    writers only ever see a complete entry or none. If another writer lands its
+    copy in between, theirs is kept and ours thrown away.
+    """
+    old = None
+    if path.exists():
+        old = Path(tempfile.mkdtemp(dir=path.parent, prefix=f"{path.name}.tmp-old-"))
+        try:
+            os.replace(path, old / path.name)
+        except FileNotFoundError:  # someone else moved it first
+            pass
+    try:
+        os.replace(tmp_path, path)
+    except OSError:
+        if not path.exists():
+            raise
+        shutil.rmtree(tmp_path, ignore_errors=True)
+    if old is not None:
+        shutil.rmtree(old, ignore_errors=True)
+
+
+def write_columnar(df: pd.DataFrame, path) -> Path:
+    writer = ColumnarWriter(path)
+    try:
+        writer.append(df)
+        return writer.close()
+    except Exception:
+        writer.abort()
+        raise
+
+
+def read_columnar(path, columns: Optional[Iterable[str]] = None) -> Optional[pd.DataFrame]:
+    try:
+        return ColumnarStore(path).to_frame(columns)
+    except Exception as e:
+        logging.error(f"Error reading columnar cache {path}: {e}")
+        return None
+
+
+class ColumnarFrame:
+    """Lazy, frame-like handle over a ColumnarStore, for data too big to hold in memory.
+
+    Slicing (by rows or by time range) only moves two row offsets around, nothing is
+    read until a column is actually asked for, and even then it's a memory-mapped view.
+    Time slicing expects the time column to be sorted, which the tick files are.
+    """
+
+    def __init__(self, store: ColumnarStore, columns: Optional[Iterable[str]] = None,
+                 start: int = 0, stop: Optional[int] = None, time_column: str = 'timestamp'):
+        self.store = store
+        self._columns = store.columns if columns is None else [c for c in columns if c in store.columns]
+        self.start = start
+        self.stop = len(store) if stop is None else stop
+        self.time_column = time_column
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self._columns)
+
+    @property
+    def empty(self) -> bool:
+        return len(self) == 0
+
+    def __len__(self) -> int:
+        return self.stop - self.start
+
+    def __getitem__(self, name: str) -> pd.Series:
+        if name not in self._columns:
+            raise KeyError(name)
+        return pd.Series(self.store.column(name)[self.start:self.stop], name=name, copy=False)
+
+    def rows(self, start: int, stop: Optional[int] = None) -> 'ColumnarFrame':
+        """Positional slice, like df.iloc[start:stop]."""
+        first, last, _ = slice(start, stop).indices(len(self))
+        return ColumnarFrame(self.store, self._columns, self.start + first,
+                             self.start + max(first, last), self.time_column)
+
+    def between(self, start=None, end=None) -> 'ColumnarFrame':
+        """Rows with start <= time < end, found by binary search on the mapped time column."""
+        times = self.store.column(self.time_column)[self.start:self.stop]
+        first = 0 if start is None else int(np.searchsorted(times, _as_time(start, times.dtype), 'left'))
+        last = len(times) if end is None else int(np.searchsorted(times, _as_time(end, times.dtype), 'left'))
+        return self.rows(first, max(first, last))
+
+    def to_frame(self, columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        names = self._columns if columns is None else [c for c in columns if c in self._columns]
+        return pd.DataFrame({name: self.store.column(name)[self.start:self.stop] for name in names},
+                            index=pd.RangeIndex(self.start, self.stop), copy=False)
+
+    def iter_chunks(self, chunk_rows: int = 500000) -> Iterable[pd.DataFrame]:
+        for offset in range(0, len(self), chunk_rows):
+            yield self.rows(offset, offset + chunk_rows).to_frame()
+
+
+def _as_time(value, dtype: np.dtype):
+    if not np.issubdtype(dtype, np.datetime64):
+        return value
+    return to_session_time(value).astype(dtype)
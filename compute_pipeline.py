@@ -0,0 +1,207 @@
+import os
+import logging
+import threading
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass, field
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from aggregate_store import AggregateStore, summarize
+from data_loader import MarketDataLoader
+from price_prediction import predict_price_changes
+from plot_lod import downsample_band
+from rolling_stats import rolling_time_std
+from trading_strategy import TradingStrategy, calculate_trading_metrics
+
+# stage names, in the order a stock's worker runs them
+STAGE_MARKET = 'market'
+STAGE_STD = 'std'
+STAGE_PREDICTIONS = 'predictions'
+STAGE_PNL = 'pnl'
+STAGE_TRADES = 'trades'
+STAGE_AGGREGATES = 'aggregates'  # session summary + 1m bars from the aggregate store, never loads ticks
+MARKET_STAGES = (STAGE_MARKET, STAGE_STD, STAGE_PREDICTIONS, STAGE_PNL)
+
+
+@dataclass
+class ComputeJob:
+    generation: int
+    period: str
+    stages: Dict[str, List[str]]  # stock -> stages to run for it
+    market_columns: List[str]
+    std_windows: List[int] = field(default_factory=list)
+    cancelled: threading.Event = field(default_factory=threading.Event)
+
+    @property
+    def total_stages(self) -> int:
+        return sum(len(stages) for stages in self.stages.values())
+
+
+class ComputeSignals(QObject):
+    """Lives on the UI thread, so everything emitted from the workers is delivered there queued."""
+    stage_started = pyqtSignal(int, str, str)  # generation, stock, stage
+    result_ready = pyqtSignal(int, str, str, object)  # generation, stock, stage, payload
+    stage_failed = pyqtSignal(int, str, str, str)  # generation, stock, stage, message
+    progress = pyqtSignal(int, int, int)  # generation, stages done, stages total
+    finished = pyqtSignal(int, bool)  # generation, cancelled
+
+
+class ComputePipeline:
+    """Runs loading, predictions, PnL and std bands on a thread pool, off the Qt UI thread.
+
+    Workers never touch matplotlib or widgets, every result goes back through
+    ComputeSignals and gets drawn by the UI thread. Submitting a new job, or
+    cancel(), cancels the previous one: its workers stop at the next stage
+    boundary and whatever they still emit carries an old generation number the
+    UI ignores.
+    """
+
+    STD_CACHE_PERIODS = 2  # a full-length float64 array per (stock, window), so keep just a couple of periods
+
+    def __init__(self, data_loader: MarketDataLoader, base_dir: str, max_workers: Optional[int] = None,
+                 aggregates: Optional[AggregateStore] = None):
+        self.data_loader = data_loader
+        self.base_dir = base_dir
+        self.aggregates = aggregates or AggregateStore(
+            AggregateStore.default_path(data_loader.cache_dir, base_dir), data_loader)
+        self.signals = ComputeSignals()
+        # period -> {(stock, window seconds) -> rolling std}, only the STD_CACHE_PERIODS most recently used periods
+        self.std_cache: Dict[str, Dict[Tuple[str, int], np.ndarray]] = OrderedDict()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or min(8, os.cpu_count() or 1))
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._current: Optional[ComputeJob] = None
+        self._remaining: Dict[int, int] = {}
+        self._done: Dict[int, int] = {}
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def submit(self, period: str, stages: Dict[str, List[str]], market_columns: List[str],
+               std_windows: Optional[List[int]] = None) -> int:
+        """Cancel whatever is running and start computing `stages` for each stock."""
+        self.cancel()
+        job = ComputeJob(self._generation, period, {s: st for s, st in stages.items() if st},
+                         market_columns, list(std_windows or []))
+        self._current = job
+
+        if not job.stages:
+            self.signals.finished.emit(job.generation, False)
+            return job.generation
+
+        with self._lock:
+            self._remaining[job.generation] = len(job.stages)
+            self._done[job.generation] = 0
+        for stock, stock_stages in job.stages.items():
+            self._executor.submit(self._run_stock, job, stock, stock_stages)
+        return job.generation
+
+    def cancel(self) -> None:
+        """Stop the current job. Bumps the generation, so results it already queued get ignored too."""
+        if self._current is not None:
+            self._current.cancelled.set()
+            self._current = None
+        self._generation += 1
+
+    def shutdown(self) -> None:
+        self.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run_stock(self, job: ComputeJob, stock: str, stages: List[str]) -> None:
+        data_dir = os.path.join(self.base_dir, 'TrainingData', job.period, stock)
+        market_data = None
+        try:
+            for stage in stages:
+                if job.cancelled.is_set():
+                    return
+                self.signals.stage_started.emit(job.generation, stock, stage)
+                try:
+                    if stage in MARKET_STAGES and market_data is None:
+                        market_data = self.data_loader.load_market_data(data_dir, stock, columns=job.market_columns)
+                    payload = self._run_stage(job, stock, stage, data_dir, market_data)
+                except Exception as e:
+                    logging.error(f"{stage} failed for {job.period}/{stock}: {e}")
+                    self.signals.stage_failed.emit(job.generation, stock, stage, str(e))
+                    payload = None
+
+                if payload is not None and not job.cancelled.is_set():
+                    self.signals.result_ready.emit(job.generation, stock, stage, payload)
+                self._stage_done(job)
+        finally:
+            with self._lock:
+                self._remaining[job.generation] -= 1
+                last = self._remaining[job.generation] == 0
+                if last:
+                    del self._remaining[job.generation]
+                    del self._done[job.generation]
+            if last:
+                self.signals.finished.emit(job.generation, job.cancelled.is_set())
+
+    def _stage_done(self, job: ComputeJob) -> None:
+        with self._lock:
+            self._done[job.generation] += 1
+            done = self._done[job.generation]
+        self.signals.progress.emit(job.generation, done, job.total_stages)
+
+    def _run_stage(self, job: ComputeJob, stock: str, stage: str, data_dir: str,
+                   market_data: Optional[pd.DataFrame]):
+        if stage == STAGE_TRADES:
+            return self.data_loader.load_trade_data(data_dir, stock)
+        if stage == STAGE_AGGREGATES:
+            bars = self.aggregates.bars(data_dir, job.period, stock, '1m')
+            if bars is None or bars.empty:
+                return None
+            return summarize(bars, self.aggregates.bars(data_dir, job.period, stock, '1m', 'trade')), bars
+        if market_data is None or market_data.empty:
+            return None
+        if stage == STAGE_MARKET:
+            return market_data
+        if stage == STAGE_STD:
+            return self.compute_std_bands(market_data, job.period, stock, job.std_windows)
+        if stage == STAGE_PREDICTIONS:
+            prediction_data = predict_price_changes(market_data)
+            if prediction_data is None or prediction_data.empty:
+                return None
+            return prediction_data, market_data['timestamp'].iloc[-1]
+        if stage == STAGE_PNL:
+            strategy = TradingStrategy()
+            pnl_data = strategy.calculate_pnl(market_data)
+            if pnl_data is None or pnl_data.empty:
+                return None
+            return pnl_data, calculate_trading_metrics(pnl_data, strategy.trades)
+        raise ValueError(f"Unknown stage {stage!r}")
+
+    def compute_std_bands(self, market_data: pd.DataFrame, period: str, stock: str,
+                          windows: List[int]) -> Dict[int, Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """Downsampled (x, lower, upper) bid +- rolling std band per window, std cached per (period, stock, window)."""
+        bid_price = market_data['bidPrice'].to_numpy()
+        timestamps = market_data['timestamp'].to_numpy()
+        bands = {}
+        for window_seconds in windows:
+            std_dev = self._cached_std(period, (stock, window_seconds))
+            if std_dev is None:
+                timestamps_ns = timestamps.astype('datetime64[ns]').view('int64')
+                std_dev = rolling_time_std(timestamps_ns, bid_price, window_seconds * 1_000_000_000)
+                self._cache_std(period, (stock, window_seconds), std_dev)
+            bands[window_seconds] = downsample_band(timestamps, bid_price - std_dev, bid_price + std_dev)
+        return bands
+
+    def _cached_std(self, period: str, key: Tuple[str, int]) -> Optional[np.ndarray]:
+        with self._lock:
+            entries = self.std_cache.get(period)
+            if entries is None:
+                return None
+            self.std_cache.move_to_end(period)
+            return entries.get(key)
+
+    def _cache_std(self, period: str, key: Tuple[str, int], std_dev: np.ndarray) -> None:
+        # workers of one job share a period, so a new period evicts the least recently used ones
+        with self._lock:
+            self.std_cache.setdefault(period, {})[key] = std_dev
+            self.std_cache.move_to_end(period)
+            while len(self.std_cache) > self.STD_CACHE_PERIODS:
+                self.std_cache.popitem(last=False)
@@ -1,13 +1,19 @@
 import os
 import pandas as pd
 import logging
-from typing import Optional, Iterator, Dict
+from typing import Optional, Iterator, Dict, List, Tuple, Union
 from datetime import datetime
 import numpy as np
 from pathlib import Path
 from functools import lru_cache
 import pickle
-from hashlib import md5
+import time
+import shutil
+import tempfile
+from cache_manager import CacheManager
+from columnar_cache import ColumnarStore, ColumnarWriter, ColumnarFrame, write_columnar
+from timestamp_parser import parse_timestamp_column
+from time_index import SparseTimeIndex, read_time_window
 
 logging.basicConfig(
     level=logging.ERROR,
@@ -16,146 +22,337 @@ logging.basicConfig(
 
 class MarketDataLoader:
     CHUNK_SIZE = 500000  #Play around with this!!! the optimal value will depend on hardware :)
+    # parse-time dtypes, the column names have to match the CSV headers or read_csv silently falls back to int64/float64.
+    # volumes stay int32: read_csv wraps around instead of raising when a value overflows a narrower int
     DTYPE_MAP = {
         'timestamp': 'str',
         'bidPrice': 'float32',
         'askPrice': 'float32',
-        'bidQuantity': 'int32',
-        'askQuantity': 'int32'
+        'bidVolume': 'int32',
+        'askVolume': 'int32'
     }
+    TRADE_DTYPE_MAP = {
+        'timestamp': 'str',
+        'price': 'float32',
+        'volume': 'int32'
+    }
+    FEEDS = {  # feed -> (file/cache name prefix, schema)
+        'market': ('market_data', DTYPE_MAP),
+        'trade': ('trade_data', TRADE_DTYPE_MAP),
+    }
+    SCHEMA_VERSION = 2  # part of every cache key, bump it when a schema changes so old entries stop matching
+    CACHE_FORMATS = ('columnar', 'pickle')
+    TIMESTAMP_PARSERS = ('fast', 'pandas')  # 'fast' = vectorized fixed-width byte parser, keeps full ns precision
+    DEFAULT_MEMORY_BUDGET = int(7e9)  # bytes of parsed chunks held in memory before spilling to disk
     
-    def __init__(self, cache_dir: Optional[str] = None):
+    def __init__(self, cache_dir: Optional[str] = None, cache_format: str = 'columnar', timestamp_parser: str = 'fast',
+                 cache_max_bytes: Optional[int] = CacheManager.DEFAULT_MAX_BYTES,
+                 memory_budget: Optional[int] = DEFAULT_MEMORY_BUDGET, spill_dir: Optional[str] = None):
+        if cache_format not in self.CACHE_FORMATS:
+            raise ValueError(f"Unknown cache format {cache_format!r}, expected one of {self.CACHE_FORMATS}")
+        if timestamp_parser not in self.TIMESTAMP_PARSERS:
+            raise ValueError(f"Unknown timestamp parser {timestamp_parser!r}, expected one of {self.TIMESTAMP_PARSERS}")
         self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.cache_format = cache_format
+        self.timestamp_parser = timestamp_parser
+        self.cache_max_bytes = cache_max_bytes
+        self.memory_budget = memory_budget  # None = never spill
+        self.spill_dir = spill_dir  # for spills without a columnar cache, default is the system temp dir
+        self.cache: Optional[CacheManager] = None
+        self._time_indexes: Dict[Tuple[str, int, int], SparseTimeIndex] = {}  # (csv path, size, mtime_ns) -> index
         self._setup_cache()
     
     def _setup_cache(self) -> None:
         if self.cache_dir:
-            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            self.cache = CacheManager(self.cache_dir, self.cache_max_bytes)
             
-    def _get_data_hash(self, data_dir: str, stock: str) -> str:
-        files = self._get_file_list(data_dir, stock)
-        hash_content = []
-        
-        for file in files: #might be flawed, tried to make a unique hash based on file metadata
-            file_path = Path(data_dir) / file
-            try:
-                mtime = os.path.getmtime(file_path)
-                size = os.path.getsize(file_path)
-                hash_content.append(f"{file}:{mtime}:{size}")
-            except OSError:
-                continue
-                
-        return md5(":".join(hash_content).encode()).hexdigest()
+    def _get_data_hash(self, data_dir: str, stock: str, feed: str = 'market') -> str:
+        # content based (sampled blocks + size), so touching or re-copying the CSVs keeps the key
+        files = [Path(data_dir) / file for file in self._get_file_list(data_dir, stock, feed)]
+        schema = ",".join(f"{col}:{dtype}" for col, dtype in self.FEEDS[feed][1].items())
+        return self.cache.key(files, salt=f"v{self.SCHEMA_VERSION}|{schema}")
+
+    def cache_stats(self) -> Dict:
+        """Cache hits, misses, bytes and load time (empty without a cache dir)."""
+        return self.cache.stats() if self.cache else {}
     
-    @staticmethod
-    def _parse_timestamp(df: pd.DataFrame) -> pd.DataFrame:
-        df['timestamp'] = pd.to_datetime(df['timestamp'], format='%H:%M:%S.%f')
+    def _parse_timestamp(self, df: pd.DataFrame) -> pd.DataFrame:
+        df['timestamp'] = parse_timestamp_column(df['timestamp'], self.timestamp_parser)
         return df
     
-    def _get_cached_path(self, data_dir: str, stock: str) -> Optional[Path]:
+    def _get_cached_path(self, data_dir: str, stock: str, feed: str = 'market') -> Optional[Path]:
         if not self.cache_dir:
             return None
-        data_hash = self._get_data_hash(data_dir, stock)
-        return self.cache_dir / f"market_data_{stock}_{data_hash}.pkl"
+        data_hash = self._get_data_hash(data_dir, stock, feed)
+        return self.cache_dir / f"{self.FEEDS[feed][0]}_{stock}_{data_hash}.pkl"
+
+    def _get_columnar_path(self, data_dir: str, stock: str, feed: str = 'market') -> Optional[Path]:
+        if not self.cache_dir:
+            return None
+        data_hash = self._get_data_hash(data_dir, stock, feed)
+        return self.cache_dir / f"{self.FEEDS[feed][0]}_{stock}_{data_hash}"
     
     @lru_cache(maxsize=32) #caps to 32 file lists to avoid repeated directry scns
-    def _get_file_list(self, data_dir: str, stock: str) -> list:
+    def _get_file_list(self, data_dir: str, stock: str, feed: str = 'market') -> list:
+        prefix = self.FEEDS[feed][0]
         try:
             return sorted(
                 f for f in os.listdir(data_dir)
-                if f.startswith(f"market_data_{stock}") and f.endswith('.csv')
+                if f.startswith(f"{prefix}_{stock}") and f.endswith('.csv')
             )
         except FileNotFoundError:
             logging.error(f"Directory not found: {data_dir}")
             return []
     
+    def load_chunks(self, data_dir: str, stock: str, feed: str = 'market') -> Iterator[pd.DataFrame]:
+        """Stream a feed's CSVs in CHUNK_SIZE rows, already in their schema dtypes with parsed timestamps."""
+        for file in self._get_file_list(data_dir, stock, feed):
+            try:
+                yield from self.read_file_chunks(Path(data_dir) / file, feed)
+            except Exception as e:
+                logging.error(f"Error reading file {Path(data_dir) / file}: {e}")
+
+    def read_file_chunks(self, file_path: Path, feed: str = 'market') -> Iterator[pd.DataFrame]:
+        """One CSV of a feed in CHUNK_SIZE rows. Read errors propagate, so a truncated read never looks like a whole file."""
+        dtype = self.FEEDS[feed][1]
+        for chunk in pd.read_csv(
+            file_path,
+            dtype=dtype,
+            usecols=list(dtype),
+            chunksize=self.CHUNK_SIZE,
+            engine='c'
+        ):
+            yield self._parse_timestamp(chunk)
+
     def load_market_data_chunks(self, data_dir: str, stock: str) -> Iterator[pd.DataFrame]:
-        files = self._get_file_list(data_dir, stock)
-        if not files:
-            return
-        
-        for file in files:
+        return self.load_chunks(data_dir, stock, 'market')
+
+    def _time_index(self, csv_path: Path) -> SparseTimeIndex:
+        """Sparse time index of one CSV, persisted next to the cache entries (keyed by content) if there's a cache."""
+        st = csv_path.stat()
+        memo_key = (str(csv_path), st.st_size, st.st_mtime_ns)
+        index = self._time_indexes.get(memo_key)
+        if index is not None:
+            return index
+
+        index_path = None
+        if self.cache:
+            index_path = self.cache_dir / f"time_index_{csv_path.stem}_{self.cache.key([csv_path])}.npz"
+            if index_path.exists():
+                try:
+                    index = SparseTimeIndex.load(index_path)
+                except Exception as e:
+                    logging.error(f"Error reading time index {index_path}: {e}")
+        if index is None:
+            index = SparseTimeIndex.build(csv_path)
+            if index_path is not None:
+                try:
+                    index.save(index_path)
+                except OSError as e:
+                    logging.error(f"Error writing time index {index_path}: {e}")
+        self._time_indexes[memo_key] = index
+        return index
+
+    def load_market_data(self, data_dir: str, stock: str, columns: Optional[List[str]] = None,
+                         lazy: bool = False, start=None, end=None) -> Optional[Union[pd.DataFrame, ColumnarFrame]]:
+        """Load a period's market data, from cache when possible. See load_feed."""
+        return self.load_feed(data_dir, stock, 'market', columns, lazy, start, end)
+
+    def load_trade_data(self, data_dir: str, stock: str, columns: Optional[List[str]] = None,
+                        lazy: bool = False, start=None, end=None) -> Optional[Union[pd.DataFrame, ColumnarFrame]]:
+        """Load a period's trades, from cache when possible. See load_feed."""
+        return self.load_feed(data_dir, stock, 'trade', columns, lazy, start, end)
+
+    def load_feed(self, data_dir: str, stock: str, feed: str = 'market', columns: Optional[List[str]] = None,
+                  lazy: bool = False, start=None, end=None) -> Optional[Union[pd.DataFrame, ColumnarFrame]]:
+        """Load one feed ('market' or 'trade') of a period, from cache when possible.
+
+        With the columnar cache only the requested ``columns`` are mapped in, the
+        pickle cache always loads the whole frame.
+        Data that outgrows ``memory_budget`` while loading is spilled to a columnar
+        store on disk instead of being cut off, and comes back memory mapped.
+        ``lazy=True`` returns a ColumnarFrame handle (sliceable by time) instead of
+        a DataFrame.
+
+        With ``start``/``end`` (timestamps or bare 'HH:MM:SS' strings, end exclusive)
+        only that window is read: a binary search on the cached entry, or the
+        indexed byte range of the CSVs when nothing is cached yet. Windows keep the
+        row numbers of the full load, except lazy ones read from CSV, which hold
+        just the window and count from 0.
+        """
+        if feed not in self.FEEDS:
+            raise ValueError(f"Unknown feed {feed!r}, expected one of {tuple(self.FEEDS)}")
+        if not self._get_file_list(data_dir, stock, feed):
+            logging.warning(f"No {self.FEEDS[feed][0]} files for {stock} in {data_dir}")  # common, plenty of periods lack a feed
+            return None
+
+        if start is not None or end is not None:
+            return self._load_window(data_dir, stock, feed, columns, lazy, start, end)
+
+        data = self._load_store_or_frame(data_dir, stock, feed, columns)
+        if data is None:
+            return None
+
+        if isinstance(data, pd.DataFrame):
+            if not lazy:
+                return self._select_columns(data, columns)
+            data = self._spill_frame(data, data_dir, stock, feed)
+        return ColumnarFrame(data, columns) if lazy else data.to_frame(columns)
+
+    def _load_window(self, data_dir: str, stock: str, feed: str, columns: Optional[List[str]],
+                     lazy: bool, start, end) -> Optional[Union[pd.DataFrame, ColumnarFrame]]:
+        columnar_path = self._get_columnar_path(data_dir, stock, feed)
+        if columnar_path and ColumnarStore.exists(columnar_path):
+            try:
+                started = time.perf_counter()
+                frame = ColumnarFrame(ColumnarStore(columnar_path), columns).between(start, end)
+                self.cache.record_hit(columnar_path, time.perf_counter() - started,
+                                      sum(frame[name].nbytes for name in frame.columns))
+                return frame if lazy else frame.to_frame()
+            except Exception as e:
+                logging.error(f"Error reading columnar cache {columnar_path}: {e}")
+
+        parts = []
+        row_offset = 0
+        dtype = self.FEEDS[feed][1]
+        for file in self._get_file_list(data_dir, stock, feed):
             file_path = Path(data_dir) / file
             try:
-                for chunk in pd.read_csv(
-                    file_path,
-                    dtype=self.DTYPE_MAP,
-                    chunksize=self.CHUNK_SIZE,
-                    engine='c'
-                ):
-                    chunk = self._parse_timestamp(chunk)
-                    #downcasts to smaller data types (if possible) should optimize memory :)
-                    for col in chunk.select_dtypes(include=['float64']).columns:
-                        chunk[col] = pd.to_numeric(chunk[col], downcast='float')
-                    for col in chunk.select_dtypes(include=['int64']).columns:
-                        chunk[col] = pd.to_numeric(chunk[col], downcast='integer')
-                    yield chunk
-                    
+                index = self._time_index(file_path)
             except Exception as e:
-                logging.error(f"Error reading file {file_path}: {e}")
-    
-    def load_market_data(self, data_dir: str, stock: str) -> Optional[pd.DataFrame]:
-        cached_path = self._get_cached_path(data_dir, stock)
-        
-        if cached_path and cached_path.exists():
+                logging.error(f"Error indexing {file_path}: {e}")
+                return None
+            part = read_time_window(file_path, index, start, end, dtype, self.timestamp_parser)
+            if part is None:
+                return None
+            part.index = part.index + row_offset  # row numbers of the full, concatenated load
+            parts.append(part[[c for c in part.columns if c in dtype]])
+            row_offset += index.n_rows
+
+        if not parts:
+            return None
+        result = self._select_columns(pd.concat(parts), columns)
+        if not lazy:
+            return result
+        path, cached = self._spill_path(data_dir, stock, feed, cacheable=False)
+        write_columnar(result, path)
+        return ColumnarFrame(self._open_spill(path, cached))
+
+    def _load_store_or_frame(self, data_dir: str, stock: str, feed: str,
+                             columns: Optional[List[str]]) -> Optional[Union[pd.DataFrame, ColumnarStore]]:
+        columnar_path = self._get_columnar_path(data_dir, stock, feed)
+        cached_path = self._get_cached_path(data_dir, stock, feed)
+
+        if columnar_path and self.cache_format == 'columnar' and ColumnarStore.exists(columnar_path):
+            try:
+                start = time.perf_counter()
+                store = ColumnarStore(columnar_path)
+                names = store.columns if columns is None else [c for c in columns if c in store.columns]
+                self.cache.record_hit(columnar_path, time.perf_counter() - start,
+                                      sum(store.column(name).nbytes for name in names))
+                return store
+            except Exception as e:
+                logging.error(f"Error reading columnar cache {columnar_path}: {e}")
+
+        if cached_path and self.cache_format == 'pickle' and cached_path.exists():
             try:
+                start = time.perf_counter()
                 with cached_path.open('rb') as f:
-                    return pickle.load(f)
+                    result = pickle.load(f)
+                self.cache.record_hit(cached_path, time.perf_counter() - start)
+                return result
             except Exception as e:
                 logging.error(f"Error reading cache {cached_path}: {e}")
-        
+
+        if self.cache:
+            self.cache.record_miss()
+
         chunks = []
         total_size = 0
-        max_memory = 7e9  #limits max memory (7Gb)
-        
-        for chunk in self.load_market_data_chunks(data_dir, stock):
-            chunk_size = chunk.memory_usage(deep=True).sum()
-            if total_size + chunk_size > max_memory:
-                logging.warning("Memory limit reached, spooky shenanigans could happen now :(")
-                break
-            chunks.append(chunk)
-            total_size += chunk_size
-            
+        writer = None
+        spill_path = None
+
+        try:
+            for chunk in self.load_chunks(data_dir, stock, feed):
+                if writer is not None:
+                    writer.append(chunk)
+                    continue
+
+                chunks.append(chunk)
+                total_size += chunk.memory_usage(deep=True).sum()
+                if self.memory_budget is not None and total_size > self.memory_budget:
+                    spill_path, cached = self._spill_path(data_dir, stock, feed)
+                    logging.warning(f"{stock} in {data_dir} is over the {self.memory_budget / 1e9:.2f}GB memory budget, "
+                                    f"spilling to {spill_path}")
+                    writer = ColumnarWriter(spill_path)
+                    for spilled in chunks:
+                        writer.append(spilled)
+                    chunks = []
+        except Exception:
+            if writer is not None:
+                writer.abort()
+            raise
+
+        if writer is not None:
+            writer.close()
+            return self._open_spill(spill_path, cached)
+
         if not chunks:
             return None
-            
+
         result = pd.concat(chunks, ignore_index=True)
-        
-        # Cache results
-        if cached_path:
+        self._write_cache(result, data_dir, stock, feed)
+        return result
+
+    def _spill_path(self, data_dir: str, stock: str, feed: str, cacheable: bool = True) -> Tuple[Path, bool]:
+        """Where an out-of-core load goes: straight into the columnar cache if there is one, else a temp dir."""
+        if cacheable and self.cache_dir and self.cache_format == 'columnar':
+            return self._get_columnar_path(data_dir, stock, feed), True
+        prefix = f"{self.FEEDS[feed][0]}_{stock}_"
+        return Path(tempfile.mkdtemp(prefix=prefix, dir=self.spill_dir)) / 'data', False
+
+    def _open_spill(self, path: Path, cached: bool) -> ColumnarStore:
+        store = ColumnarStore(path)
+        if cached:
+            self.cache.record_store(path)
+        else:
+            # map every column, after that the files can go (the mappings keep the data alive)
+            for name in store.columns:
+                store.column(name)
+            shutil.rmtree(path.parent, ignore_errors=True)
+        return store
+
+    def _spill_frame(self, df: pd.DataFrame, data_dir: str, stock: str, feed: str) -> ColumnarStore:
+        columnar_path = self._get_columnar_path(data_dir, stock, feed)
+        if columnar_path and self.cache_format == 'columnar' and ColumnarStore.exists(columnar_path):
+            return ColumnarStore(columnar_path)
+        path, cached = self._spill_path(data_dir, stock, feed)
+        write_columnar(df, path)
+        return self._open_spill(path, cached)
+
+    def _write_cache(self, df: pd.DataFrame, data_dir: str, stock: str, feed: str = 'market') -> None:
+        if not self.cache_dir:
+            return
+
+        if self.cache_format == 'columnar':
+            cache_path = self._get_columnar_path(data_dir, stock, feed)
             try:
-                with cached_path.open('wb') as f:
-                    pickle.dump(result, f, protocol=4) 
+                write_columnar(df, cache_path)
             except Exception as e:
-                logging.error(f"Error writing cache {cached_path}: {e}")
-        
-        return result
+                logging.error(f"Error writing columnar cache {cache_path}: {e}")
+                return
+        else:
+            cache_path = self._get_cached_path(data_dir, stock, feed)
+            try:
+                with cache_path.open('wb') as f:
+                    pickle.dump(df, f, protocol=4)
+            except Exception as e:
+                logging.error(f"Error writing cache {cache_path}: {e}")
+                return
+        self.cache.record_store(cache_path)
 
     @staticmethod
-    def load_trade_data(data_dir: str, stock: str) -> Optional[pd.DataFrame]: #basically the same thing as load_market_data, could make the code more modular, unfortunately I don't fell like doing that rn
-        file_path = Path(data_dir) / f"trade_data_{stock}.csv"
-        
-        try:
-            df = pd.read_csv(
-                file_path,
-                dtype={
-                    'timestamp': 'str',
-                    'price': 'float32',
-                    'quantity': 'int32'
-                },
-                engine='c'
-            )
-            df['timestamp'] = pd.to_datetime(df['timestamp'], format='%H:%M:%S.%f')
-            
-            for col in df.select_dtypes(include=['float64']).columns:
-                df[col] = pd.to_numeric(df[col], downcast='float')
-            for col in df.select_dtypes(include=['int64']).columns:
-                df[col] = pd.to_numeric(df[col], downcast='integer')
-                
+    def _select_columns(df: pd.DataFrame, columns: Optional[List[str]]) -> pd.DataFrame:
+        if columns is None:
             return df
-        except FileNotFoundError:
-            logging.error(f"Trade data file not found: {file_path}")
-            return None
-        except Exception as e:
-            logging.error(f"Error reading trade data {file_path}: {e}")
-            return None
\ No newline at end of file
+        return df[[c for c in columns if c in df.columns]]
@@ -0,0 +1,291 @@
+import time
+import logging
+import threading
+import numpy as np
+import matplotlib.dates as mdates
+from collections import deque
+from matplotlib.lines import Line2D
+from typing import Callable, Dict, Optional, Tuple
+
+from replay_simulator import ReplayBatch, ReplaySimulator, ReplayStats
+
+# series name -> (feed, column) it's drawn from
+SERIES = {
+    'bid': ('market', 'bidPrice'),
+    'ask': ('market', 'askPrice'),
+    'trade': ('trade', 'price'),
+}
+SERIES_STYLES = {
+    'bid': {'linestyle': '-'},
+    'ask': {'linestyle': '--'},
+    'trade': {'linestyle': ':', 'alpha': 0.7},
+}
+NS_PER_DAY = 86400 * 10 ** 9
+_EPOCH = float(mdates.date2num(np.datetime64(0, 'ns')))  # date number of ns 0, follows matplotlib's epoch setting
+
+
+class RingSeries:
+    """Fixed-size (x, y) ring buffer whose newest points are always one contiguous view.
+
+    Every point is written twice, at i and i + capacity, so the last `capacity`
+    points are buf[head:head + capacity] without wrapping or copying. x is kept
+    as matplotlib date numbers, converted in place as the points come in.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._x = np.full(2 * capacity, np.nan)
+        self._y = np.full(2 * capacity, np.nan)
+        self._head = 0  # next write position, also the oldest point once full
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def clear(self) -> None:
+        self._head = 0
+        self._size = 0
+
+    def extend(self, ns: np.ndarray, y: np.ndarray) -> None:
+        """Append int64 ns timestamps and their values, of a longer batch only the last `capacity` stay."""
+        n = len(ns)
+        if n > self.capacity:
+            ns, y = ns[-self.capacity:], y[-self.capacity:]
+            n = self.capacity
+        first = min(n, self.capacity - self._head)
+        self._write(self._head, ns[:first], y[:first])
+        if first < n:
+            self._write(0, ns[first:], y[first:])
+        self._head = (self._head + n) % self.capacity
+        self._size = min(self._size + n, self.capacity)
+
+    def _write(self, at: int, ns: np.ndarray, y: np.ndarray) -> None:
+        end = at + len(ns)
+        x = self._x[at:end]
+        x[:] = ns  # int64 -> float64 into the buffer, no temporaries
+        x *= 1 / NS_PER_DAY
+        x += _EPOCH
+        self._y[at:end] = y
+        self._x[at + self.capacity:end + self.capacity] = x
+        self._y[at + self.capacity:end + self.capacity] = self._y[at:end]
+
+    def view(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(x, y) of the buffered points, oldest first, as views into the buffer."""
+        start = self._head if self._size == self.capacity else 0
+        return self._x[start:start + self._size], self._y[start:start + self._size]
+
+
+class LivePlot:
+    """Blitted live chart of ring-buffered series on one axes.
+
+    Lines are created once as animated artists and only get their data swapped
+    each frame. Everything static (axes, ticks, legend, other artists) is
+    rendered into a cached background on every full draw, so a frame is restore
+    background, draw the lines, blit the axes box. Full draws only happen when
+    the data leaves the current limits (the x window jumps half its width at a
+    time) or the canvas redraws by itself, e.g. on resize.
+    """
+
+    def __init__(self, ax, capacity: int = 5000, window_seconds: float = 60.0, stats_frames: int = 120):
+        self.ax = ax
+        self.canvas = ax.figure.canvas
+        self.capacity = capacity
+        self.window = window_seconds / 86400
+        self.series: Dict[Tuple[str, str], RingSeries] = {}
+        self.lines: Dict[Tuple[str, str], Line2D] = {}
+        self._dirty = set()  # series with new points since the last frame
+        self._background = None
+        self._x_max = -np.inf
+        self._y_low = np.inf
+        self._y_high = -np.inf
+        # last `stats_frames` frame start times and durations, for fps and frame time
+        self._frame_starts = np.full(stats_frames, np.nan)
+        self._frame_seconds = np.full(stats_frames, np.nan)
+        self._frames = 0
+        self.full_draws = 0
+        self._cid = self.canvas.mpl_connect('draw_event', self._on_draw)
+
+    def add_series(self, stock: str, name: str, **kwargs) -> Line2D:
+        """Line for one stock's bid, ask or trade series, styled by series unless overridden."""
+        style = {'color': f'C{len(self.lines) // len(SERIES)}', **SERIES_STYLES.get(name, {}), **kwargs}
+        line, = self.ax.plot([], [], animated=True, label=f'{stock} {name.capitalize()} Price', **style)
+        self.series[(stock, name)] = RingSeries(self.capacity)
+        self.lines[(stock, name)] = line
+        return line
+
+    def feeds(self) -> Tuple[str, ...]:
+        """The feeds the added series need, in SERIES order."""
+        needed = {SERIES[name][0] for _, name in self.series}
+        return tuple(dict.fromkeys(feed for feed, _ in SERIES.values() if feed in needed))
+
+    def push(self, batch: ReplayBatch) -> None:
+        """Append a replay batch to the series it feeds. Cheap, drawing waits for the next frame."""
+        ns = None
+        for name, (feed, column) in SERIES.items():
+            ring = self.series.get((batch.stock, name))
+            if ring is None or feed != batch.feed or batch.data.empty:
+                continue
+            if ns is None:
+                ns = batch.data['timestamp'].to_numpy().astype('datetime64[ns]', copy=False).view(np.int64)
+                self._x_max = max(self._x_max, ns[-1] / NS_PER_DAY + _EPOCH)
+            y = batch.data[column].to_numpy()
+            ring.extend(ns, y)
+            self._y_low = min(self._y_low, float(np.nanmin(y)))
+            self._y_high = max(self._y_high, float(np.nanmax(y)))
+            self._dirty.add((batch.stock, name))
+
+    def draw_frame(self) -> bool:
+        """Draw whatever changed since the last frame, False if nothing did."""
+        if not self._dirty:
+            return False
+        start = time.perf_counter()
+        for key in self._dirty:
+            self.lines[key].set_data(*self.series[key].view())
+        self._dirty.clear()
+
+        if self._background is None or self._out_of_bounds():
+            self._rescale()
+            self.full_draws += 1
+            self.canvas.draw()  # _on_draw recaptures the background
+        else:
+            self.canvas.restore_region(self._background)
+            self._draw_lines()
+            self.canvas.blit(self.ax.bbox)
+
+        slot = self._frames % len(self._frame_starts)
+        self._frame_starts[slot] = start
+        self._frame_seconds[slot] = time.perf_counter() - start
+        self._frames += 1
+        return True
+
+    @property
+    def frames(self) -> int:
+        return self._frames
+
+    def frame_stats(self) -> Dict[str, float]:
+        """fps and frame time (ms) over the last frames."""
+        count = min(self._frames, len(self._frame_starts))
+        if count < 2:
+            return {'frames': self._frames, 'fps': 0.0, 'frame_ms': 0.0, 'max_frame_ms': 0.0, 'full_draws': self.full_draws}
+        starts = self._frame_starts[:count]
+        span = starts.max() - starts.min()
+        return {
+            'frames': self._frames,
+            'fps': float((count - 1) / span) if span > 0 else 0.0,
+            'frame_ms': float(np.mean(self._frame_seconds[:count]) * 1e3),
+            'max_frame_ms': float(np.max(self._frame_seconds[:count]) * 1e3),
+            'full_draws': self.full_draws,
+        }
+
+    def close(self) -> Dict[Tuple[str, str], Line2D]:
+        """Stop blitting and hand back the lines as ordinary (non-animated) artists."""
+        self.canvas.mpl_disconnect(self._cid)
+        self._background = None
+        for line in self.lines.values():
+            line.set_animated(False)
+        return self.lines
+
+    def _draw_lines(self) -> None:
+        for line in self.lines.values():
+            self.ax.draw_artist(line)
+
+    def _on_draw(self, event) -> None:
+        # the figure was just rendered without the animated lines: that's the new background
+        self._background = self.canvas.copy_from_bbox(self.ax.bbox)
+        self._draw_lines()
+
+    def _out_of_bounds(self) -> bool:
+        x0, x1 = self.ax.get_xlim()
+        y0, y1 = self.ax.get_ylim()
+        return self._x_max > x1 or self._y_low < y0 or self._y_high > y1
+
+    def _rescale(self) -> None:
+        # window ending half a window past the newest point, y padded around what's inside it
+        right = self._x_max + self.window / 2
+        left = right - self.window
+        low, high = np.inf, -np.inf
+        for ring in self.series.values():
+            x, y = ring.view()
+            visible = y[np.searchsorted(x, left):]
+            if len(visible):
+                low = min(low, float(np.nanmin(visible)))
+                high = max(high, float(np.nanmax(visible)))
+        if not np.isfinite(low):
+            return
+        pad = (high - low) * 0.1 or abs(high) * 0.001 or 1.0
+        self.ax.set_xlim(left, right)
+        self.ax.set_ylim(low - pad, high + pad)
+        self._y_low, self._y_high = low, high
+
+
+class LiveFeed:
+    """Runs a ReplaySimulator on a background thread; batches queue up for the UI thread to drain.
+
+    Every (stock, feed) gets its own queue of at most `max_batches` batches. When
+    the UI falls behind, a source's oldest batches get dropped (counted in
+    `dropped`) instead of piling up, the chart only shows the newest points anyway,
+    and the replay itself never waits on the UI.
+    """
+    name = 'live_feed'
+
+    def __init__(self, simulator: ReplaySimulator, max_batches: int = 64):
+        self.simulator = simulator
+        self.max_batches = max_batches
+        self.dropped = 0
+        self.stats: Optional[ReplayStats] = None
+        self._queues: Dict[Tuple[str, str], deque] = {}
+        self._thread: Optional[threading.Thread] = None
+        simulator.subscribe(self._put, self.name)
+
+    def __len__(self) -> int:
+        """Batches waiting to be drained."""
+        return sum(len(pending) for pending in list(self._queues.values()))
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name='live-replay', daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        try:
+            self.stats = self.simulator.run()
+        except Exception as e:
+            logging.error(f"Live replay failed: {e}")
+
+    def _put(self, batch: ReplayBatch) -> None:
+        # replay thread; deque appends are atomic and a full one drops its oldest
+        pending = self._queues.get((batch.stock, batch.feed))
+        if pending is None:
+            pending = self._queues.setdefault((batch.stock, batch.feed), deque(maxlen=self.max_batches))
+        if len(pending) == self.max_batches:
+            self.dropped += 1
+        pending.append(batch)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self.simulator.stop()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def drain(self, handler: Callable[[ReplayBatch], None], max_seconds: Optional[float] = None) -> int:
+        """Hand queued batches to `handler`, all of them or as many as fit in `max_seconds`. Returns how many.
+
+        Sources take turns one batch at a time, so a busy one can't starve the rest of the budget.
+        """
+        deadline = time.perf_counter() + max_seconds if max_seconds is not None else None
+        count = 0
+        while True:
+            handled = count
+            for pending in list(self._queues.values()):
+                if deadline is not None and time.perf_counter() >= deadline:
+                    return count
+                try:
+                    batch = pending.popleft()
+                except IndexError:
+                    continue
+                handler(batch)
+                count += 1
+            if count == handled:
+                return count
@@ -1,17 +1,20 @@
 import os
+from PyQt5.QtCore import Qt, QTimer
 from PyQt5.QtWidgets import (QMainWindow, QVBoxLayout, QHBoxLayout,
-                             QComboBox, QPushButton, QWidget, QCheckBox)
+                             QComboBox, QPushButton, QWidget, QCheckBox, QProgressBar)
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT
 import matplotlib.pyplot as plt
 from data_loader import MarketDataLoader
-from price_prediction import predict_price_changes
+from plot_lod import LODManager
+from live_plot import LiveFeed, LivePlot
+from replay_simulator import ReplaySimulator
+from compute_pipeline import (ComputePipeline, STAGE_MARKET, STAGE_STD, STAGE_PREDICTIONS,
+                              STAGE_PNL, STAGE_TRADES, STAGE_AGGREGATES)
 import pandas as pd
-from typing import Dict, Optional
+from typing import Dict, Optional, List, Tuple
+import numpy as np
 import gc
-from concurrent.futures import ThreadPoolExecutor
-
-from trading_strategy import TradingStrategy, calculate_trading_metrics
 
 
 class MarketDataViewer(QMainWindow):
@@ -22,12 +25,18 @@ class MarketDataViewer(QMainWindow):
         ('trades_check', "Trades", True),
         ('prediction_check', "Price Prediction", True),
         ('min_max_check', "Min/Max Lines", False),
+        ('overview_check', "1m Overview", False),
         ('std_dev_30s_check', "30s Std Dev", False),
         ('std_dev_60s_check', "60s Std Dev", False),
         ('pnl_check', "Show PNL", True),
         ('pnl_percent_check', "PNL as %", True)
     ]
     INITIAL_INVESTMENT = 1_000_000
+    LIVE_FPS = 30  # frame rate cap of the live view
+    LIVE_CAPACITY = 5000  # points kept per live series
+    LIVE_WINDOW_SECONDS = 60  # wall seconds of replay on screen, so the x axis scrolls (a full redraw) every half minute at any speed
+    LIVE_QUEUE_BATCHES = LIVE_FPS  # per stock and feed, about a second of batches before the oldest get dropped
+    LIVE_SPEEDS = {'1x': 1.0, '10x': 10.0, '60x': 60.0, '600x': 600.0}
 
     def __init__(self, cache_dir: Optional[str] = None):
         super().__init__()
@@ -36,6 +45,10 @@ class MarketDataViewer(QMainWindow):
         self.base_dir = os.path.dirname(os.path.abspath(__file__))
         self.plot_elements: Dict = {}
         self.data_loader = MarketDataLoader(cache_dir=cache_dir)
+        self.pipeline = ComputePipeline(self.data_loader, self.base_dir)
+        self._pending_state: Optional[Dict] = None  # toggle snapshot of the job in flight, applied once it finishes
+        self.live_plot: Optional[LivePlot] = None
+        self.live_feed: Optional[LiveFeed] = None
         self._setup_ui()
         self._connect_signals()
         self.last_prediction_state = self.prediction_check.isChecked()
@@ -45,6 +58,7 @@ class MarketDataViewer(QMainWindow):
         self.last_ask_price_state = self.ask_price_check.isChecked()
         self.last_trades_state = self.trades_check.isChecked()
         self.last_min_max_state = self.min_max_check.isChecked()
+        self.last_overview_state = self.overview_check.isChecked()
         self.last_std_dev_30s_state = self.std_dev_30s_check.isChecked()
         self.last_std_dev_60s_state = self.std_dev_60s_check.isChecked()
 
@@ -64,10 +78,20 @@ class MarketDataViewer(QMainWindow):
         self.figure, (self.ax_price, self.ax_pnl) = plt.subplots(2, 1, figsize=(12, 9), height_ratios=[2, 1])
         self.canvas = FigureCanvas(self.figure)
         self.toolbar = NavigationToolbar2QT(self.canvas, self)
+        self.price_lod = LODManager(self.ax_price)  # tick series get re-rendered for the visible range on zoom/pan
 
         main_layout.addWidget(self.toolbar)
         main_layout.addWidget(self.canvas)
 
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setMaximumWidth(250)
+        self.progress_bar.setVisible(False)
+        self.statusBar().addPermanentWidget(self.progress_bar)
+
+        self.live_timer = QTimer(self)
+        self.live_timer.setTimerType(Qt.PreciseTimer)
+        self.live_timer.setInterval(1000 // self.LIVE_FPS)
+
     def _create_controls_layout(self):
         layout = QHBoxLayout()
         self.period_combo = QComboBox()
@@ -75,8 +99,14 @@ class MarketDataViewer(QMainWindow):
         self.period_combo.setCurrentText("Period1")
 
         self.load_button = QPushButton("Load Data")
+        self.speed_combo = QComboBox()
+        self.speed_combo.addItems(list(self.LIVE_SPEEDS))
+        self.live_button = QPushButton("Go Live")
+        self.live_button.setCheckable(True)
         layout.addWidget(self.period_combo)
         layout.addWidget(self.load_button)
+        layout.addWidget(self.speed_combo)
+        layout.addWidget(self.live_button)
         return layout
 
     def _create_stock_layout(self):
@@ -98,6 +128,14 @@ class MarketDataViewer(QMainWindow):
 
     def _connect_signals(self):
         self.load_button.clicked.connect(self.load_and_plot_data)
+        self.period_combo.currentTextChanged.connect(self._on_period_changed)
+        self.live_button.toggled.connect(self.toggle_live)
+        self.live_timer.timeout.connect(self._on_live_frame)
+        self.pipeline.signals.stage_started.connect(self._on_stage_started)
+        self.pipeline.signals.result_ready.connect(self._on_result_ready)
+        self.pipeline.signals.stage_failed.connect(self._on_stage_failed)
+        self.pipeline.signals.progress.connect(self._on_progress)
+        self.pipeline.signals.finished.connect(self._on_compute_finished)
         for toggle_attr, _, _ in self.VISUALIZATION_TOGGLES:
             toggle = getattr(self, toggle_attr)
             toggle.stateChanged.connect(self.update_plot_visibility)
@@ -137,162 +175,212 @@ class MarketDataViewer(QMainWindow):
                                     (period != self.last_selected_period) or \
                                     min_max_changed
         
+        overview_changed = self.overview_check.isChecked() != self.last_overview_state
+        overview_need_update = (selected_stocks != self.last_selected_stocks) or \
+                                    (period != self.last_selected_period) or \
+                                    overview_changed
+        
         std_dev_changed = self.std_dev_60s_check.isChecked() != self.last_std_dev_60s_state or self.std_dev_30s_check.isChecked() != self.last_std_dev_30s_state
         std_dev_need_update = (selected_stocks != self.last_selected_stocks) or \
                                     (period != self.last_selected_period) or \
                                     std_dev_changed
 
 
-        self._clear_plots(not predictions_need_update, not pnl_need_update, not bid_price_need_update, not ask_price_need_update, not trades_need_update, not min_max_need_update, not std_dev_need_update)
-
-        with ThreadPoolExecutor() as executor:
-            futures = []
-
-            for stock in selected_stocks:
-                data_dir = os.path.join(self.base_dir, 'TrainingData', period, stock)
-
-                market_data = self.data_loader.load_market_data(data_dir, stock)
-                if market_data is not None:
-                    if self.bid_price_check.isChecked() and bid_price_need_update:
-                        futures.append(executor.submit(self._plot_bid_price, market_data, stock))
-                    if not bid_price_need_update:
-                        print("bids already updated")
-                    if self.ask_price_check.isChecked() and ask_price_need_update:
-                        futures.append(executor.submit(self._plot_ask_price, market_data, stock))
-                    if not ask_price_need_update:
-                        print("asks already updated")
-                    if self.min_max_check.isChecked() and min_max_need_update:
-                        futures.append(executor.submit(self._plot_min_max_lines, market_data, stock))
-                    if not min_max_need_update:
-                        print("min max already updated")
-                    if (self.std_dev_30s_check.isChecked() or self.std_dev_60s_check.isChecked()) and std_dev_need_update:
-                        futures.append(executor.submit(self._plot_standard_deviation, market_data, stock))
-                    if not std_dev_changed:
-                        print("std's are up to date")
-                    if self.prediction_check.isChecked()  and predictions_need_update: 
-                        futures.append(executor.submit(self._plot_predictions, market_data, stock))
-                    if not predictions_need_update:
-                        print("predictions already updated")
-                    if self.pnl_check.isChecked() and pnl_need_update: 
-                        futures.append(executor.submit(self._calculate_and_plot_pnl, market_data, stock))
-                    if not pnl_need_update:
-                        print("pnl already updated")
-
-                    del market_data
-                    gc.collect()
-                if self.trades_check.isChecked() and trades_need_update:
-                    trade_data = self.data_loader.load_trade_data(data_dir, stock)
-                    if trade_data is not None:
-                        futures.append(executor.submit(self._plot_trade_data,trade_data, stock))
-                        del trade_data
-                        gc.collect()
-                if not trades_need_update:
-                    print("trades already updated")
-                
-            for future in futures: 
-                future.result()  
+        self._clear_plots(not predictions_need_update, not pnl_need_update, not bid_price_need_update, not ask_price_need_update, not trades_need_update, not min_max_need_update, not std_dev_need_update, not overview_need_update)
+
+        # resolve every toggle here on the UI thread, the workers only get the stage list
+        market_needed = (self.bid_price_check.isChecked() and bid_price_need_update) or \
+                        (self.ask_price_check.isChecked() and ask_price_need_update)
+        # min/max and the overview come from the precomputed aggregates, not the ticks
+        aggregates_needed = (self.min_max_check.isChecked() and min_max_need_update) or \
+                            (self.overview_check.isChecked() and overview_need_update)
+        std_windows = [window for checkbox, window in ((self.std_dev_30s_check, 30), (self.std_dev_60s_check, 60))
+                       if checkbox.isChecked()]
+        stages = []
+        if aggregates_needed:
+            stages.append(STAGE_AGGREGATES)
+        if market_needed:
+            stages.append(STAGE_MARKET)
+        if std_windows and std_dev_need_update:
+            stages.append(STAGE_STD)
+        if self.prediction_check.isChecked() and predictions_need_update:
+            stages.append(STAGE_PREDICTIONS)
+        if self.pnl_check.isChecked() and pnl_need_update:
+            stages.append(STAGE_PNL)
+        if self.trades_check.isChecked() and trades_need_update:
+            stages.append(STAGE_TRADES)
+
+        self._pending_state = {
+            'selected_stocks': selected_stocks,
+            'period': period,
+            'draw_bid': self.bid_price_check.isChecked() and bid_price_need_update,
+            'draw_ask': self.ask_price_check.isChecked() and ask_price_need_update,
+            'draw_min_max': self.min_max_check.isChecked() and min_max_need_update,
+            'draw_overview': self.overview_check.isChecked() and overview_need_update,
+            'pnl_percent': self.pnl_percent_check.isChecked(),
+            'toggles': {attr: getattr(self, attr).isChecked() for attr, _, _ in self.VISUALIZATION_TOGGLES}
+        }
+        self.progress_bar.setValue(0)
+        self.progress_bar.setVisible(True)
+        self.pipeline.submit(period, {stock: list(stages) for stock in selected_stocks},
+                             self._required_market_columns(), std_windows)
+
+    def _on_period_changed(self, period: str):
+        if not self.progress_bar.isVisible():
+            return  # nothing loading, the next Load Data picks the new period up
+        self.pipeline.cancel()
+        self.progress_bar.setVisible(False)
+        self.statusBar().showMessage(f"Load cancelled, press Load Data for {period}", 5000)
+        # the cancelled load already cleared and partly redrew the plots, the next one has to redraw everything
+        self.last_selected_period = None
 
+    def _on_stage_started(self, generation: int, stock: str, stage: str):
+        if generation == self.pipeline.generation:
+            self.statusBar().showMessage(f"{self._pending_state['period']} {stock}: {stage}...")
+
+    def _on_progress(self, generation: int, done: int, total: int):
+        if generation == self.pipeline.generation:
+            self.progress_bar.setMaximum(total)
+            self.progress_bar.setValue(done)
+
+    def _on_stage_failed(self, generation: int, stock: str, stage: str, message: str):
+        if generation == self.pipeline.generation:
+            self.statusBar().showMessage(f"{stock} {stage} failed: {message}", 10000)
+
+    def _on_result_ready(self, generation: int, stock: str, stage: str, payload):
+        if generation != self.pipeline.generation:
+            return  # result of a load the user already moved away from
+        state = self._pending_state
+
+        if stage == STAGE_MARKET:
+            if state['draw_bid']:
+                self._plot_bid_price(payload, stock)
+            if state['draw_ask']:
+                self._plot_ask_price(payload, stock)
+        elif stage == STAGE_AGGREGATES:
+            summary, bars = payload
+            if state['draw_min_max']:
+                self._plot_min_max_lines(summary, stock)
+            if state['draw_overview']:
+                self._plot_overview(bars, stock)
+        elif stage == STAGE_STD:
+            self._plot_standard_deviation(payload, stock)
+        elif stage == STAGE_PREDICTIONS:
+            self._plot_predictions(*payload, stock)
+        elif stage == STAGE_PNL:
+            self._plot_pnl(*payload, stock, state['pnl_percent'])
+        elif stage == STAGE_TRADES:
+            self._plot_trade_data(payload, stock)
+        self.canvas.draw_idle()
+
+    def _on_compute_finished(self, generation: int, cancelled: bool):
+        if generation != self.pipeline.generation:
+            return
+        self.progress_bar.setVisible(False)
+        self.statusBar().clearMessage()
         self._update_plot_layout()
+        if cancelled:
+            return
 
         # Update tracking variables
-        self.last_selected_stocks = selected_stocks
-        self.last_selected_period = period
-        self.last_prediction_state = self.prediction_check.isChecked()
-        self.last_pnl_state = self.pnl_check.isChecked()
-        self.last_pnl_percent_state = self.pnl_percent_check.isChecked()
-        self.last_bid_price_state = self.bid_price_check.isChecked()
-        self.last_ask_price_state = self.ask_price_check.isChecked()
-        self.last_trades_state = self.trades_check.isChecked()
-        self.last_min_max_state = self.min_max_check.isChecked()
-        self.last_std_dev_30s_state = self.std_dev_30s_check.isChecked()
-        self.last_std_dev_60s_state = self.std_dev_60s_check.isChecked()
-
-
-    def _plot_market_data(self, market_data: pd.DataFrame, stock: str):
-        if market_data is None:
-            return
+        state = self._pending_state
+        toggles = state['toggles']
+        self.last_selected_stocks = state['selected_stocks']
+        self.last_selected_period = state['period']
+        self.last_prediction_state = toggles['prediction_check']
+        self.last_pnl_state = toggles['pnl_check']
+        self.last_pnl_percent_state = toggles['pnl_percent_check']
+        self.last_bid_price_state = toggles['bid_price_check']
+        self.last_ask_price_state = toggles['ask_price_check']
+        self.last_trades_state = toggles['trades_check']
+        self.last_min_max_state = toggles['min_max_check']
+        self.last_overview_state = toggles['overview_check']
+        self.last_std_dev_30s_state = toggles['std_dev_30s_check']
+        self.last_std_dev_60s_state = toggles['std_dev_60s_check']
+
+    def _set_element(self, key: str, artist):
+        """Store a plot element, dropping whatever a cancelled load left under the same key."""
+        old = self.plot_elements.pop(key, None)
+        if old is not None and old is not artist:
+            self.price_lod.discard(old)
+            try:
+                old.remove()
+            except (NotImplementedError, ValueError):
+                pass
+        self.plot_elements[key] = artist
 
+    def _required_market_columns(self) -> List[str]:
+        """Only map in the columns the enabled plots actually read."""
+        columns = set()
         if self.bid_price_check.isChecked():
-            line, = self.ax_price.plot(market_data['timestamp'],
-                                       market_data['bidPrice'],
-                                       label=f'{stock} Bid Price')
-            self.plot_elements[f'{stock}_bid'] = line
-
+            columns.update(('timestamp', 'bidPrice'))
         if self.ask_price_check.isChecked():
-            line, = self.ax_price.plot(market_data['timestamp'],
-                                       market_data['askPrice'],
-                                       label=f'{stock} Ask Price')
-            self.plot_elements[f'{stock}_ask'] = line
+            columns.update(('timestamp', 'askPrice'))
+        if self.std_dev_30s_check.isChecked() or self.std_dev_60s_check.isChecked():
+            columns.update(('timestamp', 'bidPrice'))
+        if self.prediction_check.isChecked():
+            columns.update(('timestamp', 'bidPrice'))
+        if self.pnl_check.isChecked():
+            columns.update(('timestamp', 'bidPrice', 'askPrice', 'bidVolume', 'askVolume'))
+        return [c for c in ('bidVolume', 'bidPrice', 'askVolume', 'askPrice', 'timestamp') if c in columns]
 
-    
     def _plot_bid_price(self, market_data: pd.DataFrame, stock: str):
         if market_data is None:
             return
 
-        if self.bid_price_check.isChecked():
-            line, = self.ax_price.plot(market_data['timestamp'],
-                                       market_data['bidPrice'],
-                                       label=f'{stock} Bid Price')
-            self.plot_elements[f'{stock}_bid'] = line
+        line = self.price_lod.plot(market_data['timestamp'],
+                                   market_data['bidPrice'],
+                                   label=f'{stock} Bid Price')
+        self._set_element(f'{stock}_bid', line)
 
     def _plot_ask_price(self, market_data: pd.DataFrame, stock: str):
         if market_data is None:
             return
-            
-        if self.ask_price_check.isChecked():
-            line, = self.ax_price.plot(market_data['timestamp'],
-                                       market_data['askPrice'],
-                                       label=f'{stock} Ask Price')
-            self.plot_elements[f'{stock}_ask'] = line
 
-    def _plot_min_max_lines(self, market_data: pd.DataFrame, stock: str):
-        if not self.min_max_check.isChecked():
-            return
+        line = self.price_lod.plot(market_data['timestamp'],
+                                   market_data['askPrice'],
+                                   label=f'{stock} Ask Price')
+        self._set_element(f'{stock}_ask', line)
 
-        min_max_values = market_data[['bidPrice', 'askPrice']].agg({'bidPrice': 'min', 'askPrice': 'max'})
-        min_price, max_price = min_max_values['bidPrice'], min_max_values['askPrice']
+    def _plot_min_max_lines(self, summary: Dict, stock: str):
+        min_price, max_price = summary['bid_low'], summary['ask_high']
 
         min_line = self.ax_price.axhline(y=min_price, color='red', linestyle=':',
                                      label=f'{stock} Min Price ({min_price:.2f})')
         max_line = self.ax_price.axhline(y=max_price, color='green', linestyle=':',
                                      label=f'{stock} Max Price ({max_price:.2f})')
 
-        self.plot_elements[f'{stock}_min'] = min_line
-        self.plot_elements[f'{stock}_max'] = max_line
-
-    def _plot_standard_deviation(self, market_data: pd.DataFrame, stock: str):
-        std_dev_configs = [
-            (self.std_dev_30s_check, 30, 'blue'),
-            (self.std_dev_60s_check, 60, 'red')
-        ]
-
-        for checkbox, window_seconds, color in std_dev_configs:
-            if not checkbox.isChecked():
-                continue
-
-            window_size = int(window_seconds * 1000)
-            std_dev = market_data['bidPrice'].rolling(window=window_size, min_periods=1).std() #I think Panda's has a faster rolling algo
-            lower_bound = market_data['bidPrice'] - std_dev
-            upper_bound = market_data['bidPrice'] + std_dev
-
-            fill = self.ax_price.fill_between( #I tested this, it is remarkably slow at filling, could consider downsampling or asynchronus ploting
-                market_data['timestamp'],
+        self._set_element(f'{stock}_min', min_line)
+        self._set_element(f'{stock}_max', max_line)
+
+    def _plot_overview(self, bars: pd.DataFrame, stock: str):
+        # 1m bars of the mid price: high-low range plus the closes, a few hundred points per session
+        price_range = self.ax_price.fill_between(bars['time'], bars['low'], bars['high'],
+                                                 color='gray', alpha=0.2, step='post',
+                                                 label=f'{stock} 1m Range')
+        line, = self.ax_price.plot(bars['time'], bars['close'], color='black', linewidth=1,
+                                   drawstyle='steps-post', label=f'{stock} 1m Close')
+        self._set_element(f'{stock}_overview_range', price_range)
+        self._set_element(f'{stock}_overview', line)
+
+    def _plot_standard_deviation(self, bands: Dict[int, Tuple[np.ndarray, np.ndarray, np.ndarray]], stock: str):
+        colors = {30: 'blue', 60: 'red'}
+
+        for window_seconds, (x, lower_bound, upper_bound) in bands.items():
+            self.ax_price.xaxis_date()
+            fill = self.ax_price.fill_between(
+                x,
                 lower_bound,
                 upper_bound,
                 alpha=0.2,
-                color=color,
+                color=colors.get(window_seconds, 'gray'),
                 label=f'{stock} {window_seconds}s Std Dev'
             )
-            self.plot_elements[f'{stock}_{window_seconds}s_std'] = fill
-
-    def _plot_predictions(self, market_data: pd.DataFrame, stock: str): #I don't think we need to extract timestamp and predicted_price multiple times, we could just extract the whole thing once
-        print("calculating predictions")
-        prediction_data = predict_price_changes(market_data)
-        if prediction_data is None or prediction_data.empty:
-            return
+            self._set_element(f'{stock}_{window_seconds}s_std', fill)
 
+    def _plot_predictions(self, prediction_data: pd.DataFrame, last_timestamp: pd.Timestamp, stock: str):
         line, = self.ax_price.plot(
-            prediction_data['timestamp'], #here we reaccess it every time, could just take out the thing above
+            prediction_data['timestamp'],
             prediction_data['predicted_price'],
             color='orange',
             linestyle='--',
@@ -300,12 +388,10 @@ class MarketDataViewer(QMainWindow):
             alpha=0.7
         )
         
-        last_timestamp = market_data['timestamp'].iloc[-1]
         next_timestamp = last_timestamp + pd.Timedelta(microseconds=1)
         last_predicted_price = prediction_data['predicted_price'].iloc[-1]
         next_predicted_price = last_predicted_price
 
-        print("plotting a dot")
         dot, = self.ax_price.plot(
             [last_timestamp, next_timestamp],
             [last_predicted_price, next_predicted_price],
@@ -315,38 +401,25 @@ class MarketDataViewer(QMainWindow):
             markersize=5,
             label=f'{stock} Next Prediction'
         )
-        self.plot_elements[f'{stock}_prediction'] = line
-        self.plot_elements[f'{stock}_prediction_dot'] = dot
-        del prediction_data
+        self._set_element(f'{stock}_prediction', line)
+        self._set_element(f'{stock}_prediction_dot', dot)
 
     def _plot_trade_data(self, trade_data: pd.DataFrame, stock: str):
-        if not self.trades_check.isChecked() or trade_data is None:
+        if trade_data is None:
             return
 
-        line, = self.ax_price.plot(
-            trade_data['timestamp'], # same here, I think it be slightly better if we extracted the info first, we could also down sample tbh
+        line = self.price_lod.plot(
+            trade_data['timestamp'],
             trade_data['price'],
             linestyle='-',
             marker='',
             label=f'{stock} Trade Price',
             alpha=0.7
         )
-        self.plot_elements[f'{stock}_trade'] = line
-
-    def _calculate_and_plot_pnl(self, market_data: pd.DataFrame, stock: str): #only the y-axis really changes between % and total, don't need to replot the graph, just change the label and axis
-        print("calculating pnl")
-        if not self.pnl_check.isChecked() or market_data is None:
-            return
-
-        strategy = TradingStrategy()
-        pnl_data = strategy.calculate_pnl(market_data)
-        metrics = calculate_trading_metrics(pnl_data)
-
-        if pnl_data is None or pnl_data.empty:
-            print(f"No PnL data for {stock}")
-            return
+        self._set_element(f'{stock}_trade', line)
 
-        if self.pnl_percent_check.isChecked():
+    def _plot_pnl(self, pnl_data: pd.DataFrame, metrics: Dict[str, float], stock: str, as_percentage: bool): #only the y-axis really changes between % and total, don't need to replot the graph, just change the label and axis
+        if as_percentage:
             if pnl_data['pnl_percentage'].isna().all():
                 print(f"PnL percentage contains NaN values for {stock}")
                 return
@@ -367,15 +440,13 @@ class MarketDataViewer(QMainWindow):
             )
             ylabel = 'PnL ($)'
 
-        self.plot_elements[f'{stock}_pnl'] = line
+        self._set_element(f'{stock}_pnl', line)
         self.ax_pnl.set_ylabel(ylabel)
 
         self.ax_pnl.relim()
         self.ax_pnl.autoscale_view()
 
-
-
-    def _clear_plots(self, keep_predictions=False, keep_pnl=False, keep_bid_price=False, keep_ask_price=False, keep_trades=False, keep_min_max=False, keep_stds=False):
+    def _clear_plots(self, keep_predictions=False, keep_pnl=False, keep_bid_price=False, keep_ask_price=False, keep_trades=False, keep_min_max=False, keep_stds=False, keep_overview=False):
         #self.ax_price.cla()
         #self.ax_pnl.cla()
         for key in list(self.plot_elements.keys()):
@@ -400,8 +471,11 @@ class MarketDataViewer(QMainWindow):
             if keep_stds and 'std' in key:
                 print("found stds")
                 continue
+            if keep_overview and 'overview' in key:
+                continue
 
             print(f"Removing {key}")
+            self.price_lod.discard(self.plot_elements[key])
             try:
                 self.plot_elements[key].remove()
             except NotImplementedError:
@@ -436,6 +510,8 @@ class MarketDataViewer(QMainWindow):
         self.canvas.draw_idle()  # More efficient drawing method
 
     def update_plot_visibility(self):
+        if self.live_plot is not None:
+            return  # the live view picks its series when it starts
         needs_reload = False
         if any(attr in ('pnl_check', 'pnl_percent_check')
                for attr, _, _ in self.VISUALIZATION_TOGGLES
@@ -447,7 +523,87 @@ class MarketDataViewer(QMainWindow):
         else:
             self._update_plot_layout()
 
+    def toggle_live(self, checked: bool):
+        if checked:
+            self._start_live()
+        else:
+            self._stop_live()
+
+    def _start_live(self):
+        """Replay the selected period into ring-buffered, blitted lines instead of loading it whole."""
+        period = self.period_combo.currentText()
+        stocks = [stock for stock, checkbox in self.stock_checkboxes.items() if checkbox.isChecked()]
+        series = [name for name, checkbox in (('bid', self.bid_price_check), ('ask', self.ask_price_check),
+                                             ('trade', self.trades_check)) if checkbox.isChecked()]
+        if not stocks or not series:
+            self.statusBar().showMessage("Select a stock and at least one of bid, ask or trades to go live", 5000)
+            self.live_button.setChecked(False)
+            return
+
+        self.pipeline.cancel()
+        self.progress_bar.setVisible(False)
+        self._clear_plots()
+        # the static plots are gone, the next Load Data has to redraw everything
+        self.last_selected_stocks = set()
+        self.last_selected_period = None
+        self.ax_pnl.set_visible(False)
+
+        speed = self.LIVE_SPEEDS[self.speed_combo.currentText()]
+        self.live_plot = LivePlot(self.ax_price, self.LIVE_CAPACITY, self.LIVE_WINDOW_SECONDS * speed)
+        for stock in stocks:
+            for name in series:
+                self.live_plot.add_series(stock, name)
+        self.ax_price.set_title(f"{period} - Live ({self.speed_combo.currentText()})")
+        self.ax_price.set_ylabel('Price')
+        self.ax_price.legend(loc='upper left')
+        self.ax_price.xaxis_date()
+        plt.tight_layout()  # once, frames never touch the layout
+
+        # one frame of market per batch window, grouped per source: a handful of batches a frame at any speed
+        simulator = ReplaySimulator(os.path.join(self.base_dir, 'TrainingData'), period, stocks,
+                                    self.live_plot.feeds(), speed, batch_window=speed / self.LIVE_FPS,
+                                    loader=self.data_loader, interleave=False)
+        self.live_feed = LiveFeed(simulator, self.LIVE_QUEUE_BATCHES)
+        self.live_feed.start()
+        self.load_button.setEnabled(False)
+        self.period_combo.setEnabled(False)
+        self.speed_combo.setEnabled(False)
+        self.live_button.setText("Stop Live")
+        self.live_timer.start()
+
+    def _on_live_frame(self):
+        # at most half a frame on new batches, anything left waits for the next frame
+        self.live_feed.drain(self.live_plot.push, 0.5 / self.LIVE_FPS)
+        if self.live_plot.draw_frame() and self.live_plot.frames % self.LIVE_FPS == 0:
+            stats = self.live_plot.frame_stats()
+            self.statusBar().showMessage(f"Live: {stats['fps']:.1f} fps, {stats['frame_ms']:.1f}ms/frame "
+                                         f"(max {stats['max_frame_ms']:.1f}ms), {stats['full_draws']} full redraws, "
+                                         f"backlog {len(self.live_feed)} batches, {self.live_feed.dropped} dropped")
+        if not self.live_feed.running and len(self.live_feed) == 0:
+            self.live_button.setChecked(False)  # replay finished
+
+    def _stop_live(self):
+        if self.live_feed is None:
+            return
+        self.live_timer.stop()
+        self.live_feed.stop()
+        self.live_feed.drain(self.live_plot.push)
+        self.live_plot.draw_frame()
+        # the lines stay on screen as ordinary artists, the next Load Data clears them like any other
+        for (stock, name), line in self.live_plot.close().items():
+            self.plot_elements[f'{stock}_live_{name}'] = line
+        self.ax_price.set_autoscale_on(True)  # the live window fixed the limits, Load Data autoscales again
+        self.live_feed = None
+        self.live_plot = None
+        self.load_button.setEnabled(True)
+        self.period_combo.setEnabled(True)
+        self.speed_combo.setEnabled(True)
+        self.live_button.setText("Go Live")
+        self.canvas.draw_idle()
+
     def closeEvent(self, event):
+        self._stop_live()
+        self.pipeline.shutdown()
         self._clear_plots()
         plt.close(self.figure)
         super().closeEvent(event)
\ No newline at end of file
@@ -0,0 +1,144 @@
+import numpy as np
+import matplotlib.dates as mdates
+from matplotlib.lines import Line2D
+from typing import Dict, Optional, Tuple
+
+
+def _to_plot_x(x) -> np.ndarray:
+    """Datetimes become matplotlib date numbers, anything else just float64."""
+    values = np.asarray(x)
+    if np.issubdtype(values.dtype, np.datetime64):
+        return mdates.date2num(values)
+    return values.astype(np.float64)
+
+
+class LODSeries:
+    """Min/max pyramid over one sorted (x, y) series.
+
+    Level k holds, for every bucket of 2**k consecutive points, the index of its
+    minimum and of its maximum. Rendering a range at a given budget picks the
+    coarsest level that still fits and emits both extremes of each bucket in
+    time order, so spikes survive no matter how far you zoom out.
+    """
+
+    def __init__(self, x: np.ndarray, y: np.ndarray):
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        if len(x) > 1 and (np.diff(x) < 0).any():
+            order = np.argsort(x, kind='stable')
+            x, y = x[order], y[order]
+        self.x = x
+        self.y = y
+        self.levels = self._build_pyramid(y)
+
+    @staticmethod
+    def _build_pyramid(y: np.ndarray):
+        levels = []
+        min_idx = max_idx = np.arange(len(y))
+        while len(min_idx) > 1:
+            if len(min_idx) % 2:
+                min_idx = np.append(min_idx, min_idx[-1])
+                max_idx = np.append(max_idx, max_idx[-1])
+            a, b = min_idx[0::2], min_idx[1::2]
+            ya, yb = y[a], y[b]
+            min_idx = np.where((ya <= yb) | np.isnan(yb), a, b)
+            a, b = max_idx[0::2], max_idx[1::2]
+            ya, yb = y[a], y[b]
+            max_idx = np.where((ya >= yb) | np.isnan(yb), a, b)
+            levels.append((min_idx, max_idx))
+        return levels
+
+    def __len__(self) -> int:
+        return len(self.x)
+
+    def render(self, x_min: Optional[float] = None, x_max: Optional[float] = None,
+               max_points: int = 4000) -> Tuple[np.ndarray, np.ndarray]:
+        """Points to draw for [x_min, x_max], at most ~max_points of them."""
+        n = len(self.x)
+        start = 0 if x_min is None else max(int(np.searchsorted(self.x, x_min, 'left')) - 1, 0)
+        stop = n if x_max is None else min(int(np.searchsorted(self.x, x_max, 'right')) + 1, n)
+        if stop - start <= max_points:
+            return self.x[start:stop], self.y[start:stop]
+
+        buckets_allowed = max(max_points // 2, 1)
+        level = 0
+        while (stop - start) >> (level + 1) > buckets_allowed and level + 1 < len(self.levels):
+            level += 1
+        bucket = 1 << (level + 1)
+        min_idx, max_idx = self.levels[level]
+        first, last = start // bucket, (stop - 1) // bucket + 1
+
+        lo = np.minimum(min_idx[first:last], max_idx[first:last])
+        hi = np.maximum(min_idx[first:last], max_idx[first:last])
+        idx = np.empty(2 * len(lo), dtype=lo.dtype)
+        idx[0::2] = lo
+        idx[1::2] = hi
+        return self.x[idx], self.y[idx]
+
+
+class LODManager:
+    """Keeps the LOD lines of one axis rendered at screen resolution for the visible x-range."""
+
+    POINTS_PER_PIXEL = 2  # one min and one max per pixel column
+
+    def __init__(self, ax, max_points: Optional[int] = None):
+        self.ax = ax
+        self.max_points = max_points
+        self.series: Dict[Line2D, LODSeries] = {}
+        self._cid = ax.callbacks.connect('xlim_changed', self._on_xlim_changed)
+
+    def _budget(self) -> int:
+        if self.max_points:
+            return self.max_points
+        width = self.ax.get_window_extent().width
+        return max(int(width * self.POINTS_PER_PIXEL), 500)
+
+    def plot(self, x, y, **kwargs) -> Line2D:
+        """Like ax.plot(x, y), but the line only ever holds the visible, downsampled points."""
+        if np.issubdtype(np.asarray(x).dtype, np.datetime64):
+            self.ax.xaxis_date()
+        series = LODSeries(_to_plot_x(x), np.asarray(y))
+        xs, ys = series.render(max_points=self._budget())
+        line, = self.ax.plot(xs, ys, **kwargs)
+        self.series[line] = series
+        return line
+
+    def discard(self, artist) -> None:
+        self.series.pop(artist, None)
+
+    def refresh(self) -> None:
+        x_min, x_max = self.ax.get_xlim()
+        budget = self._budget()
+        for line, series in self.series.items():
+            line.set_data(*series.render(x_min, x_max, budget))
+
+    def _on_xlim_changed(self, ax) -> None:
+        self.refresh()
+
+    def disconnect(self) -> None:
+        self.ax.callbacks.disconnect(self._cid)
+
+
+def downsample_band(x, lower, upper, max_points: int = 4000) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Envelope of a (lower, upper) band in at most ~max_points vertices.
+
+    Each bucket keeps its lowest lower and highest upper value at both its first
+    and last x, so the polygon never cuts into the real band.
+    """
+    x = _to_plot_x(x)
+    lower = np.asarray(lower, dtype=np.float64)
+    upper = np.asarray(upper, dtype=np.float64)
+    n = len(x)
+    if n <= max_points:
+        return x, lower, upper
+
+    bucket = -(-n // max(max_points // 2, 1))
+    starts = np.arange(0, n, bucket)
+    ends = np.minimum(starts + bucket, n) - 1
+    bucket_lower = np.fmin.reduceat(lower, starts)
+    bucket_upper = np.fmax.reduceat(upper, starts)
+
+    xs = np.empty(2 * len(starts))
+    xs[0::2] = x[starts]
+    xs[1::2] = x[ends]
+    return xs, np.repeat(bucket_lower, 2), np.repeat(bucket_upper, 2)
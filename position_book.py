@@ -0,0 +1,160 @@
+import bisect
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+# (key, entry_price, size, entry_time, stop_loss, take_profit)
+PositionTuple = Tuple[str, float, int, object, float, float]
+
+
+def position_dtype(price_dtype=np.float64) -> np.dtype:
+    return np.dtype([
+        ('id', np.int64),
+        ('entry_price', price_dtype),
+        ('size', np.int64),  # 0 for free slots, so they drop out of the mark-to-market dot product
+        ('stop_loss', np.float64),
+        ('take_profit', np.float64),
+    ])
+
+
+class PositionBook:
+    """Open positions in a preallocated structured array, addressed by slot.
+
+    Every position gets an integer id, increasing in open order; the optional
+    string key only exists so re-opening the same key replaces the position in
+    place (keeping its id and so its place in the order), like assigning to the
+    old positions dict did. Stops and targets are kept in two sorted
+    indexes, one for triggers hit from above (long stop, short target) and one
+    for triggers hit from below (long target, short stop), so finding the exits
+    at a price is a bisect instead of a walk over every position. NaN triggers
+    never fire and stay out of the indexes.
+    """
+
+    def __init__(self, capacity: int = 8, price_dtype=np.float64):
+        self.records = np.zeros(max(capacity, 1), dtype=position_dtype(price_dtype))
+        self.entry_times: List[object] = [None] * len(self.records)
+        self.keys: List[Optional[str]] = [None] * len(self.records)
+        self._open: Dict[int, int] = {}  # id -> slot of the open positions; ids only grow, so oldest first
+        self._free = list(range(len(self.records) - 1, -1, -1))
+        self._by_key: Dict[str, int] = {}
+        self._next_id = 0
+        # (trigger, slot) sorted by trigger
+        self._below: List[Tuple[float, int]] = []  # exit once price <= trigger
+        self._above: List[Tuple[float, int]] = []  # exit once price >= trigger
+
+    def __len__(self) -> int:
+        return len(self._open)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._by_key
+
+    @property
+    def slots(self) -> List[int]:
+        """Open slots, oldest first."""
+        return list(self._open.values())
+
+    @property
+    def capacity(self) -> int:
+        return len(self.records)
+
+    def open(self, entry_price: float, size: int, entry_time=None, stop_loss: float = np.nan,
+             take_profit: float = np.nan, key: Optional[str] = None) -> int:
+        """Add a position (positive size is long) and return its slot."""
+        slot = self._by_key.get(key) if key is not None else None
+        if slot is not None:
+            self._unindex(slot)
+            position_id = int(self.records['id'][slot])
+        else:
+            if not self._free:
+                self._grow()
+            slot = self._free.pop()
+            position_id = self._next_id
+            self._next_id += 1
+            self._open[position_id] = slot
+            if key is not None:
+                self._by_key[key] = slot
+
+        record = self.records[slot]
+        record['id'] = position_id
+        record['entry_price'] = entry_price
+        record['size'] = size
+        record['stop_loss'] = stop_loss
+        record['take_profit'] = take_profit
+        self.entry_times[slot] = entry_time
+        self.keys[slot] = key
+        self._index(slot)
+        return slot
+
+    def close(self, slot: int) -> None:
+        self._unindex(slot)
+        del self._open[int(self.records['id'][slot])]
+        key = self.keys[slot]
+        if key is not None:
+            del self._by_key[key]
+        self.records[slot] = 0
+        self.entry_times[slot] = None
+        self.keys[slot] = None
+        self._free.append(slot)
+
+    def triggered(self, price: float) -> List[int]:
+        """Slots whose stop loss or take profit is hit at `price`, oldest first."""
+        price = float(price)  # a float32 price would compare to the float triggers in float32
+        below = bisect.bisect_left(self._below, (price, -1))
+        above = bisect.bisect_right(self._above, (price, len(self.records)))
+        if below == len(self._below) and above == 0:
+            return []
+        hit = {slot for _, slot in self._below[below:]}
+        hit.update(slot for _, slot in self._above[:above])
+        ids = self.records['id']
+        return sorted(hit, key=lambda slot: ids[slot])
+
+    def close_triggered(self, price: float) -> List[int]:
+        """Close everything stopped out or at target at `price`, returns the closed slots."""
+        closed = self.triggered(price)
+        for slot in closed:
+            self.close(slot)
+        return closed
+
+    def mark_to_market(self, price: float) -> float:
+        """Unrealized PnL of the whole book at `price`."""
+        return float(np.dot(self.records['size'], price - self.records['entry_price'].astype(np.float64, copy=False)))
+
+    def to_tuples(self) -> List[PositionTuple]:
+        records = self.records
+        return [
+            (self.keys[s], records['entry_price'][s], int(records['size'][s]), self.entry_times[s],
+             records['stop_loss'][s], records['take_profit'][s])
+            for s in self._open.values()
+        ]
+
+    @classmethod
+    def from_tuples(cls, positions: List[PositionTuple], capacity: int = 8, price_dtype=np.float64) -> 'PositionBook':
+        book = cls(max(capacity, len(positions)), price_dtype)
+        for key, price, size, entry_time, stop_loss, take_profit in positions:
+            book.open(price, size, entry_time, stop_loss, take_profit, key)
+        return book
+
+    def _triggers(self, slot: int) -> Tuple[float, float]:
+        """(hit from above, hit from below) trigger of a slot."""
+        record = self.records[slot]
+        stop_loss = float(record['stop_loss'])
+        take_profit = float(record['take_profit'])
+        return (stop_loss, take_profit) if record['size'] > 0 else (take_profit, stop_loss)
+
+    def _index(self, slot: int) -> None:
+        for index, trigger in zip((self._below, self._above), self._triggers(slot)):
+            if trigger == trigger:
+                bisect.insort(index, (trigger, slot))
+
+    def _unindex(self, slot: int) -> None:
+        for index, trigger in zip((self._below, self._above), self._triggers(slot)):
+            if trigger == trigger:
+                del index[bisect.bisect_left(index, (trigger, slot))]
+
+    def _grow(self) -> None:
+        old = len(self.records)
+        records = np.zeros(2 * old, dtype=self.records.dtype)
+        records[:old] = self.records
+        self.records = records
+        self.entry_times.extend([None] * old)
+        self.keys.extend([None] * old)
+        self._free.extend(range(2 * old - 1, old - 1, -1))
@@ -2,11 +2,17 @@ import pandas as pd
 import numpy as np
 from typing import Optional
 
+from timestamp_parser import parse_timestamp_column
+
 
 def predict_price_changes(market_data: pd.DataFrame) -> Optional[pd.DataFrame]:
     """
     Predict price changes based on market data analysis.
 
+    Fully array based: the trend-change rows are gathered at once, their 5-step
+    momentum projections form one 2-D array and duplicate target timestamps are
+    averaged with a scatter onto the unique timestamps.
+
     Args:
         market_data: DataFrame containing market data
 
@@ -17,68 +23,92 @@ def predict_price_changes(market_data: pd.DataFrame) -> Optional[pd.DataFrame]:
         return None
 
     try:
-        # Work with a copy to prevent modifications to original data
-        data = market_data.copy() #surely there is a better way
+        timestamps = market_data['timestamp']
+        if not pd.api.types.is_datetime64_any_dtype(timestamps):
+            timestamps = parse_timestamp_column(timestamps)
+        timestamps = timestamps.to_numpy()
 
-        # Ensure timestamp is datetime
-        data['timestamp'] = pd.to_datetime(data['timestamp'], format='%H:%M:%S.%f')
-        data = data.sort_values('timestamp')
+        # same permutation DataFrame.sort_values('timestamp') picks, ties included
+        order = np.argsort(timestamps, kind='quicksort')
+        timestamps = timestamps[order]
+        labels = market_data.index[order]
+        bid = pd.Series(market_data['bidPrice'].to_numpy()[order])
 
         # Calculate technical indicators
-        data['ema_short'] = data['bidPrice'].ewm(span=10, adjust=False).mean()
-        data['ema_long'] = data['bidPrice'].ewm(span=30, adjust=False).mean()
-        data['momentum'] = data['bidPrice'].diff(periods=10)
-        data['volatility'] = data['bidPrice'].rolling(window=20, min_periods=1).std()
+        ema_short = bid.ewm(span=10, adjust=False).mean()
+        ema_long = bid.ewm(span=30, adjust=False).mean()
+        momentum = bid.diff(periods=10)
+        volatility = bid.rolling(window=20, min_periods=1).std()
 
         # Identify trend changes
-        data['trend_change'] = (
-                (data['ema_short'] > data['ema_long']) &
-                (data['momentum'].abs() > data['volatility'])
-        )
+        trend_change = ((ema_short > ema_long) & (momentum.abs() > volatility)).to_numpy()
 
         prediction_window = 5
-        predictions = []
-
-        # Find trend change points and generate predictions
-        trend_change_indices = data.index[data['trend_change']].tolist()
-
-        for idx in trend_change_indices:
-            if idx + prediction_window >= len(data):
-                continue
-
-            momentum = data.loc[idx, 'momentum']
-            start_price = data.loc[idx, 'bidPrice']
-
-            # Generate future timestamps and prices
-            future_slice = data.iloc[idx + 1:idx + prediction_window + 1]
-
-            # Calculate predicted prices using momentum
-            price_changes = np.arange(1, prediction_window + 1) * momentum
-            predicted_prices = start_price + price_changes
-
-            # Create prediction entries
-            predictions.extend([
-                {
-                    'timestamp': ts,
-                    'predicted_price': price
-                }
-                for ts, price in zip(future_slice['timestamp'], predicted_prices)
-            ])
-
-        # Convert predictions to DataFrame if any exist
-        if predictions:
-            prediction_df = pd.DataFrame(predictions)
+        n = len(bid)
+
+        # trigger rows are looked up by label, their future rows by position (labels are row numbers)
+        trigger_labels = np.asarray(labels[trend_change])
+        trigger_labels = trigger_labels[trigger_labels + prediction_window < n]
+        if len(trigger_labels) == 0:
+            return None
+
+        index = market_data.index
+        if isinstance(index, pd.RangeIndex) and index.start == 0 and index.step == 1:
+            sorted_row = np.empty(n, dtype=np.intp)  # label -> its row after the sort, no hash table needed
+            sorted_row[order] = np.arange(n)
+            trigger_rows = sorted_row[trigger_labels]
+        else:
+            trigger_rows = pd.Index(labels).get_indexer(trigger_labels)
+        start_price = bid.to_numpy()[trigger_rows]
+        trigger_momentum = momentum.to_numpy()[trigger_rows]
+
+        steps = np.arange(1, prediction_window + 1)
+        predicted_prices = start_price[:, None] + steps * trigger_momentum[:, None]
+        targets = (trigger_labels[:, None] + steps).ravel()
+
+        # timestamps are sorted, so equal ones sit next to each other: number the distinct
+        # ones in one pass and keep those some prediction lands on, no sort needed
+        new_time = np.empty(n, dtype=bool)
+        new_time[0] = True
+        np.not_equal(timestamps[1:], timestamps[:-1], out=new_time[1:])
+        time_id = np.cumsum(new_time) - 1
+        hit = np.zeros(time_id[-1] + 1, dtype=bool)
+        hit[time_id[targets]] = True
+        unique_times = timestamps[new_time][hit]
+        groups = (np.cumsum(hit) - 1)[time_id[targets]]
+        means = _scatter_mean(predicted_prices.ravel(), groups, len(unique_times))
+
+        return pd.DataFrame({'timestamp': unique_times, 'predicted_price': means})
 
-            # Remove duplicate predictions for the same timestamp
-            prediction_df = prediction_df.groupby('timestamp')['predicted_price'].mean().reset_index()
-
-            # Sort by timestamp
-            prediction_df = prediction_df.sort_values('timestamp')
+    except Exception as e:
+        print(f"Error in price prediction: {str(e)}")
+        return None
 
-            return prediction_df
 
-        return None
+def _scatter_mean(values: np.ndarray, groups: np.ndarray, n_groups: int) -> np.ndarray:
+    """Per-group mean with Kahan-compensated sums in input order (what groupby().mean() does).
 
-    except Exception as e:
-        print(f"Error in price prediction: {str(e)}")
-        return None
\ No newline at end of file
+    Entries are peeled off in layers, the k-th member of every group at once, so
+    the Python loop only runs as many times as the biggest group has members.
+    Groups are ranked biggest first, so layer k only touches the prefix of groups
+    that still have a k-th member and the whole loop stays O(len(values)).
+    """
+    order = np.argsort(groups, kind='stable')
+    counts = np.bincount(groups, minlength=n_groups)
+    first = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    by_size = np.argsort(-counts, kind='stable')
+    sizes = counts[by_size]
+    starts = first[by_size]
+
+    totals = np.zeros(n_groups)  # both in by_size order
+    compensation = np.zeros(n_groups)
+    for layer in range(sizes[0] if n_groups else 0):
+        active = int(np.searchsorted(-sizes, -layer, 'left'))  # groups with more than `layer` members
+        y = values[order[starts[:active] + layer]] - compensation[:active]
+        t = totals[:active] + y
+        compensation[:active] = (t - totals[:active]) - y
+        totals[:active] = t
+
+    means = np.empty(n_groups)
+    means[by_size] = totals / sizes
+    return means
@@ -0,0 +1,399 @@
+import os
+import time
+import heapq
+import asyncio
+import inspect
+import logging
+import argparse
+import threading
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from data_loader import MarketDataLoader
+from streaming_indicators import StreamingIndicators
+
+STOCKS = ['A', 'B', 'C', 'D', 'E']
+FEEDS = ('market', 'trade')
+
+
+class ReplayBatch(NamedTuple):
+    """A run of consecutive rows of one (stock, feed) in the merged replay order."""
+    stock: str
+    feed: str
+    data: pd.DataFrame
+    time: int  # ns timestamp of the batch's last row
+    due: float  # perf_counter when it should have gone out, at the replay speed
+    emitted: float  # perf_counter when it actually went out
+
+
+class _Source:
+    # one (stock, feed) stream, holding one buffered chunk at a time
+    def __init__(self, stock: str, feed: str, chunks: Iterator[pd.DataFrame]):
+        self.stock = stock
+        self.feed = feed
+        self.chunks = chunks
+        self.frame: Optional[pd.DataFrame] = None
+        self.ns = np.empty(0, dtype=np.int64)
+        self.pos = 0
+
+    def fill(self) -> bool:
+        """Make sure there are unsent rows buffered, False once the stream is done."""
+        while self.pos >= len(self.ns):
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                return False
+            self.frame = chunk.reset_index(drop=True)
+            self.ns = chunk['timestamp'].to_numpy().astype('datetime64[ns]').view(np.int64)
+            self.pos = 0
+        return True
+
+
+class ReplayStats:
+    """Throughput and latency of one replay run.
+
+    Lag is how late the simulator itself emitted a batch; a subscriber's latency is
+    from when the batch was due until that subscriber finished with it, so it
+    includes the lag and every subscriber called before it.
+    """
+
+    def __init__(self, subscribers: Sequence[str] = ()):
+        self.rows = 0
+        self.batches = 0
+        self.first_time: Optional[int] = None
+        self.last_time: Optional[int] = None
+        self.started = time.perf_counter()
+        self.finished = self.started
+        self.lag: List[float] = []
+        self.latency: Dict[str, List[float]] = {name: [] for name in subscribers}
+
+    def record(self, batch: ReplayBatch) -> None:
+        self.rows += len(batch.data)
+        self.batches += 1
+        if self.first_time is None:
+            self.first_time = int(batch.data['timestamp'].iloc[0].value)
+        self.last_time = batch.time
+        self.lag.append(batch.emitted - batch.due)
+        self.finished = time.perf_counter()
+
+    def report(self) -> Dict:
+        wall = self.finished - self.started
+        simulated = (self.last_time - self.first_time) / 1e9 if self.first_time is not None else 0.0
+        report = {
+            'rows': self.rows,
+            'batches': self.batches,
+            'wall_seconds': wall,
+            'simulated_seconds': simulated,
+            'speed': simulated / wall if wall > 0 else 0.0,
+            'rows_per_second': self.rows / wall if wall > 0 else 0.0,
+            'batches_per_second': self.batches / wall if wall > 0 else 0.0,
+            'lag_ms': _percentiles(self.lag),
+        }
+        for name, values in self.latency.items():
+            report[f'{name}_latency_ms'] = _percentiles(values)
+        return report
+
+
+def _percentiles(seconds: List[float]) -> Dict[str, float]:
+    if not seconds:
+        return {}
+    ms = np.asarray(seconds) * 1e3
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {'mean': float(ms.mean()), 'p50': float(p50), 'p95': float(p95), 'p99': float(p99), 'max': float(ms.max())}
+
+
+class ReplaySimulator:
+    """Replays a period's recorded market and trade data as a live feed.
+
+    Every (stock, feed) CSV is streamed in chunks and k-way merged by timestamp:
+    a heap keyed on the last timestamp of each source's buffered chunk gives a
+    horizon every source has reached, and all rows up to it get merged in one
+    stable sort (ties go to the earlier source, rows of one source keep their
+    order). The merged rows go out as ReplayBatch runs of one source each.
+
+    `speed` 1 replays in real time, N replays N times faster, None (or 0) as fast
+    as possible. When paced, a batch never spans more than `batch_window`
+    simulated seconds and goes out once its last row's time has come. With
+    `interleave` off, rows of one window are grouped per source instead of cut
+    at every source change: global order then only holds window to window, but
+    a window becomes at most one batch per source (what a chart redrawing once
+    per window wants).
+    """
+
+    def __init__(self, base_dir: str, period: str, stocks: Optional[List[str]] = None,
+                 feeds: Sequence[str] = FEEDS, speed: Optional[float] = 1.0,
+                 max_batch_rows: int = 1000, batch_window: float = 0.005,
+                 loader: Optional[MarketDataLoader] = None, interleave: bool = True):
+        self.base_dir = base_dir
+        self.period = period
+        self.stocks = stocks or STOCKS
+        self.feeds = tuple(feeds)
+        self.speed = speed if speed else None
+        self.max_batch_rows = max_batch_rows
+        self.batch_window = batch_window
+        self.interleave = interleave
+        self.loader = loader or MarketDataLoader()
+        self.subscribers: Dict[str, Callable] = {}
+        self._stopped = threading.Event()
+
+    def stop(self) -> None:
+        """End the replay after the current batch, also from another thread. A stopped simulator stays stopped."""
+        self._stopped.set()
+
+    def subscribe(self, subscriber: Callable, name: Optional[str] = None) -> str:
+        """Add a callable (or coroutine function, for run_async) that gets every ReplayBatch."""
+        name = name or getattr(subscriber, 'name', None) or getattr(subscriber, '__name__', type(subscriber).__name__)
+        self.subscribers[name] = subscriber
+        return name
+
+    def unsubscribe(self, name: str) -> None:
+        self.subscribers.pop(name, None)
+
+    def _sources(self) -> List[_Source]:
+        sources = []
+        for stock in self.stocks:
+            data_dir = os.path.join(self.base_dir, self.period, stock)
+            if not os.path.isdir(data_dir):
+                continue
+            for feed in self.feeds:
+                if self.loader._get_file_list(data_dir, stock, feed):
+                    sources.append(_Source(stock, feed, self.loader.load_chunks(data_dir, stock, feed)))
+        return sources
+
+    def merged(self) -> Iterator[Tuple[_Source, int, int]]:
+        """(source, first row, end row) runs in timestamp order, unpaced."""
+        sources = [source for source in self._sources() if source.fill()]
+        heap = [(int(source.ns[-1]), i) for i, source in enumerate(sources)]
+        heapq.heapify(heap)
+        window_ns = int(self.batch_window * 1e9) if self.speed else 0
+
+        while heap:
+            horizon = heap[0][0]
+            parts = []
+            for i, source in enumerate(sources):
+                if source.pos >= len(source.ns):
+                    continue
+                end = int(np.searchsorted(source.ns, horizon, side='right'))
+                if end > source.pos:
+                    parts.append((i, source.pos, end))
+            times = np.concatenate([sources[i].ns[start:end] for i, start, end in parts])
+            ids = np.concatenate([np.full(end - start, i, dtype=np.int32) for i, start, end in parts])
+            rows = np.concatenate([np.arange(start, end) for i, start, end in parts])
+            if window_ns and not self.interleave:
+                # stable, so a source's rows keep their order inside its window
+                order = np.lexsort((ids, times // window_ns))
+            else:
+                order = np.lexsort((ids, times))
+            times, ids, rows = times[order], ids[order], rows[order]
+
+            # a new batch wherever the source changes (or, when paced, the time window does)
+            breaks = ids[1:] != ids[:-1]
+            if window_ns:
+                buckets = times // window_ns
+                breaks |= buckets[1:] != buckets[:-1]
+            bounds = np.concatenate(([0], np.flatnonzero(breaks) + 1, [len(ids)]))
+            for start, end in zip(bounds[:-1], bounds[1:]):
+                source = sources[ids[start]]
+                first = int(rows[start])
+                for offset in range(0, end - start, self.max_batch_rows):
+                    stop = min(first + offset + self.max_batch_rows, first + (end - start))
+                    yield source, first + offset, stop
+
+            for i, _, end in parts:
+                sources[i].pos = end
+            # sources whose chunk is used up get their next one, or leave the heap when finished
+            heap = [(int(source.ns[-1]), i) for i, source in enumerate(sources)
+                    if source.pos < len(source.ns) or source.fill()]
+            heapq.heapify(heap)
+
+    def _batches(self) -> Iterator[Tuple[ReplayBatch, float]]:
+        # (batch without its emit time, seconds until it's due)
+        start_wall = None
+        start_time = None
+        for source, first, end in self.merged():
+            data = source.frame.iloc[first:end]
+            last = int(source.ns[end - 1])
+            now = time.perf_counter()
+            if start_wall is None:
+                start_wall, start_time = now, int(source.ns[first])
+            due = start_wall + (last - start_time) / 1e9 / self.speed if self.speed else now
+            yield ReplayBatch(source.stock, source.feed, data, last, due, due), due - now
+
+    def batches(self) -> Iterator[ReplayBatch]:
+        """Blocking generator of the replay, sleeping to keep pace."""
+        for batch, wait in self._batches():
+            if wait > 0:
+                self._stopped.wait(wait)  # a sleep that stop() cuts short
+            if self._stopped.is_set():
+                return
+            yield batch._replace(emitted=time.perf_counter())
+
+    async def stream(self):
+        """Async generator of the replay, awaiting instead of sleeping (file reads still block)."""
+        for batch, wait in self._batches():
+            if wait > 0:
+                await asyncio.sleep(wait)
+            if self._stopped.is_set():
+                return
+            yield batch._replace(emitted=time.perf_counter())
+
+    def run(self, duration: Optional[float] = None) -> ReplayStats:
+        """Replay into every subscriber, for at most `duration` wall seconds, and return the stats."""
+        stats = ReplayStats(self.subscribers)
+        for batch in self.batches():
+            self._dispatch(batch, stats)
+            if duration is not None and time.perf_counter() - stats.started >= duration:
+                break
+        self._close_subscribers()
+        return stats
+
+    async def run_async(self, duration: Optional[float] = None) -> ReplayStats:
+        stats = ReplayStats(self.subscribers)
+        async for batch in self.stream():
+            stats.record(batch)
+            for name, subscriber in self.subscribers.items():
+                try:
+                    result = subscriber(batch)
+                    if inspect.isawaitable(result):
+                        await result
+                except Exception as e:
+                    logging.error(f"Replay subscriber {name} failed: {e}")
+                stats.latency[name].append(time.perf_counter() - batch.due)
+            if duration is not None and time.perf_counter() - stats.started >= duration:
+                break
+        stats.finished = time.perf_counter()
+        self._close_subscribers()
+        return stats
+
+    def _close_subscribers(self) -> None:
+        # end of the replay, subscribers that buffer (like Recorder) flush here
+        for name, subscriber in self.subscribers.items():
+            close = getattr(subscriber, 'close', None)
+            if callable(close):
+                try:
+                    close()
+                except Exception as e:
+                    logging.error(f"Replay subscriber {name} failed to close: {e}")
+
+    def _dispatch(self, batch: ReplayBatch, stats: ReplayStats) -> None:
+        stats.record(batch)
+        for name, subscriber in self.subscribers.items():
+            try:
+                subscriber(batch)
+            except Exception as e:
+                logging.error(f"Replay subscriber {name} failed: {e}")
+            stats.latency[name].append(time.perf_counter() - batch.due)
+        stats.finished = time.perf_counter()
+
+
+class IndicatorSubscriber:
+    """Runs every stock's market batches through its own StreamingIndicators."""
+    name = 'indicators'
+
+    def __init__(self, strategy_factory: Optional[Callable] = None):
+        self.strategy_factory = strategy_factory
+        self.engines: Dict[str, StreamingIndicators] = {}
+        self.latest: Dict[str, pd.DataFrame] = {}  # stock -> last batch with indicators and signals
+        self.signals = {'long': 0, 'short': 0}
+
+    def __call__(self, batch: ReplayBatch) -> None:
+        if batch.feed != 'market':
+            return
+        engine = self.engines.get(batch.stock)
+        if engine is None:
+            strategy = self.strategy_factory() if self.strategy_factory else None
+            engine = self.engines[batch.stock] = StreamingIndicators(strategy)
+        result = engine.update(batch.data)
+        self.signals['long'] += int(result['long_signal'].sum())
+        self.signals['short'] += int(result['short_signal'].sum())
+        self.latest[batch.stock] = result
+
+
+class Recorder:
+    """Writes what it receives back out as <period>/<stock>/{market,trade}_data_<stock>.csv.
+
+    The files have the source layout (time-of-day timestamps with ns), so a recording
+    loads and replays like TrainingData. Batches are buffered per file and written
+    every `flush_rows` rows, and on close().
+    """
+    name = 'recorder'
+
+    def __init__(self, out_dir: str, period: str, flush_rows: int = 50000):
+        self.out_dir = Path(out_dir) / period
+        self.flush_rows = flush_rows
+        self._buffers: Dict[Path, List[pd.DataFrame]] = {}
+        self._buffered_rows: Dict[Path, int] = {}
+        self._written = set()
+
+    def __call__(self, batch: ReplayBatch) -> None:
+        prefix = MarketDataLoader.FEEDS[batch.feed][0]
+        path = self.out_dir / batch.stock / f"{prefix}_{batch.stock}.csv"
+        self._buffers.setdefault(path, []).append(batch.data)
+        self._buffered_rows[path] = self._buffered_rows.get(path, 0) + len(batch.data)
+        if self._buffered_rows[path] >= self.flush_rows:
+            self._flush(path)
+
+    def close(self) -> None:
+        for path in list(self._buffers):
+            self._flush(path)
+
+    def _flush(self, path: Path) -> None:
+        frames = self._buffers.pop(path, [])
+        self._buffered_rows.pop(path, None)
+        if not frames:
+            return
+        first = path not in self._written
+        if first:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._written.add(path)
+        frame = pd.concat(frames, ignore_index=True)
+        frame['timestamp'] = _time_of_day(frame['timestamp'])
+        frame.to_csv(path, mode='w' if first else 'a', header=first, index=False)
+
+
+def _time_of_day(timestamps: pd.Series) -> List[str]:
+    ns = timestamps.to_numpy().astype('datetime64[ns]').view(np.int64) % (86400 * 10 ** 9)
+    seconds, fraction = np.divmod(ns, 10 ** 9)
+    return [f"{s // 3600:02d}:{s // 60 % 60:02d}:{s % 60:02d}.{f:09d}" for s, f in zip(seconds.tolist(), fraction.tolist())]
+
+
+def _print_report(report: Dict) -> None:
+    print(f"{report['rows']:,} rows in {report['batches']:,} batches, {report['wall_seconds']:.2f}s wall "
+          f"for {report['simulated_seconds']:.2f}s of market ({report['speed']:.1f}x)")
+    print(f"throughput: {report['rows_per_second']:,.0f} rows/s, {report['batches_per_second']:,.0f} batches/s")
+    for key, values in report.items():
+        if key.endswith('_ms') and values:
+            print(f"{key[:-3]:>22}: " + ", ".join(f"{name} {value:.3f}ms" for name, value in values.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a period's market and trade data as a live feed")
+    parser.add_argument('--data-dir', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'TrainingData'))
+    parser.add_argument('--period', default='Period1')
+    parser.add_argument('--stocks', nargs='*', help="default: all 5")
+    parser.add_argument('--feeds', nargs='*', default=list(FEEDS), choices=FEEDS)
+    parser.add_argument('--speed', type=float, default=1.0, help="replay speed multiple, 0 for as fast as possible")
+    parser.add_argument('--max-batch-rows', type=int, default=1000)
+    parser.add_argument('--duration', type=float, default=None, help="stop after this many wall seconds")
+    parser.add_argument('--indicators', action='store_true', help="subscribe the streaming indicator engine")
+    parser.add_argument('--record-dir', default=None, help="subscribe a recorder writing here")
+    parser.add_argument('--async', dest='use_async', action='store_true', help="drive the replay with asyncio")
+    args = parser.parse_args()
+
+    simulator = ReplaySimulator(args.data_dir, args.period, args.stocks, args.feeds, args.speed,
+                                max_batch_rows=args.max_batch_rows)
+    if args.indicators:
+        simulator.subscribe(IndicatorSubscriber())
+    if args.record_dir:
+        simulator.subscribe(Recorder(args.record_dir, args.period))
+
+    if args.use_async:
+        stats = asyncio.run(simulator.run_async(args.duration))
+    else:
+        stats = simulator.run(args.duration)
+    _print_report(stats.report())
+
+
+if __name__ == '__main__':
+    main()
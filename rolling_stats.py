@@ -0,0 +1,276 @@
+import numpy as np
+from typing import NamedTuple
+
+
+def rolling_time_std(timestamps_ns: np.ndarray, values: np.ndarray, window_ns: int, ddof: int = 1) -> np.ndarray:
+    """Rolling standard deviation over a true time window (t - window, t], for sorted timestamps.
+
+    Not an online (Welford-style) update: whole-series prefix sums over mean-centred
+    values give every window's sum and sum of squares as a difference of two entries,
+    and the window starts come from one searchsorted over the timestamps, so a 30s
+    window costs the same as a 1s one. The centring keeps it within ~1e-6 of pandas'
+    rolling('30s').std() on session prices (flat windows leave that much residue in
+    both). Windows with ddof or fewer points are NaN, like pandas.
+    """
+    timestamps_ns = np.asarray(timestamps_ns, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    if n == 0:
+        return np.empty(0)
+
+    valid = ~np.isnan(values)
+    center = values[valid].mean() if valid.any() else 0.0
+    centered = np.where(valid, values - center, 0.0)
+
+    sums = np.zeros(n + 1)
+    np.cumsum(centered, out=sums[1:])
+    squares = np.zeros(n + 1)
+    np.cumsum(centered * centered, out=squares[1:])
+    counts = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(valid, out=counts[1:])
+
+    end = np.arange(1, n + 1)
+    start = np.searchsorted(timestamps_ns, timestamps_ns - window_ns, side='right')
+
+    window_count = counts[end] - counts[start]
+    window_sum = sums[end] - sums[start]
+    window_squares = squares[end] - squares[start]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        var = (window_squares - window_sum * window_sum / window_count) / (window_count - ddof)
+    var = np.where(window_count > ddof, np.maximum(var, 0.0), np.nan)
+    return np.sqrt(var)
+
+
+class RollingFit(NamedTuple):
+    slope: np.ndarray
+    intercept: np.ndarray
+    rvalue: np.ndarray
+    stderr: np.ndarray
+    intercept_stderr: np.ndarray
+    prediction: np.ndarray  # fitted line at x = window, the next sample
+    resid_std: np.ndarray  # sqrt(SSE / (window - 2))
+
+
+def _window_sums(x: np.ndarray, w: int, weighted: bool = False) -> np.ndarray:
+    """sum(x[s:s + w]) for every s, or sum(k * x[s + k]) with weighted.
+
+    The array is cut into blocks of w, and every window is a suffix of one block plus
+    a prefix of the next, both read off in-block running sums. Those never grow past
+    one block, so unlike a global prefix sum the error doesn't grow with the length.
+    """
+    n = len(x)
+    n_blocks = n // w + 2  # a spare block so s + w never runs off the end
+    blocks = np.zeros(n_blocks * w)
+    blocks[:n] = x
+    blocks = blocks.reshape(n_blocks, w)
+
+    prefix = np.zeros_like(blocks)  # sum of the block before position j
+    np.cumsum(blocks[:, :-1], axis=1, out=prefix[:, 1:])
+    suffix = np.cumsum(blocks[:, ::-1], axis=1)[:, ::-1]  # sum from position j to the block end
+
+    s = np.arange(n - w + 1)
+    head = suffix.ravel()[s]
+    tail = prefix.ravel()[s + w]
+    if not weighted:
+        return head + tail
+
+    # x's index within the window is k = j - j_s in the first block, j + w - j_s in the next
+    j = np.arange(w, dtype=np.float64)
+    prefix_j = np.zeros_like(blocks)
+    np.cumsum(blocks[:, :-1] * j[:-1], axis=1, out=prefix_j[:, 1:])
+    suffix_j = np.cumsum((blocks * j)[:, ::-1], axis=1)[:, ::-1]
+    j_s = s % w
+    return suffix_j.ravel()[s] - j_s * head + prefix_j.ravel()[s + w] + (w - j_s) * tail
+
+
+def rolling_linregress(values: np.ndarray, window: int) -> RollingFit:
+    """linregress(arange(window), values[i - window + 1:i + 1]) for every i, in one pass.
+
+    x is the same 0..window-1 in every window, so its sums are constants and only
+    running sums of y, x*y and y*y are needed, a fixed handful of operations per row
+    whatever the window. Entry i is the window ending at i, NaN before the first full
+    window and for windows with a NaN in them. Windows of identical values come out
+    exactly like linregress (slope 0, r 0).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    w = int(window)
+    if w < 3:
+        raise ValueError(f"window must be at least 3, got {window}")
+    nan = np.full(n, np.nan)
+    if n < w:
+        return RollingFit(*(nan.copy() for _ in RollingFit._fields))
+
+    valid = ~np.isnan(values)
+    center = values[valid].mean() if valid.any() else 0.0
+    y = np.where(valid, values - center, 0.0)  # centred so the squares keep their precision
+
+    sum_y = _window_sums(y, w)
+    sum_yy = _window_sums(y * y, w)
+    sum_xy = _window_sums(y, w, weighted=True)
+
+    def counts(flags):
+        csum = np.zeros(len(flags) + 1, dtype=np.int64)
+        np.cumsum(flags, out=csum[1:])
+        return csum
+
+    nan_count = counts(~valid)
+    has_nan = nan_count[w:] - nan_count[:-w] > 0
+    # a window of w identical values has w - 1 equal neighbours after its first value
+    same_run = counts(np.concatenate([[False], values[1:] == values[:-1]]))
+    constant = same_run[w:] - same_run[1:n - w + 2] == w - 1
+
+    x_mean = (w - 1) / 2.0
+    ssxm = w * (w * w - 1) / 12.0  # sum of (x - x_mean)**2
+    ssxym = np.where(constant, 0.0, sum_xy - x_mean * sum_y)
+    ssym = np.where(constant, 0.0, np.maximum(sum_yy - sum_y * sum_y / w, 0.0))
+
+    slope = ssxym / ssxm
+    intercept = np.where(constant, values[w - 1:], sum_y / w + center - slope * x_mean)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        r = np.clip(np.where(ssym > 0, ssxym / np.sqrt(ssxm * ssym), 0.0), -1.0, 1.0)
+    resid_std = np.sqrt(np.maximum(ssym - ssxym * ssxym / ssxm, 0.0) / (w - 2))
+    stderr = np.sqrt((1 - r * r) * ssym / ssxm / (w - 2))
+    intercept_stderr = stderr * np.sqrt(ssxm / w + x_mean * x_mean)
+    prediction = intercept + slope * w
+
+    def place(x):
+        out = nan.copy()
+        out[w - 1:] = np.where(has_nan, np.nan, x)
+        return out
+
+    return RollingFit(*(place(x) for x in (slope, intercept, r, stderr, intercept_stderr, prediction, resid_std)))
+
+
+PREFIX_BLOCK = 4096  # prefix sums restart every this many rows, so their error stays at block scale
+INDICATOR_KINDS = ('mean', 'std', 'upper_band', 'lower_band', 'momentum', 'roc')
+
+
+class IndicatorSpec(NamedTuple):
+    """One output column: `kind` over the last `window` values of the `source` series.
+
+    mean/std/bands are pandas' rolling(window) mean and std (bands are mean +- width * std),
+    momentum is diff(window) and roc pct_change(window) * 100.
+    """
+    column: str
+    kind: str
+    source: str
+    window: int
+    width: float = 2.0
+
+
+class _PrefixSums:
+    """Sums, squares, NaN count and equal-neighbour count of one series, shared by every window.
+
+    The running sums restart every PREFIX_BLOCK rows, a window's sum is the difference
+    of two entries plus the totals of the blocks it crosses into.
+    """
+
+    def __init__(self, values: np.ndarray):
+        self.values = values
+        valid = ~np.isnan(values)
+        self.has_nans = not valid.all()
+        self.center = values[valid].mean() if valid.any() else 0.0
+        y = values - self.center
+        if self.has_nans:
+            y[~valid] = 0.0
+        self.sums = self._blocked(y)
+        self.squares = self._blocked(y * y)
+        self.nans = np.concatenate([[0], np.cumsum(~valid)]) if self.has_nans else None
+        self.same = np.concatenate([[0, 0], np.cumsum(values[1:] == values[:-1])])
+
+    @staticmethod
+    def _blocked(x: np.ndarray):
+        n_blocks = len(x) // PREFIX_BLOCK + 1
+        padded = np.zeros(n_blocks * PREFIX_BLOCK)
+        padded[:len(x)] = x
+        padded = padded.reshape(n_blocks, PREFIX_BLOCK)
+        local = np.zeros_like(padded)  # sum of the block before each position
+        np.cumsum(padded[:, :-1], axis=1, out=local[:, 1:])
+        return local.ravel()[:len(x) + 1], padded.sum(axis=1)
+
+    def window_sum(self, prefix, w: int) -> np.ndarray:
+        local, totals = prefix
+        total = local[w:] - local[:-w]
+        # windows starting before a block boundary and ending after it need that block's total
+        for k, block_total in enumerate(totals[:-1]):
+            boundary = (k + 1) * PREFIX_BLOCK
+            total[max(boundary - w, 0):boundary] += block_total
+        return total
+
+    def mean_std(self, w: int):
+        """Rolling mean and sample std of windows ending at rows w-1.., like pandas rolling(w)."""
+        total = self.window_sum(self.sums, w)
+        std = self.window_sum(self.squares, w)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            std -= total * total / w
+            std /= w - 1 if w > 1 else np.nan
+        np.maximum(std, 0.0, out=std)
+        np.sqrt(std, out=std)
+        mean = total
+        mean /= w
+        mean += self.center
+
+        # identical values come out exact, like pandas: the value itself and a std of 0
+        constant = self.same[w:] - self.same[1:len(self.same) - w + 1] == w - 1
+        if constant.any():
+            mean[constant] = self.values[w - 1:][constant]
+            if w > 1:
+                std[constant] = 0.0
+        if self.has_nans:
+            incomplete = self.nans[w:] - self.nans[:-w] > 0
+            mean[incomplete] = np.nan
+            std[incomplete] = np.nan
+        return mean, std
+
+
+def indicator_block(sources, specs, out: np.ndarray = None) -> np.ndarray:
+    """Every spec's column of one float32 (rows, len(specs)) block, from shared prefix sums.
+
+    `sources` maps a source name to its series. Each source gets one set of running
+    sums, each (source, window) one mean/std, and every spec is then a cheap
+    combination of those, so adding indicators or windows adds no passes over the data.
+    """
+    series = {name: np.asarray(values, dtype=np.float64) for name, values in sources.items()}
+    n = len(next(iter(series.values()))) if series else 0
+    if out is None:
+        out = np.empty((n, len(specs)), dtype=np.float32)
+    prefixes = {}
+    moments = {}
+
+    for j, spec in enumerate(specs):
+        if spec.kind not in INDICATOR_KINDS:
+            raise ValueError(f"Unknown indicator kind {spec.kind!r}, expected one of {INDICATOR_KINDS}")
+        values = series[spec.source]
+        w = spec.window
+        column = out[:, j]
+
+        if spec.kind in ('momentum', 'roc'):
+            column[:w] = np.nan
+            if n > w:
+                if spec.kind == 'momentum':
+                    np.subtract(values[w:], values[:-w], out=column[w:], casting='same_kind')
+                else:
+                    with np.errstate(invalid='ignore', divide='ignore'):
+                        column[w:] = (values[w:] / values[:-w] - 1) * 100
+            continue
+
+        column[:w - 1] = np.nan
+        if n < w:
+            continue
+        key = (spec.source, w)
+        if key not in moments:
+            if spec.source not in prefixes:
+                prefixes[spec.source] = _PrefixSums(values)
+            moments[key] = prefixes[spec.source].mean_std(w)
+        mean, std = moments[key]
+        if spec.kind == 'mean':
+            column[w - 1:] = mean
+        elif spec.kind == 'std':
+            column[w - 1:] = std
+        elif spec.kind == 'upper_band':
+            column[w - 1:] = mean + spec.width * std
+        else:
+            column[w - 1:] = mean - spec.width * std
+    return out
@@ -0,0 +1,198 @@
+import os
+import json
+import time
+import inspect
+import logging
+import argparse
+import itertools
+import pandas as pd
+from typing import Dict, List, Optional, Sequence, Tuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from backtest_engine import BacktestEngine
+from batch_backtest import PERIODS, STOCKS, find_jobs
+from data_loader import MarketDataLoader
+from trading_strategy import IndicatorCache, TradingStrategy, calculate_trading_metrics
+
+# every TradingStrategy keyword with its default, in signature order
+DEFAULT_PARAMETERS = {
+    name: p.default for name, p in inspect.signature(TradingStrategy.__init__).parameters.items() if name != 'self'
+}
+# these only change sizing and exits, parameter sets differing only in them share one signals frame
+RISK_PARAMETERS = ('risk_per_trade', 'max_positions', 'min_rr_ratio', 'portfolio_value')
+METRICS = ['total_return', 'return_percentage', 'max_drawdown', 'sharpe_ratio', 'sortino_ratio',
+           'win_rate', 'profit_factor', 'trades', 'expectancy']
+LOWER_IS_BETTER = {'max_drawdown'}
+
+_worker_loader: Optional[MarketDataLoader] = None
+
+
+def _init_worker(cache_dir: Optional[str]) -> None:
+    # one loader per worker process, like batch_backtest
+    global _worker_loader
+    _worker_loader = MarketDataLoader(cache_dir=cache_dir)
+
+
+def expand_grid(grid: Dict[str, Sequence]) -> List[Dict]:
+    """Cartesian product of the grid, one dict of TradingStrategy keywords per parameter set.
+
+    Scalars count as a single value, parameters not in the grid keep their defaults.
+    """
+    unknown = set(grid) - set(DEFAULT_PARAMETERS)
+    if unknown:
+        raise ValueError(f"Unknown strategy parameters: {', '.join(sorted(unknown))}")
+    names = list(grid)
+    values = [v if isinstance(v, (list, tuple)) else [v] for v in grid.values()]
+    return [dict(zip(names, combo)) for combo in itertools.product(*values)]
+
+
+def _signal_key(params: Dict) -> Tuple:
+    full = {**DEFAULT_PARAMETERS, **params}
+    return tuple((name, full[name]) for name in DEFAULT_PARAMETERS if name not in RISK_PARAMETERS)
+
+
+def evaluate(market_data: pd.DataFrame, param_sets: List[Dict],
+             indicators: Optional[IndicatorCache] = None) -> List[Dict]:
+    """calculate_trading_metrics for every parameter set on one session.
+
+    Indicator series come from one shared IndicatorCache, and parameter sets that only
+    differ in risk settings share one signals frame, so only the backtest itself runs
+    once per set.
+    """
+    indicators = indicators if indicators is not None else IndicatorCache(market_data)
+    groups: Dict[Tuple, List[int]] = {}
+    for i, params in enumerate(param_sets):
+        groups.setdefault(_signal_key(params), []).append(i)
+
+    results: List[Optional[Dict]] = [None] * len(param_sets)
+    for members in groups.values():
+        signals_df = TradingStrategy(**param_sets[members[0]]).calculate_signals(market_data, indicators)
+        for i in members:
+            strategy = TradingStrategy(**param_sets[i])
+            engine = BacktestEngine(strategy, strategy.PORTFOLIO_VALUE)
+            pnl_df, _ = engine.run(signals_df)
+            results[i] = {name: float(value) for name, value in calculate_trading_metrics(pnl_df, engine.trades).items()}
+    return results
+
+
+def run_sweep_job(base_dir: str, period: str, stock: str, combos: List[Tuple[int, Dict]],
+                  cache_dir: Optional[str] = None) -> List[Dict]:
+    """Evaluate a batch of (combo id, parameter set) on one (period, stock). Never raises, errors end up in the rows."""
+    loader = _worker_loader if _worker_loader is not None else MarketDataLoader(cache_dir=cache_dir)
+    base = {'period': period, 'stock': stock, 'status': 'ok', 'error': ''}
+    start = time.perf_counter()
+
+    try:
+        market_data = loader.load_market_data(os.path.join(base_dir, period, stock), stock)
+        if market_data is None or market_data.empty:
+            rows = [{**base, 'combo': combo, 'rows': 0, 'status': 'no_data'} for combo, _ in combos]
+        else:
+            metrics = evaluate(market_data, [params for _, params in combos])
+            rows = [{**base, 'combo': combo, 'rows': len(market_data), **m} for (combo, _), m in zip(combos, metrics)]
+    except Exception as e:
+        logging.error(f"Sweep failed for {period}/{stock}: {e}")
+        rows = [{**base, 'combo': combo, 'status': 'error', 'error': str(e)} for combo, _ in combos]
+
+    elapsed = round(time.perf_counter() - start, 4)
+    for row in rows:
+        row['elapsed_seconds'] = elapsed
+    return rows
+
+
+def run_sweep(base_dir: str, grid: Dict[str, Sequence], periods: Optional[List[str]] = None,
+              stocks: Optional[List[str]] = None, max_workers: Optional[int] = None,
+              cache_dir: Optional[str] = None, batch_size: Optional[int] = None) -> pd.DataFrame:
+    """Every parameter set of the grid on every (period, stock), one row per pair.
+
+    By default there's one job per session, so the session is loaded and each of its
+    indicator series computed exactly once, and the parallelism is across sessions.
+    A `batch_size` splits the sets of a session over several jobs, which keeps more
+    cores busy when there are fewer sessions than cores, at the price of every batch
+    loading the session and computing its indicators again.
+    """
+    param_sets = expand_grid(grid)
+    sessions = find_jobs(base_dir, periods or PERIODS, stocks or STOCKS)
+    workers = max_workers or os.cpu_count()
+    batch_size = max(1, batch_size or len(param_sets))
+    combos = list(enumerate(param_sets))
+    batches = [combos[i:i + batch_size] for i in range(0, len(combos), batch_size)]
+    print(f"{len(param_sets)} parameter sets x {len(sessions)} sessions, {len(batches) * len(sessions)} jobs")
+
+    rows = []
+    if sessions:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(cache_dir,)) as executor:
+            futures = [
+                executor.submit(run_sweep_job, base_dir, period, stock, batch, cache_dir)
+                for period, stock in sessions for batch in batches
+            ]
+            for i, future in enumerate(as_completed(futures), 1):
+                batch_rows = future.result()
+                rows.extend(batch_rows)
+                print(f"[{i}/{len(futures)}] {batch_rows[0]['period']}/{batch_rows[0]['stock']}: "
+                      f"{len(batch_rows)} sets ({batch_rows[0]['elapsed_seconds']}s)")
+
+    results = pd.DataFrame(rows)
+    if results.empty:
+        return results
+    params = pd.DataFrame(param_sets, index=pd.RangeIndex(len(param_sets), name='combo')).reset_index()
+    return params.merge(results, on='combo').sort_values(['combo', 'period', 'stock']).reset_index(drop=True)
+
+
+def rank_results(results: pd.DataFrame, by: str = 'sharpe_ratio') -> pd.DataFrame:
+    """One row per parameter set with its metrics averaged over the sessions, best first."""
+    # a sweep where no session came out ok never got the metric columns
+    ok = results[results['status'] == 'ok'].reindex(columns=[*results.columns, *(m for m in METRICS if m not in results)])
+    param_columns = [c for c in results.columns if c in DEFAULT_PARAMETERS]
+    grouped = ok.groupby('combo')
+    table = grouped[METRICS].mean()
+    table['sessions'] = grouped.size()
+    table = results.drop_duplicates('combo').set_index('combo')[param_columns].join(table, how='inner')
+    table = table.sort_values(by, ascending=by in LOWER_IS_BETTER)
+    table = table.reset_index()
+    table.insert(0, 'rank', range(1, len(table) + 1))
+    return table
+
+
+def load_grid(grid: str) -> Dict[str, Sequence]:
+    """A grid from a JSON string or a path to a JSON file."""
+    if os.path.exists(grid):
+        with open(grid) as f:
+            return json.load(f)
+    return json.loads(grid)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Grid search over TradingStrategy parameters, ranked by backtest metrics")
+    parser.add_argument('--grid',
+                        help='JSON (or a JSON file) of parameter -> values, e.g. \'{"sma_short": [10, 20], "imbalance_threshold": [0.1, 0.2]}\'')
+    parser.add_argument('--data-dir', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'TrainingData'))
+    parser.add_argument('--cache-dir', default='./cache')
+    parser.add_argument('--periods', nargs='*', help="e.g. Period1 Period7 (default: all 20)")
+    parser.add_argument('--stocks', nargs='*', help="e.g. A B (default: all 5)")
+    parser.add_argument('--workers', type=int, default=None, help="default: one per core")
+    parser.add_argument('--batch-size', type=int, default=None, help="parameter sets per job (default: all of them, one job per session; "
+                             "smaller batches use more cores but recompute the session's indicators per batch)")
+    parser.add_argument('--results', default='sweep_results.csv', help="per-session rows go here")
+    parser.add_argument('--rank-by', default='sharpe_ratio', choices=METRICS)
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--list', action='store_true', help="print the tunable parameters and their defaults")
+    args = parser.parse_args()
+
+    if args.list:
+        for name, default in DEFAULT_PARAMETERS.items():
+            print(f"{name:22} {default}")
+        return
+    if args.grid is None:
+        parser.error("--grid is required")
+
+    results = run_sweep(args.data_dir, load_grid(args.grid), args.periods, args.stocks,
+                        args.workers, args.cache_dir, args.batch_size)
+    if results.empty:
+        print("No sessions to sweep")
+        return
+    results.to_csv(args.results, index=False)
+    print(rank_results(results, args.rank_by).head(args.top).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+import numpy as np
+import pandas as pd
+from typing import Optional
+
+from trading_strategy import TradingStrategy
+
+
+class _RollingWindow:
+    """Rolling mean/std over a stream, keeps only the last window-1 values between batches.
+
+    Same conventions as pandas' rolling: NaN until the window is full, NaNs in the
+    window make it incomplete, sample std (ddof=1), and a window of identical
+    values gives exactly that value / exactly 0, like pandas does.
+    """
+
+    def __init__(self, window: int):
+        self.window = window
+        self.tail = np.empty(0, dtype=np.float64)
+
+    def update(self, values: np.ndarray, with_std: bool = False):
+        w = self.window
+        values = np.asarray(values, dtype=np.float64)
+        ext = np.concatenate([self.tail, values])
+        offset = len(self.tail)
+        self.tail = ext[-(w - 1):] if w > 1 else ext[:0]
+
+        valid = ~np.isnan(ext)
+        ref = ext[valid][0] if valid.any() else 0.0  # center the sums so prices don't eat the precision
+        centered = np.where(valid, ext - ref, 0.0)
+
+        def window_sum(x):
+            csum = np.concatenate([[0], np.cumsum(x)])
+            end = np.arange(offset, len(ext)) + 1
+            start = np.maximum(end - w, 0)
+            return csum[end] - csum[start], end - start
+
+        total, span = window_sum(centered)
+        count, _ = window_sum(valid.astype(np.int64))
+        full = (span == w) & (count == w)
+
+        same = np.concatenate([[False], ext[1:] == ext[:-1]]).astype(np.int64)
+        same_run, _ = window_sum(same)
+        constant = full & (same_run - same[np.maximum(np.arange(offset, len(ext)) - w + 1, 0)] == w - 1)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(full, total / w + ref, np.nan)
+            mean = np.where(constant, ext[offset:], mean)
+            if not with_std:
+                return mean
+
+            sq_total, _ = window_sum(centered * centered)
+            var = (sq_total - total * total / w) / (w - 1) if w > 1 else np.zeros_like(total)
+            std = np.where(full, np.sqrt(np.maximum(var, 0.0)), np.nan)
+            std = np.where(constant, 0.0, std)
+        return mean, std
+
+
+class _EMA:
+    """EMA with adjust=False semantics, carried across batches.
+
+    Each batch is split into fixed blocks: inside a block the recursion is one
+    small matrix product, only the block-to-block carry is sequential.
+    """
+
+    BLOCK = 64
+
+    def __init__(self, span: int):
+        alpha = 2.0 / (span + 1)
+        decay = 1.0 - alpha
+        lags = np.arange(self.BLOCK)
+        lag_matrix = lags[:, None] - lags[None, :]
+        self._weights = np.where(lag_matrix >= 0, alpha * decay ** np.maximum(lag_matrix, 0), 0.0).T
+        self._carry_decay = decay ** (lags + 1)
+        self.last: Optional[float] = None
+
+    def update(self, values: np.ndarray) -> np.ndarray:
+        values = np.asarray(values, dtype=np.float64)
+        n = len(values)
+        if n == 0:
+            return values
+        if self.last is None:
+            self.last = values[0]  # adjust=False starts the average at the first observation
+
+        blocks = -(-n // self.BLOCK)
+        padded = np.zeros(blocks * self.BLOCK)
+        padded[:n] = values
+        partial = padded.reshape(blocks, self.BLOCK) @ self._weights
+
+        carry = self.last
+        for row in partial:
+            row += self._carry_decay * carry
+            carry = row[-1]
+
+        out = partial.reshape(-1)[:n]
+        self.last = out[-1]
+        return out
+
+
+class StreamingIndicators:
+    """Stateful, incremental version of TradingStrategy.calculate_signals.
+
+    Feed quote batches to update() in time order and get back the batch with the
+    same indicator and signal columns calculate_signals would have produced for
+    those rows on the full history. Each update costs O(batch): rolling windows
+    keep only their tail, EMAs keep their last value.
+    """
+
+    def __init__(self, strategy: Optional[TradingStrategy] = None):
+        self.strategy = strategy if strategy is not None else TradingStrategy()
+        self.reset()
+
+    def reset(self) -> None:
+        s = self.strategy  # windows come from the strategy, so parametrized strategies stream the same signals
+        self._sma_short = _RollingWindow(s.SMA_SHORT)
+        self._sma_long = _RollingWindow(s.SMA_LONG)
+        self._bollinger = _RollingWindow(s.BOLLINGER_PERIOD)
+        self._volume_sma = _RollingWindow(s.VOLUME_WINDOW)
+        self._atr = _RollingWindow(s.ATR_PERIOD)
+        self._atr_baseline = _RollingWindow(s.ATR_BASELINE)
+        self._gain = _RollingWindow(s.RSI_PERIOD)
+        self._loss = _RollingWindow(s.RSI_PERIOD)
+        self._imbalance_sma = _RollingWindow(s.IMBALANCE_WINDOW)
+        self._ema_fast = _EMA(s.MACD_FAST)
+        self._ema_slow = _EMA(s.MACD_SLOW)
+        self._ema_signal = _EMA(s.MACD_SIGNAL)
+        self._last_mid = None
+        self.rows_seen = 0
+
+    def update(self, batch: pd.DataFrame) -> pd.DataFrame:
+        """Add a batch of quote rows and return it with every indicator and signal filled in."""
+        if batch.empty:
+            return batch.copy()
+
+        bid = batch['bidPrice'].to_numpy()
+        ask = batch['askPrice'].to_numpy()
+        bid_volume = batch['bidVolume'].to_numpy()
+        ask_volume = batch['askVolume'].to_numpy()
+        # plain arrays, the frame gets built once at the end: per-column inserts cost more than the math on small batches
+        columns = {}
+
+        # Price action indicators
+        mid = (bid + ask) / 2
+        columns['mid_price'] = mid
+        columns['price_sma_20'] = self._sma_short.update(mid)
+        columns['price_sma_50'] = self._sma_long.update(mid)
+
+        # Volume analysis
+        with np.errstate(invalid='ignore', divide='ignore'):
+            volume_ratio = bid_volume / ask_volume
+            book_imbalance = (bid_volume - ask_volume) / (bid_volume + ask_volume)
+        columns['volume_ratio'] = volume_ratio
+        columns['volume_sma'] = self._volume_sma.update(volume_ratio)
+
+        # Volatility indicators, previous mid carries over from the last batch
+        prev_mid = np.empty_like(mid)
+        prev_mid[0] = np.nan if self._last_mid is None else self._last_mid
+        prev_mid[1:] = mid[:-1]
+        true_range = np.fmax(np.fmax(ask - bid, np.abs(ask - prev_mid)), np.abs(bid - prev_mid))
+        atr = self._atr.update(true_range)
+        columns['atr'] = atr
+        sma, std = self._bollinger.update(mid, with_std=True)
+        columns['bollinger_upper'] = sma + std * self.strategy.BOLLINGER_WIDTH
+        columns['bollinger_lower'] = sma - std * self.strategy.BOLLINGER_WIDTH
+
+        # Momentum indicators
+        delta = mid - prev_mid
+        gain = self._gain.update(np.where(delta > 0, delta, 0))
+        loss = self._loss.update(-np.where(delta < 0, delta, 0))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            columns['rsi'] = 100 - (100 / (1 + gain / loss))
+        macd = self._ema_fast.update(mid) - self._ema_slow.update(mid)
+        columns['macd'] = macd
+        columns['macd_signal'] = self._ema_signal.update(macd)
+
+        # Order book imbalance
+        columns['book_imbalance'] = book_imbalance
+        columns['imbalance_sma'] = self._imbalance_sma.update(book_imbalance)
+
+        # Generate trading signals, the strategy's rules work on the arrays as they do on frame columns
+        atr_baseline = self._atr_baseline.update(atr)
+        columns['long_signal'] = self.strategy._generate_long_signals(columns, atr_baseline)
+        columns['short_signal'] = self.strategy._generate_short_signals(columns, atr_baseline)
+
+        self._last_mid = mid[-1]
+        self.rows_seen += len(batch)
+        if any(column in columns for column in batch.columns):  # a batch that went through here already
+            batch = batch.drop(columns=[column for column in batch.columns if column in columns])
+        return pd.concat([batch, pd.DataFrame(columns, index=batch.index)], axis=1)
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from asof_join import DIRECTIONS, asof_join, asof_join_grouped
+
+TOLERANCES = [None, pd.Timedelta('30ms')]  # on the 3ms tick grid, so some distances equal it exactly
+
+
+def _ticks(n: int, rng, start='1900-01-01 09:30', step_ms=30) -> pd.Series:
+    # coarse steps, so left and right share timestamps and each side has ties of its own
+    offsets = np.sort(rng.integers(0, n * step_ms // 3, n)) * 3
+    return pd.Timestamp(start) + pd.to_timedelta(offsets, unit='ms')
+
+
+def _quotes(n: int, rng, **kwargs) -> pd.DataFrame:
+    return pd.DataFrame({'timestamp': _ticks(n, rng, **kwargs), 'bidPrice': rng.normal(100, 1, n),
+                         'bidVolume': rng.integers(1, 500, n)})
+
+
+def _trades(n: int, rng, **kwargs) -> pd.DataFrame:
+    return pd.DataFrame({'timestamp': _ticks(n, rng, **kwargs), 'price': rng.normal(100, 1, n),
+                         'volume': rng.integers(1, 500, n)})
+
+
+def _assert_frames_match(result: pd.DataFrame, expected: pd.DataFrame) -> None:
+    assert list(result.columns) == list(expected.columns)
+    for column in expected.columns:
+        # values exactly, not dtypes: merge_asof keeps ints when every row matched, asof_join always has room for NaN
+        pd.testing.assert_series_equal(result[column].reset_index(drop=True), expected[column].reset_index(drop=True),
+                                       check_dtype=False, check_exact=True)
+
+
+@pytest.mark.parametrize('direction', DIRECTIONS)
+@pytest.mark.parametrize('tolerance', TOLERANCES)
+def test_matches_merge_asof(direction, tolerance):
+    rng = np.random.default_rng(DIRECTIONS.index(direction))
+    for _ in range(20):
+        left, right = _quotes(200, rng), _trades(60, rng)
+        expected = pd.merge_asof(left, right, on='timestamp', direction=direction, tolerance=tolerance)
+        _assert_frames_match(asof_join(left, right, 'timestamp', direction, tolerance), expected)
+
+
+@pytest.mark.parametrize('direction', DIRECTIONS)
+def test_no_right_rows_in_reach(direction):
+    rng = np.random.default_rng(3)
+    left = _quotes(50, rng)
+    right = _trades(10, rng, start='1900-01-01 15:00')  # all after the quotes
+    expected = pd.merge_asof(left, right, on='timestamp', direction=direction, tolerance=pd.Timedelta('1s'))
+    result = asof_join(left, right, 'timestamp', direction, pd.Timedelta('1s'))
+    assert result['price'].isna().all()
+    _assert_frames_match(result, expected)
+
+
+def test_empty_right():
+    rng = np.random.default_rng(4)
+    left = _quotes(20, rng)
+    result = asof_join(left, _trades(0, rng))
+    assert len(result) == 20 and result['price'].isna().all()
+
+
+@pytest.mark.parametrize('direction', DIRECTIONS)
+@pytest.mark.parametrize('tolerance', TOLERANCES)
+def test_grouped_matches_merge_asof_by(direction, tolerance):
+    rng = np.random.default_rng(10 + DIRECTIONS.index(direction))
+    lefts, rights = [], []
+    for stock in 'ABC':
+        lefts.append(_quotes(150, rng).assign(stock=stock))
+        if stock != 'C':  # C has quotes but no trades at all
+            rights.append(_trades(50, rng).assign(stock=stock))
+    left = pd.concat(lefts, ignore_index=True)
+    right = pd.concat(rights, ignore_index=True)
+
+    expected = pd.merge_asof(left.sort_values('timestamp', kind='stable'), right.sort_values('timestamp', kind='stable'),
+                             on='timestamp', by='stock', direction=direction, tolerance=tolerance)
+    expected = expected.sort_values('stock', kind='stable').reset_index(drop=True)
+    result = asof_join_grouped(left, right, ['stock'], 'timestamp', direction, tolerance)
+    assert result.loc[result['stock'] == 'C', 'price'].isna().all()
+    _assert_frames_match(result[expected.columns], expected)
@@ -0,0 +1,155 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest_engine import BacktestEngine
+from conftest import DATA_DIR
+from data_loader import MarketDataLoader
+from trading_strategy import TradingStrategy
+
+PORTFOLIO_VALUE = 1_000_000
+
+
+def reference_pnl(strategy: TradingStrategy, signals_df: pd.DataFrame, open_positions=()) -> pd.DataFrame:
+    """The per-row loop calculate_pnl ran before BacktestEngine, positions in a dict."""
+    positions = {key: [price, size, entry_time, sl, tp] for key, price, size, entry_time, sl, tp in open_positions}
+    mid = signals_df['mid_price'].to_numpy()
+    long_signal = signals_df['long_signal'].to_numpy()
+    short_signal = signals_df['short_signal'].to_numpy()
+    pnl_records = []
+
+    for i in range(len(signals_df)):
+        current_price = mid[i]
+        timestamp = signals_df.index[i]
+
+        closed_positions = []
+        for symbol, (_, size, _, stop_loss, take_profit) in positions.items():
+            if size > 0:
+                if current_price <= stop_loss or current_price >= take_profit:
+                    closed_positions.append(symbol)
+            elif current_price >= stop_loss or current_price <= take_profit:
+                closed_positions.append(symbol)
+        for symbol in closed_positions:
+            del positions[symbol]
+
+        if len(positions) < strategy.MAX_POSITIONS:
+            for is_long, signal in ((True, long_signal), (False, short_signal)):
+                if signal[i]:
+                    stop_loss = strategy.calculate_stop_loss(signals_df, i, is_long)
+                    size = strategy.calculate_position_size(current_price, stop_loss, PORTFOLIO_VALUE)
+                    take_profit = strategy.calculate_take_profit(current_price, stop_loss, is_long)
+                    positions[f"{'long' if is_long else 'short'}_{timestamp}"] = [
+                        current_price, size if is_long else -size, timestamp, stop_loss, take_profit]
+                    break
+
+        total_pnl = sum(size * (current_price - price) for price, size, _, _, _ in positions.values())
+        pnl_records.append({'pnl': total_pnl, 'pnl_percentage': (total_pnl / PORTFOLIO_VALUE) * 100})
+
+    return pd.DataFrame(pnl_records, columns=['pnl', 'pnl_percentage']).astype(np.float64)
+
+
+def _assert_same_pnl(signals_df: pd.DataFrame, open_positions=()) -> pd.DataFrame:
+    strategy = TradingStrategy()
+    expected = reference_pnl(strategy, signals_df, open_positions)
+    pnl_df, _ = BacktestEngine(strategy, PORTFOLIO_VALUE).run(signals_df, list(open_positions))
+    # bit for bit, not approximately
+    np.testing.assert_array_equal(pnl_df['pnl'].to_numpy(), expected['pnl'].to_numpy())
+    np.testing.assert_array_equal(pnl_df['pnl_percentage'].to_numpy(), expected['pnl_percentage'].to_numpy())
+    return pnl_df
+
+
+def _frame(mid, long_rows=(), short_rows=(), atr=0.05, spread=0.01) -> pd.DataFrame:
+    mid = np.asarray(mid, dtype=np.float32)
+    n = len(mid)
+    long_signal = np.zeros(n, dtype=bool)
+    short_signal = np.zeros(n, dtype=bool)
+    long_signal[list(long_rows)] = True
+    short_signal[list(short_rows)] = True
+    return pd.DataFrame({
+        'timestamp': pd.Timestamp('1900-01-01 09:30') + pd.to_timedelta(np.arange(n), unit='s'),
+        'bidPrice': mid - np.float32(spread / 2),
+        'askPrice': mid + np.float32(spread / 2),
+        'mid_price': mid,
+        'atr': np.broadcast_to(np.asarray(atr, dtype=np.float32), n).copy(),
+        'long_signal': long_signal,
+        'short_signal': short_signal,
+    })
+
+
+def test_matches_reference_on_bundled_session():
+    data_dir = os.path.join(DATA_DIR, 'Period1', 'B')
+    if not os.path.isdir(data_dir):
+        pytest.skip(f"{data_dir} not bundled")
+    market_data = MarketDataLoader().load_market_data(data_dir, 'B')
+    signals_df = TradingStrategy().calculate_signals(market_data)
+    assert signals_df['long_signal'].any() or signals_df['short_signal'].any()
+    pnl_df = _assert_same_pnl(signals_df)
+    assert (pnl_df['pnl'] != 0).any()
+
+
+def test_matches_reference_on_random_walks():
+    rng = np.random.default_rng(7)
+    for _ in range(20):
+        n = 400
+        mid = 100 + np.cumsum(rng.normal(0, 0.05, n))
+        rows = rng.choice(n, 40, replace=False)
+        _assert_same_pnl(_frame(mid, long_rows=rows[:20], short_rows=rows[20:], atr=rng.uniform(0.01, 0.2, n)))
+
+
+def test_matches_reference_on_tick_grid():
+    # prices on a 0.01 grid with no spread, so stops and targets get hit exactly, not just crossed
+    rng = np.random.default_rng(11)
+    for _ in range(20):
+        n = 400
+        mid = 100 + np.cumsum(rng.integers(-1, 2, n)) / 100
+        rows = rng.choice(n, 60, replace=False)
+        _assert_same_pnl(_frame(mid, long_rows=rows[:30], short_rows=rows[30:], atr=0.0, spread=0.0))
+
+
+def test_positions_carried_in_from_earlier_chunk():
+    mid = np.linspace(100, 101, 200)
+    seeds = [
+        ('long_prev', np.float32(100.2), 500, pd.Timestamp('1900-01-01 09:00'), 99.0, 100.5),  # target hit mid-chunk
+        ('short_prev', np.float32(100.0), -300, pd.Timestamp('1900-01-01 09:01'), 102.0, 95.0),  # stays open
+    ]
+    signals_df = _frame(mid, long_rows=[50, 120])
+    _assert_same_pnl(signals_df, seeds)
+
+    strategy = TradingStrategy()
+    engine = BacktestEngine(strategy, PORTFOLIO_VALUE)
+    _, remaining = engine.run(signals_df, seeds)
+    assert 'short_prev' in [key for key, *_ in remaining]
+    assert 'long_prev' in engine.trades['key'].tolist()
+    assert engine.trades.loc[engine.trades['key'] == 'long_prev', 'entry_row'].item() == -1
+
+
+def test_size_zero_entries():
+    # flat price with zero ATR: the stop sits on the entry price, so the size is 0
+    mid = np.full(60, 100.0)
+    signals_df = _frame(mid, long_rows=[10, 20], short_rows=[30], atr=0.0, spread=0.0)
+    pnl_df = _assert_same_pnl(signals_df)
+    assert (pnl_df['pnl'] == 0).all()
+
+
+def test_nan_atr_rows():
+    # NaN ATR through the warm-up like a real session, entries only once it's defined
+    mid = 100 + np.sin(np.arange(300) / 10)
+    atr = np.full(300, 0.05)
+    atr[:100] = np.nan
+    _assert_same_pnl(_frame(mid, long_rows=[120, 200], short_rows=[150], atr=atr))
+
+
+def test_nan_atr_entry_fails_like_reference():
+    # a NaN stop gives a NaN position size, which int() refuses in both
+    signals_df = _frame(np.full(20, 100.0), long_rows=[5], atr=np.nan)
+    with pytest.raises(ValueError):
+        reference_pnl(TradingStrategy(), signals_df)
+    with pytest.raises(ValueError):
+        BacktestEngine(TradingStrategy(), PORTFOLIO_VALUE).run(signals_df)
+
+
+def test_empty_frame():
+    pnl_df, remaining = BacktestEngine(TradingStrategy(), PORTFOLIO_VALUE).run(_frame([]))
+    assert pnl_df.empty and remaining == []
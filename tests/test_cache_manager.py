@@ -0,0 +1,57 @@
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from cache_manager import CacheManager
+from columnar_cache import ColumnarStore, write_columnar
+from data_loader import MarketDataLoader
+
+
+def _frame(n: int = 1000) -> pd.DataFrame:
+    return pd.DataFrame({'timestamp': pd.date_range('1900-01-01 09:30', periods=n, freq='ms'),
+                         'bidPrice': np.linspace(100, 101, n, dtype=np.float32)})
+
+
+def test_only_columnar_stores_and_pickles_are_entries(tmp_path):
+    cache = CacheManager(tmp_path, max_bytes=None)
+    store = write_columnar(_frame(), tmp_path / 'market_data_A_0123')
+    pickled = tmp_path / 'market_data_B_4567.pkl'
+    pickled.write_bytes(pickle.dumps(_frame()))
+    index = tmp_path / 'time_index_market_data_A_89ab.npz'
+    np.savez(index, offsets=np.arange(10))
+    (tmp_path / 'market_data_C_cdef.tmp-x1y2').mkdir()  # some other writer, mid-write
+
+    assert {path for path, _, _ in cache.entries()} == {store, pickled}
+    cache.clear()
+    assert not ColumnarStore.exists(store) and not pickled.exists()
+    assert index.exists() and (tmp_path / 'market_data_C_cdef.tmp-x1y2').exists()
+
+
+def test_eviction_keeps_time_indexes(tmp_path):
+    cache = CacheManager(tmp_path, max_bytes=None)
+    index = tmp_path / 'time_index_market_data_A_89ab.npz'
+    np.savez(index, offsets=np.arange(100_000))
+    os.utime(index, (0, 0))  # the oldest file in the dir, first in line if it counted
+    store = write_columnar(_frame(), tmp_path / 'market_data_A_0123')
+    assert cache.evict(max_bytes=1, keep=(store,)) == 0
+    assert index.exists()
+
+
+def test_columnar_loader_ignores_pickles(tmp_path):
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    (data_dir / 'market_data_A.csv').write_text('timestamp,bidPrice,askPrice,bidVolume,askVolume\n'
+                                                '09:30:00.000000,100.0,100.5,10,20\n'
+                                                '09:30:00.500000,100.25,100.75,11,21\n')
+    cache_dir = tmp_path / 'cache'
+    pickled = MarketDataLoader(cache_dir=str(cache_dir), cache_format='pickle')
+    assert len(pickled.load_market_data(str(data_dir), 'A')) == 2
+    pkl_path = pickled._get_cached_path(str(data_dir), 'A')
+    with pkl_path.open('wb') as f:  # a pickle with the right key but the wrong frame
+        pickle.dump(_frame(5), f)
+    assert len(MarketDataLoader(cache_dir=str(cache_dir), cache_format='pickle').load_market_data(str(data_dir), 'A')) == 5
+
+    df = MarketDataLoader(cache_dir=str(cache_dir)).load_market_data(str(data_dir), 'A')
+    assert list(df['bidPrice']) == [100.0, 100.25]
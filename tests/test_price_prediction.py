@@ -0,0 +1,100 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import DATA_DIR
+from data_loader import MarketDataLoader
+from price_prediction import predict_price_changes
+
+
+def reference_predictions(market_data: pd.DataFrame):
+    """predict_price_changes before it was vectorized: per-trigger .loc lookups, dict rows, groupby mean."""
+    if market_data is None or len(market_data) < 30:
+        return None
+    data = market_data.copy()
+    data['timestamp'] = pd.to_datetime(data['timestamp'], format='%H:%M:%S.%f')
+    data = data.sort_values('timestamp')
+
+    data['ema_short'] = data['bidPrice'].ewm(span=10, adjust=False).mean()
+    data['ema_long'] = data['bidPrice'].ewm(span=30, adjust=False).mean()
+    data['momentum'] = data['bidPrice'].diff(periods=10)
+    data['volatility'] = data['bidPrice'].rolling(window=20, min_periods=1).std()
+    data['trend_change'] = (data['ema_short'] > data['ema_long']) & (data['momentum'].abs() > data['volatility'])
+
+    prediction_window = 5
+    predictions = []
+    for idx in data.index[data['trend_change']].tolist():
+        if idx + prediction_window >= len(data):
+            continue
+        momentum = data.loc[idx, 'momentum']
+        start_price = data.loc[idx, 'bidPrice']
+        future_slice = data.iloc[idx + 1:idx + prediction_window + 1]
+        predicted_prices = start_price + np.arange(1, prediction_window + 1) * momentum
+        predictions.extend({'timestamp': ts, 'predicted_price': price}
+                           for ts, price in zip(future_slice['timestamp'], predicted_prices))
+    if not predictions:
+        return None
+    prediction_df = pd.DataFrame(predictions).groupby('timestamp')['predicted_price'].mean().reset_index()
+    return prediction_df.sort_values('timestamp')
+
+
+def _assert_same_predictions(market_data: pd.DataFrame) -> None:
+    expected = reference_predictions(market_data)
+    result = predict_price_changes(market_data)
+    if expected is None:
+        assert result is None
+        return
+    # identical, not approximately equal
+    pd.testing.assert_frame_equal(result.reset_index(drop=True), expected.reset_index(drop=True),
+                                  check_exact=True)
+
+
+def _synthetic(n: int, seed: int, duplicate_every: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    times = pd.Timestamp('1900-01-01 09:30') + pd.to_timedelta(np.cumsum(rng.integers(1, 500, n)), unit='ms')
+    if duplicate_every:
+        times = times[np.arange(n) // duplicate_every * duplicate_every]  # runs of equal timestamps
+    bid = (100 + np.cumsum(rng.normal(0, 0.05, n))).astype(np.float32)
+    return pd.DataFrame({'timestamp': times, 'bidPrice': bid, 'askPrice': bid + np.float32(0.01)})
+
+
+@pytest.fixture(scope='module')
+def session() -> pd.DataFrame:
+    data_dir = os.path.join(DATA_DIR, 'Period1', 'B')
+    if not os.path.isdir(data_dir):
+        pytest.skip(f"{data_dir} not bundled")
+    return MarketDataLoader().load_market_data(data_dir, 'B')
+
+
+def test_bundled_session(session):
+    _assert_same_predictions(session)
+
+
+def test_bundled_session_raw_timestamps():
+    path = os.path.join(DATA_DIR, 'Period1', 'B', 'market_data_B.csv')
+    if not os.path.exists(path):
+        pytest.skip(f"{path} not bundled")
+    raw = pd.read_csv(path, nrows=5000)  # timestamps still as time-of-day strings
+    assert not pd.api.types.is_datetime64_any_dtype(raw['timestamp'])
+    _assert_same_predictions(raw)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_synthetic_fixture(seed):
+    _assert_same_predictions(_synthetic(400, seed))
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_duplicate_timestamps_are_averaged(seed):
+    _assert_same_predictions(_synthetic(400, seed, duplicate_every=3))
+
+
+def test_unsorted_rows():
+    shuffled = _synthetic(400, 3, duplicate_every=2).sample(frac=1, random_state=0).reset_index(drop=True)
+    _assert_same_predictions(shuffled)
+
+
+def test_too_short():
+    assert predict_price_changes(_synthetic(29, 0)) is None
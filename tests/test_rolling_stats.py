@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from rolling_stats import rolling_linregress, rolling_time_std
+
+SECOND_NS = 1_000_000_000
+
+
+def reference_linregress(values: np.ndarray, window: int):
+    """Per-window OLS with np.polyfit, what linregress(arange(window), y) gives."""
+    n = len(values)
+    x = np.arange(window, dtype=np.float64)
+    out = {name: np.full(n, np.nan) for name in ('slope', 'intercept', 'rvalue', 'stderr', 'prediction', 'resid_std')}
+    for i in range(window - 1, n):
+        y = values[i - window + 1:i + 1]
+        if np.isnan(y).any():
+            continue
+        slope, intercept = np.polyfit(x, y, 1)
+        fitted = intercept + slope * x
+        out['slope'][i] = slope
+        out['intercept'][i] = intercept
+        out['prediction'][i] = intercept + slope * window
+        out['resid_std'][i] = np.sqrt(np.sum((y - fitted) ** 2) / (window - 2))
+        out['stderr'][i] = out['resid_std'][i] / np.sqrt(np.sum((x - x.mean()) ** 2))
+        out['rvalue'][i] = 0.0 if np.all(y == y[0]) else np.corrcoef(x, y)[0, 1]
+    return out
+
+
+def _prices(n: int, seed: int, nan_rows=(), flat=None) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    values = 100 + np.cumsum(rng.normal(0, 0.05, n))
+    values[list(nan_rows)] = np.nan
+    if flat is not None:
+        values[flat] = values[flat.start]
+    return values
+
+
+@pytest.mark.parametrize('window', [3, 5, 20, 64])
+def test_matches_polyfit(window):
+    values = _prices(600, window, nan_rows=[0, 1, 2, 150, 151, 420], flat=slice(300, 380))
+    fit = rolling_linregress(values, window)
+    expected = reference_linregress(values, window)
+    for name, reference in expected.items():
+        result = getattr(fit, name)
+        np.testing.assert_array_equal(np.isnan(result), np.isnan(reference), err_msg=name)
+        np.testing.assert_allclose(result, reference, rtol=1e-7, atol=1e-9, equal_nan=True, err_msg=name)
+
+
+def test_long_series_keeps_precision():
+    # the running sums restart every block, so the end of a long series fits as well as its start
+    window = 30
+    values = _prices(300_000, 5)
+    fit = rolling_linregress(values, window)
+    tail = values[-200:]
+    expected = reference_linregress(tail, window)
+    for name, reference in expected.items():
+        # the reference only has full windows from the tail's own window - 1 on
+        np.testing.assert_allclose(getattr(fit, name)[-200 + window - 1:], reference[window - 1:],
+                                   rtol=1e-7, atol=1e-9, err_msg=name)
+
+
+def test_warm_up_and_nan_windows_are_nan():
+    window = 10
+    values = _prices(100, 1, nan_rows=[40])
+    fit = rolling_linregress(values, window)
+    assert np.isnan(fit.slope[:window - 1]).all()
+    assert np.isnan(fit.slope[40:40 + window]).all()
+    assert not np.isnan(fit.slope[window - 1:40]).any()
+    assert not np.isnan(fit.slope[40 + window:]).any()
+
+
+def test_constant_window_is_exact():
+    fit = rolling_linregress(np.full(30, 101.37), 8)
+    assert (fit.slope[7:] == 0).all() and (fit.rvalue[7:] == 0).all() and (fit.resid_std[7:] == 0).all()
+    assert (fit.intercept[7:] == 101.37).all() and (fit.prediction[7:] == 101.37).all()
+
+
+def test_short_input_and_bad_window():
+    assert np.isnan(rolling_linregress(np.arange(4.0), 5).slope).all()
+    with pytest.raises(ValueError):
+        rolling_linregress(np.arange(10.0), 2)
+
+
+def _irregular_times(n: int, seed: int) -> np.ndarray:
+    # ns timestamps with bursts of duplicates, sub-ms steps and gaps well past a 30s window
+    rng = np.random.default_rng(seed)
+    steps = rng.choice([0, 1, 137, 2_500_000, 400_000_000, 3 * SECOND_NS], n, p=[0.1, 0.1, 0.2, 0.3, 0.28, 0.02])
+    steps[n // 3] = 95 * SECOND_NS
+    steps[2 * n // 3] = 31 * SECOND_NS
+    return 1_700_000_000 * SECOND_NS + np.cumsum(steps)
+
+
+@pytest.mark.parametrize('window_s', [1, 5, 30])
+@pytest.mark.parametrize('ddof', [0, 1])
+def test_time_std_matches_pandas(window_s, ddof):
+    n = 5000
+    times = _irregular_times(n, window_s)
+    values = _prices(n, window_s, nan_rows=[0, 7, 2000, 2001])
+    values[3000:3200] = values[3000]  # a flat stretch
+    expected = pd.Series(values, index=pd.to_datetime(times)).rolling(f'{window_s}s').std(ddof=ddof).to_numpy()
+    result = rolling_time_std(times, values, window_s * SECOND_NS, ddof)
+    np.testing.assert_array_equal(np.isnan(result), np.isnan(expected))
+    # both leave a few 1e-7 of residue on flat windows, where the true std is 0
+    np.testing.assert_allclose(result, expected, rtol=1e-6, atol=1e-6, equal_nan=True)
+
+
+def test_time_std_window_is_open_on_the_left():
+    # on a 250ms grid plenty of points sit exactly one window back, and (t - window, t] leaves them out
+    rng = np.random.default_rng(7)
+    times = np.cumsum(rng.integers(0, 9, 3000)) * 250_000_000
+    values = _prices(3000, 7)
+    expected = pd.Series(values, index=pd.to_datetime(times)).rolling('5s').std().to_numpy()
+    np.testing.assert_allclose(rolling_time_std(times, values, 5 * SECOND_NS), expected,
+                               rtol=1e-6, atol=1e-6, equal_nan=True)
+
+
+def test_time_std_after_a_gap_starts_over():
+    times = np.array([0, 1, 2, 100, 101], dtype=np.int64) * SECOND_NS
+    result = rolling_time_std(times, np.array([1.0, 2.0, 4.0, 10.0, 12.0]), 30 * SECOND_NS)
+    assert np.isnan(result[0]) and np.isnan(result[3])  # one point in the window
+    assert result[4] == pytest.approx(np.std([10.0, 12.0], ddof=1))
+    assert rolling_time_std(np.empty(0, dtype=np.int64), np.empty(0), SECOND_NS).shape == (0,)
@@ -0,0 +1,27 @@
+import pandas as pd
+
+from strategy_sweep import METRICS, rank_results
+
+
+def _rows(statuses):
+    rows = []
+    for combo, (sma_short, status) in enumerate(statuses):
+        row = {'combo': combo, 'sma_short': sma_short, 'period': 'Period1', 'stock': 'A', 'status': status}
+        if status == 'ok':
+            row.update({metric: float(combo) for metric in METRICS})
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def test_rank_best_first():
+    table = rank_results(_rows([(10, 'ok'), (20, 'ok'), (30, 'error')]))
+    assert list(table['combo']) == [1, 0]
+    assert list(table['rank']) == [1, 2]
+    assert list(table['sma_short']) == [20, 10]
+
+
+def test_rank_with_no_ok_sessions_is_empty():
+    # no row ever got the metric columns, that's an empty ranking rather than a KeyError
+    table = rank_results(_rows([(10, 'no_data'), (20, 'error')]))
+    assert table.empty
+    assert {'rank', 'sma_short', 'sessions', *METRICS} <= set(table.columns)
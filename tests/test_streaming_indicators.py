@@ -0,0 +1,74 @@
+import os
+from itertools import cycle
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import DATA_DIR
+from data_loader import MarketDataLoader
+from streaming_indicators import StreamingIndicators
+from trading_strategy import TradingStrategy
+
+INDICATOR_COLUMNS = ['mid_price', 'price_sma_20', 'price_sma_50', 'volume_ratio', 'volume_sma', 'atr',
+                     'bollinger_upper', 'bollinger_lower', 'rsi', 'macd', 'macd_signal',
+                     'book_imbalance', 'imbalance_sma']
+SIGNAL_COLUMNS = ['long_signal', 'short_signal']
+# pandas' rolling std leaves ~1e-7 of residue on flat windows of float32 prices, the streaming one gives 0
+ATOL = 1e-6
+
+
+def _stream(market_data: pd.DataFrame, batch_sizes, strategy=None) -> pd.DataFrame:
+    streaming = StreamingIndicators(strategy)
+    parts, start = [], 0
+    for size in cycle(batch_sizes):
+        if start >= len(market_data):
+            break
+        parts.append(streaming.update(market_data.iloc[start:start + size]))
+        start += size
+    assert streaming.rows_seen == len(market_data)
+    return pd.concat(parts)
+
+
+def _assert_matches_batch(market_data: pd.DataFrame, batch_sizes, strategy=None) -> None:
+    expected = (strategy or TradingStrategy()).calculate_signals(market_data)
+    streamed = _stream(market_data, batch_sizes, strategy)
+    assert list(streamed.columns) == list(expected.columns)
+    assert streamed.index.equals(expected.index)
+    for column in INDICATOR_COLUMNS:
+        np.testing.assert_allclose(streamed[column].to_numpy(dtype=np.float64),
+                                   expected[column].to_numpy(dtype=np.float64),
+                                   rtol=1e-9, atol=ATOL, equal_nan=True, err_msg=column)
+    for column in SIGNAL_COLUMNS:
+        np.testing.assert_array_equal(streamed[column].to_numpy(), expected[column].to_numpy(), err_msg=column)
+
+
+@pytest.fixture(scope='module')
+def session() -> pd.DataFrame:
+    data_dir = os.path.join(DATA_DIR, 'Period1', 'B')
+    if not os.path.isdir(data_dir):
+        pytest.skip(f"{data_dir} not bundled")
+    return MarketDataLoader().load_market_data(data_dir, 'B')
+
+
+def test_uneven_batches_match_calculate_signals(session):
+    _assert_matches_batch(session, [1, 7, 1000])
+
+
+def test_one_batch_matches_calculate_signals(session):
+    _assert_matches_batch(session, [len(session)])
+
+
+def test_parametrized_strategy(session):
+    strategy = TradingStrategy(sma_short=5, sma_long=30, atr_period=7, atr_baseline=40, macd_fast=6, macd_slow=13)
+    _assert_matches_batch(session.iloc[:20000], [3, 250], strategy)
+
+
+def test_empty_batch_changes_nothing(session):
+    streaming = StreamingIndicators()
+    first = streaming.update(session.iloc[:100])
+    assert streaming.update(session.iloc[:0]).empty
+    second = streaming.update(session.iloc[100:200])
+    expected = TradingStrategy().calculate_signals(session.iloc[:200])
+    np.testing.assert_allclose(pd.concat([first, second])['macd'].to_numpy(), expected['macd'].to_numpy(),
+                               rtol=1e-9, atol=ATOL, equal_nan=True)
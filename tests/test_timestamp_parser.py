@@ -0,0 +1,64 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import DATA_DIR
+from timestamp_parser import parse_timestamp_column, parse_timestamps_ns
+
+FORMAT = '%H:%M:%S.%f'
+
+
+def _read_timestamps(path: str, rows: int = 50000) -> pd.Series:
+    return pd.read_csv(path, usecols=['timestamp'], dtype={'timestamp': 'str'}, nrows=rows)['timestamp']
+
+
+def _assert_matches_pandas(values: pd.Series) -> None:
+    # same values, or the same error
+    try:
+        expected = pd.to_datetime(values, format=FORMAT)
+    except ValueError:
+        with pytest.raises(ValueError):
+            parse_timestamp_column(values, 'fast')
+        return
+    pd.testing.assert_series_equal(parse_timestamp_column(values, 'fast'), expected, check_names=False)
+
+
+@pytest.mark.parametrize('path', [
+    os.path.join(DATA_DIR, 'Period1', 'B', 'market_data_B.csv'),
+    os.path.join(DATA_DIR, 'Period1', 'A', 'trade_data_A.csv'),
+])
+def test_real_columns_match_pandas(path):
+    if not os.path.exists(path):
+        pytest.skip(f"{path} not bundled")
+    values = _read_timestamps(path)
+    assert parse_timestamps_ns(values) is not None  # the fast path itself, not the fallback
+    _assert_matches_pandas(values)
+
+
+@pytest.mark.parametrize('values', [
+    ['09:30:00.000000001', '23:59:59.999999999', '00:00:00.000000000'],
+    ['09:30:00.5', '09:30:00.123456'],  # short fractions
+    ['09:30:00.1234567890'],  # fraction longer than ns
+    ['09:30:00.000000001', None, np.nan],
+    ['ab:cd:ef.000000000'],
+    ['09:3x:00.000000000'],
+    ['9:30:00.000000001'],
+    ['25:00:00.000000000'],
+    ['12:60:00.000000000'],
+    ['12:00:60.000000000'],
+    ['25:61:61.000000000'],
+])
+def test_edge_cases_match_pandas(values):
+    _assert_matches_pandas(pd.Series(values, dtype=object))
+
+
+@pytest.mark.parametrize('value', ['24:00:00.000000000', '23:60:00.000000000', '23:59:60.000000000'])
+def test_out_of_range_fields_are_rejected(value):
+    assert parse_timestamps_ns(pd.Series([value])) is None
+
+
+def test_fast_path_values():
+    ns = parse_timestamps_ns(pd.Series(['00:00:01.000000002', '23:59:59.999999999']))
+    assert ns.tolist() == [1_000_000_002, 86_399_999_999_999]
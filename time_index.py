@@ -0,0 +1,108 @@
+import io
+import logging
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Optional, Tuple
+
+from timestamp_parser import parse_timestamp_column, to_session_time
+
+INDEX_STRIDE = 4096  # rows between index entries, a window read overshoots by at most this many on each side
+
+
+class SparseTimeIndex:
+    """Timestamp, row number and byte offset of every INDEX_STRIDE-th row of one sorted CSV.
+
+    Finding a time range is a binary search over the samples, and reading it is a
+    single seek + read of the bytes between two samples, so a windowed query costs
+    time proportional to the window instead of the file.
+    """
+
+    def __init__(self, times: np.ndarray, rows: np.ndarray, offsets: np.ndarray,
+                 n_rows: int, data_end: int, header: bytes):
+        self.times = times  # datetime64[ns], sorted
+        self.rows = rows
+        self.offsets = offsets
+        self.n_rows = n_rows
+        self.data_end = data_end
+        self.header = header
+
+    @classmethod
+    def build(cls, csv_path, time_column: str = 'timestamp', stride: int = INDEX_STRIDE) -> 'SparseTimeIndex':
+        raw = np.memmap(csv_path, dtype=np.uint8, mode='r') if Path(csv_path).stat().st_size else np.empty(0, np.uint8)
+        newlines = np.flatnonzero(raw == ord('\n'))
+        header_end = int(newlines[0]) + 1 if len(newlines) else len(raw)
+        header = bytes(raw[:header_end])
+        field = header.decode().strip().split(',').index(time_column)
+
+        line_starts = newlines + 1
+        line_ends = np.append(newlines[1:], len(raw))
+        if len(line_starts) and line_starts[-1] >= len(raw):  # file ends with a newline, no row after it
+            line_starts, line_ends = line_starts[:-1], line_ends[:-1]
+        n_rows = len(line_starts)
+
+        rows = np.arange(0, n_rows, stride, dtype=np.int64)
+        offsets = line_starts[rows].astype(np.int64)
+        stamps = [raw[offset:line_end].tobytes().decode().strip().split(',')[field]
+                  for offset, line_end in zip(offsets, line_ends[rows])]
+        times = parse_timestamp_column(pd.Series(stamps, dtype=object)).to_numpy().astype('datetime64[ns]') \
+            if stamps else np.empty(0, dtype='datetime64[ns]')
+
+        if len(times) > 1 and (np.diff(times.view(np.int64)) < 0).any():
+            raise ValueError(f"{csv_path} is not sorted by {time_column}")
+        return cls(times, rows, offsets, n_rows, len(raw), header)
+
+    def save(self, path) -> None:
+        with open(path, 'wb') as f:  # np.savez would tack on .npz
+            np.savez(f, times=self.times.view(np.int64), rows=self.rows, offsets=self.offsets,
+                     meta=np.array([self.n_rows, self.data_end], dtype=np.int64),
+                     header=np.frombuffer(self.header, dtype=np.uint8))
+
+    @classmethod
+    def load(cls, path) -> 'SparseTimeIndex':
+        with np.load(path) as data:
+            n_rows, data_end = (int(v) for v in data['meta'])
+            return cls(data['times'].view('datetime64[ns]'), data['rows'], data['offsets'],
+                       n_rows, data_end, data['header'].tobytes())
+
+    def locate(self, start=None, end=None) -> Tuple[int, int, int]:
+        """(first row, first byte, end byte) of a block of rows that covers [start, end)."""
+        if self.n_rows == 0:
+            return 0, self.data_end, self.data_end
+        first = 0
+        if start is not None:
+            # sample before the first one >= start, the rows equal to start can sit right before it
+            first = max(int(np.searchsorted(self.times, to_session_time(start), 'left')) - 1, 0)
+        stop = len(self.times)
+        if end is not None:
+            stop = int(np.searchsorted(self.times, to_session_time(end), 'left'))
+        if stop <= first:
+            return int(self.rows[first]), int(self.offsets[first]), int(self.offsets[first])
+        end_byte = int(self.offsets[stop]) if stop < len(self.offsets) else self.data_end
+        return int(self.rows[first]), int(self.offsets[first]), end_byte
+
+
+def read_time_window(csv_path, index: SparseTimeIndex, start=None, end=None, dtype=None,
+                     timestamp_parser: str = 'fast', time_column: str = 'timestamp') -> Optional[pd.DataFrame]:
+    """Rows of `csv_path` with start <= time < end, reading only the indexed block around them.
+
+    The result is indexed by row number within the file, like a full read would be.
+    """
+    first_row, first_byte, end_byte = index.locate(start, end)
+    try:
+        with open(csv_path, 'rb') as f:
+            f.seek(first_byte)
+            block = f.read(end_byte - first_byte)
+        df = pd.read_csv(io.BytesIO(index.header + block), dtype=dtype, engine='c')
+    except Exception as e:
+        logging.error(f"Error reading {csv_path} between {start} and {end}: {e}")
+        return None
+
+    df.index = pd.RangeIndex(first_row, first_row + len(df))
+    df[time_column] = parse_timestamp_column(df[time_column], timestamp_parser)
+    mask = np.ones(len(df), dtype=bool)
+    if start is not None:
+        mask &= (df[time_column] >= to_session_time(start)).to_numpy()
+    if end is not None:
+        mask &= (df[time_column] < to_session_time(end)).to_numpy()
+    return df[mask] if not mask.all() else df
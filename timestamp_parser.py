@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+from typing import Optional
+
+TIMESTAMP_WIDTH = 18  # HH:MM:SS.nnnnnnnnn
+SESSION_DATE = np.datetime64('1900-01-01', 'ns')  # same date pd.to_datetime picks for a bare '%H:%M:%S.%f'
+
+_SEPARATORS = {2: ord(':'), 5: ord(':'), 8: ord('.')}
+_DIGIT_POSITIONS = [i for i in range(TIMESTAMP_WIDTH) if i not in _SEPARATORS]
+_FRACTION_WEIGHTS = 10 ** np.arange(8, -1, -1, dtype=np.int64)
+
+
+def parse_timestamps_ns(values) -> Optional[np.ndarray]:
+    """Parse fixed-width 'HH:MM:SS.nnnnnnnnn' strings into int64 nanoseconds since midnight.
+
+    Works on the raw bytes of the whole column at once. Returns None if anything
+    does not match the fixed layout so the caller can fall back to pandas.
+    """
+    raw = np.asarray(values)
+    if raw.dtype.kind not in ('O', 'U', 'S'):
+        raw = raw.astype(str)
+
+    try:
+        # one spare byte so strings longer than the layout show up instead of being truncated
+        encoded = raw.astype(f'S{TIMESTAMP_WIDTH + 1}')
+    except (UnicodeEncodeError, TypeError, ValueError):
+        return None
+
+    n = len(encoded)
+    if n == 0:
+        return np.empty(0, dtype=np.int64)
+
+    chars = encoded.view(np.uint8).reshape(n, TIMESTAMP_WIDTH + 1)
+    if chars[:, TIMESTAMP_WIDTH].any():
+        return None
+    for pos, sep in _SEPARATORS.items():
+        if not (chars[:, pos] == sep).all():
+            return None
+
+    digits = chars[:, _DIGIT_POSITIONS] - np.uint8(ord('0'))
+    if (digits > 9).any():  # also catches short strings, their zero padding wraps around
+        return None
+
+    digits = digits.astype(np.int64)
+    hours = digits[:, 0] * 10 + digits[:, 1]
+    minutes = digits[:, 2] * 10 + digits[:, 3]
+    seconds = digits[:, 4] * 10 + digits[:, 5]
+    if (hours > 23).any() or (minutes > 59).any() or (seconds > 59).any():
+        return None  # out of range, pandas decides whether that's an error
+    fraction = digits[:, 6:] @ _FRACTION_WEIGHTS
+
+    return ((hours * 60 + minutes) * 60 + seconds) * 1_000_000_000 + fraction
+
+
+def ns_to_datetime(ns: np.ndarray) -> np.ndarray:
+    """Turn nanoseconds since midnight into the datetime64 values the rest of the code expects."""
+    return SESSION_DATE + ns.astype('timedelta64[ns]')
+
+
+def parse_timestamp_column(values, parser: str = 'fast'):
+    """Parse a timestamp column with the selected parser, falling back to pandas when needed."""
+    if parser == 'fast':
+        ns = parse_timestamps_ns(values)
+        if ns is not None:
+            return pd.Series(ns_to_datetime(ns), index=getattr(values, 'index', None))
+    return pd.to_datetime(values, format='%H:%M:%S.%f')
+
+
+def to_session_time(value) -> np.datetime64:
+    """A query bound as datetime64[ns]; a bare 'HH:MM:SS[.f]' string is put on the session date."""
+    if isinstance(value, str) and '-' not in value:
+        value = f"{SESSION_DATE.astype('datetime64[D]')} {value}"
+    return np.datetime64(pd.Timestamp(value), 'ns')
@@ -0,0 +1,213 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, Optional
+
+TRADING_DAYS = 252
+SESSION_SECONDS = 6.5 * 3600  # one trading day, for annualising returns over fixed time buckets
+DEFAULT_BUCKET_SECONDS = 60
+
+
+def periods_per_year(bucket_seconds: float = DEFAULT_BUCKET_SECONDS) -> float:
+    return TRADING_DAYS * SESSION_SECONDS / bucket_seconds
+
+
+def _is_datetime(times) -> bool:
+    return np.issubdtype(np.asarray(times).dtype, np.datetime64)
+
+
+def sample_equity(times, equity: np.ndarray, bucket_seconds: float = DEFAULT_BUCKET_SECONDS) -> np.ndarray:
+    """Equity at the end of every `bucket_seconds` bucket, starting with the first tick's equity.
+
+    Ticks are irregular, so returns are taken over fixed time buckets instead; quiet
+    buckets repeat the last equity (a zero return). Times that aren't datetimes are
+    taken as one bucket per row.
+    """
+    equity = np.asarray(equity, dtype=np.float64)
+    if len(equity) == 0 or not _is_datetime(times):
+        return equity
+    ns = np.asarray(times).astype('datetime64[ns]').view(np.int64)
+    bucket = int(bucket_seconds * 1e9)
+    edges = np.arange(ns[0] + bucket, ns[-1] + bucket, bucket)
+    last = np.searchsorted(ns, edges, side='right') - 1  # last tick at or before each bucket end
+    return np.concatenate(([equity[0]], equity[last]))
+
+
+def returns(samples: np.ndarray) -> np.ndarray:
+    samples = np.asarray(samples, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.diff(samples) / samples[:-1]
+
+
+def drawdown(equity: np.ndarray) -> np.ndarray:
+    """Drawdown of every point from the running peak, as a (negative) fraction."""
+    equity = np.asarray(equity, dtype=np.float64)
+    peak = np.maximum.accumulate(equity)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(peak > 0, equity / peak - 1, 0.0)
+
+
+def max_drawdown(equity: np.ndarray) -> float:
+    """Largest peak-to-trough drop, in percent."""
+    if len(equity) == 0:
+        return 0.0
+    return float(-drawdown(equity).min() * 100)
+
+
+def sharpe_ratio(period_returns: np.ndarray, annualization: float = 1.0) -> float:
+    period_returns = period_returns[np.isfinite(period_returns)]
+    if len(period_returns) < 2:
+        return 0.0
+    std = period_returns.std(ddof=1)
+    if std == 0:
+        return 0.0
+    return float(period_returns.mean() / std * np.sqrt(annualization))
+
+
+def sortino_ratio(period_returns: np.ndarray, annualization: float = 1.0) -> float:
+    """Like Sharpe, but only the downside (negative returns) counts as risk."""
+    period_returns = period_returns[np.isfinite(period_returns)]
+    if len(period_returns) < 2:
+        return 0.0
+    downside = np.sqrt(np.mean(np.minimum(period_returns, 0) ** 2))
+    if downside == 0:
+        return 0.0
+    return float(period_returns.mean() / downside * np.sqrt(annualization))
+
+
+def trade_stats(trade_pnl: np.ndarray) -> Dict[str, float]:
+    """Per-trade win rate, profit factor and average win / loss of a ledger's PnL column."""
+    trade_pnl = np.asarray(trade_pnl, dtype=np.float64)
+    wins = trade_pnl[trade_pnl > 0]
+    losses = trade_pnl[trade_pnl < 0]
+    gross_profit = wins.sum()
+    gross_loss = -losses.sum()
+    if gross_loss > 0:
+        profit_factor = gross_profit / gross_loss
+    else:
+        profit_factor = np.inf if gross_profit > 0 else 0.0
+    return {
+        'trades': len(trade_pnl),
+        'win_rate': len(wins) / len(trade_pnl) * 100 if len(trade_pnl) else 0.0,
+        'profit_factor': float(profit_factor),
+        'avg_win': float(wins.mean()) if len(wins) else 0.0,
+        'avg_loss': float(losses.mean()) if len(losses) else 0.0,
+        'expectancy': float(trade_pnl.mean()) if len(trade_pnl) else 0.0,
+    }
+
+
+def compute_metrics(times, equity: np.ndarray, trade_pnl: np.ndarray, portfolio_value: float,
+                    bucket_seconds: float = DEFAULT_BUCKET_SECONDS) -> Dict[str, float]:
+    """Every summary metric from an equity curve and the ledger's per-trade PnL, in single passes."""
+    equity = np.asarray(equity, dtype=np.float64)
+    total_return = float(equity[-1] - portfolio_value) if len(equity) else 0.0
+    samples = sample_equity(times, equity, bucket_seconds)
+    period_returns = returns(samples)
+    annualization = periods_per_year(bucket_seconds) if _is_datetime(times) else 1.0
+    metrics = {
+        'total_return': total_return,
+        'return_percentage': float(total_return / portfolio_value * 100),
+        'max_drawdown': max_drawdown(equity),
+        'sharpe_ratio': sharpe_ratio(period_returns, annualization),
+        'sortino_ratio': sortino_ratio(period_returns, annualization),
+    }
+    metrics.update(trade_stats(trade_pnl))
+    return metrics
+
+
+def _window_sum(values: np.ndarray, window: int) -> np.ndarray:
+    """Trailing `window` sums, NaN until the window fills."""
+    out = np.full(len(values), np.nan)
+    if len(values) >= window:
+        csum = np.concatenate(([0.0], np.cumsum(values)))
+        out[window - 1:] = csum[window:] - csum[:-window]
+    return out
+
+
+def rolling_metrics(times, equity: np.ndarray, window: int,
+                    bucket_seconds: float = DEFAULT_BUCKET_SECONDS) -> pd.DataFrame:
+    """Sharpe, Sortino and drawdown over trailing `window` buckets of the equity curve.
+
+    Drawdown here is from the highest equity inside the window, not the all-time peak.
+    """
+    samples = sample_equity(times, equity, bucket_seconds)
+    period_returns = np.concatenate(([np.nan], returns(samples)))
+    finite = np.where(np.isfinite(period_returns), period_returns, 0.0)
+    annualization = np.sqrt(periods_per_year(bucket_seconds) if _is_datetime(times) else 1.0)
+
+    # one prefix sum pass per moment; windows start at the second sample, the first has no return
+    total = _window_sum(finite, window)
+    squares = _window_sum(finite ** 2, window)
+    downside = _window_sum(np.minimum(finite, 0) ** 2, window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = total / window
+        std = np.sqrt(np.maximum(squares - total * mean, 0) / (window - 1))
+        sharpe = np.where(std > 0, mean / std * annualization, 0.0)
+        sortino = np.where(downside > 0, mean / np.sqrt(downside / window) * annualization, 0.0)
+    sharpe[:window] = np.nan
+    sortino[:window] = np.nan
+
+    peak = pd.Series(samples).rolling(window + 1, min_periods=1).max().to_numpy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        window_drawdown = np.where(peak > 0, samples / peak - 1, 0.0) * 100
+
+    frame = pd.DataFrame({
+        'equity': samples,
+        'return': period_returns,
+        'drawdown': drawdown(samples) * 100,
+        'rolling_sharpe': sharpe,
+        'rolling_sortino': sortino,
+        'rolling_drawdown': window_drawdown,
+    })
+    if len(samples) and _is_datetime(times):
+        start = np.asarray(times)[0].astype('datetime64[ns]')
+        frame.index = pd.DatetimeIndex(start + np.arange(len(samples)) * np.timedelta64(int(bucket_seconds * 1e9), 'ns'))
+    return frame
+
+
+def rolling_trade_metrics(trade_pnl: np.ndarray, window: int) -> pd.DataFrame:
+    """Win rate and profit factor over the last `window` trades, one row per trade."""
+    trade_pnl = np.asarray(trade_pnl, dtype=np.float64)
+    wins = _window_sum((trade_pnl > 0).astype(np.float64), window)
+    gross_profit = _window_sum(np.maximum(trade_pnl, 0), window)
+    gross_loss = -_window_sum(np.minimum(trade_pnl, 0), window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        profit_factor = np.where(gross_loss > 0, gross_profit / gross_loss,
+                                 np.where(gross_profit > 0, np.inf, 0.0))
+    profit_factor[np.isnan(wins)] = np.nan
+    return pd.DataFrame({
+        'pnl': trade_pnl,
+        'rolling_win_rate': wins / window * 100,
+        'rolling_profit_factor': profit_factor,
+    })
+
+
+def ledger_pnl(pnl_df: pd.DataFrame) -> np.ndarray:
+    """Per-trade PnL recovered from a pnl frame's realized column, for when the ledger itself is gone.
+
+    Trades closed on the same row merge into one.
+    """
+    if 'realized_pnl' not in pnl_df.columns or pnl_df.empty:
+        return np.empty(0)
+    realized = pnl_df['realized_pnl'].to_numpy(dtype=np.float64)
+    steps = np.diff(realized, prepend=0.0)
+    return steps[steps != 0]
+
+
+def pnl_frame_metrics(pnl_df: pd.DataFrame, trades: Optional[pd.DataFrame] = None,
+                      portfolio_value: float = 1_000_000,
+                      bucket_seconds: float = DEFAULT_BUCKET_SECONDS) -> Dict[str, float]:
+    """compute_metrics for a BacktestEngine pnl frame and its ledger.
+
+    Frames without an equity column are taken as open PnL on top of `portfolio_value`, and an
+    empty frame (a run over no rows) gets all-zero metrics.
+    """
+    if pnl_df.empty:
+        return compute_metrics(np.empty(0, dtype='datetime64[ns]'), np.empty(0), np.empty(0), portfolio_value, bucket_seconds)
+    if 'equity' in pnl_df.columns:
+        equity = pnl_df['equity'].to_numpy(dtype=np.float64)
+        if len(equity):  # the frame knows its own starting capital
+            portfolio_value = equity[0] - pnl_df['realized_pnl'].iloc[0] - pnl_df['pnl'].iloc[0]
+    else:
+        equity = portfolio_value + pnl_df['pnl'].to_numpy(dtype=np.float64)
+    trade_pnl = trades['pnl'].to_numpy(dtype=np.float64) if trades is not None else ledger_pnl(pnl_df)
+    return compute_metrics(pnl_df['timestamp'].to_numpy(), equity, trade_pnl, portfolio_value, bucket_seconds)
@@ -1,143 +1,219 @@
 import pandas as pd
-import numpy as np
 from typing import Optional, Tuple, Dict
-from dataclasses import dataclass
-
-
-@dataclass
-class Position:
-    entry_price: float
-    size: int
-    entry_time: pd.Timestamp
-    stop_loss: float
-    take_profit: float
+from backtest_engine import BacktestEngine
+from position_book import PositionBook
+from trading_metrics import pnl_frame_metrics
+
+
+class IndicatorCache:
+    """Indicator series for one market data frame, each computed once on first use.
+
+    Keyed by what a series depends on (kind + windows), so strategies with different
+    parameters that share a cache only compute the series that actually differ.
+    """
+
+    def __init__(self, market_data: pd.DataFrame):
+        self.market_data = market_data
+        self._series: Dict[tuple, object] = {}
+
+    def _get(self, key: tuple, compute):
+        if key not in self._series:
+            self._series[key] = compute()
+        return self._series[key]
+
+    def mid_price(self) -> pd.Series:
+        return self._get(('mid_price',), lambda: (self.market_data['bidPrice'] + self.market_data['askPrice']) / 2)
+
+    def sma(self, window: int) -> pd.Series:
+        return self._get(('sma', window), lambda: self.mid_price().rolling(window=window).mean())
+
+    def std(self, window: int) -> pd.Series:
+        return self._get(('std', window), lambda: self.mid_price().rolling(window=window).std())
+
+    def volume_ratio(self) -> pd.Series:
+        return self._get(('volume_ratio',), lambda: self.market_data['bidVolume'] / self.market_data['askVolume'])
+
+    def volume_sma(self, window: int) -> pd.Series:
+        return self._get(('volume_sma', window), lambda: self.volume_ratio().rolling(window=window).mean())
+
+    def true_range(self) -> pd.Series:
+        def compute():
+            high = self.market_data['askPrice']
+            low = self.market_data['bidPrice']
+            close = self.mid_price()
+            tr1 = high - low
+            tr2 = abs(high - close.shift())
+            tr3 = abs(low - close.shift())
+            return pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
+        return self._get(('true_range',), compute)
+
+    def atr(self, period: int) -> pd.Series:
+        """Average True Range."""
+        return self._get(('atr', period), lambda: self.true_range().rolling(window=period).mean())
+
+    def atr_baseline(self, period: int, window: int) -> pd.Series:
+        return self._get(('atr_baseline', period, window), lambda: self.atr(period).rolling(window).mean())
+
+    def bollinger_bands(self, period: int, width: float) -> Tuple[pd.Series, pd.Series]:
+        """Bollinger Bands, (upper, lower)."""
+        def compute():
+            sma = self.sma(period)
+            std = self.std(period)
+            return sma + (std * width), sma - (std * width)
+        return self._get(('bollinger', period, width), compute)
+
+    def rsi(self, period: int) -> pd.Series:
+        """Relative Strength Index."""
+        def compute():
+            delta = self._get(('delta',), lambda: self.mid_price().diff())
+            gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
+            loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
+            rs = gain / loss
+            return 100 - (100 / (1 + rs))
+        return self._get(('rsi', period), compute)
+
+    def ema(self, span: int) -> pd.Series:
+        return self._get(('ema', span), lambda: self.mid_price().ewm(span=span, adjust=False).mean())
+
+    def macd(self, fast: int, slow: int, signal: int) -> Tuple[pd.Series, pd.Series]:
+        """MACD and Signal line."""
+        macd = self._get(('macd', fast, slow), lambda: self.ema(fast) - self.ema(slow))
+        return macd, self._get(('macd_signal', fast, slow, signal),
+                               lambda: macd.ewm(span=signal, adjust=False).mean())
+
+    def book_imbalance(self) -> pd.Series:
+        def compute():
+            bid_volume = self.market_data['bidVolume']
+            ask_volume = self.market_data['askVolume']
+            return (bid_volume - ask_volume) / (bid_volume + ask_volume)
+        return self._get(('book_imbalance',), compute)
+
+    def imbalance_sma(self, window: int) -> pd.Series:
+        return self._get(('imbalance_sma', window), lambda: self.book_imbalance().rolling(window=window).mean())
 
 
 class TradingStrategy:
-    def __init__(self):
-        self.RISK_PER_TRADE = 0.02  # 2% risk per trade
-        self.MAX_POSITIONS = 3  # Maximum concurrent positions
-        self.MIN_RR_RATIO = 2.0  # Minimum risk-reward ratio
-        self.positions: Dict[str, Position] = {}
-
-    def calculate_signals(self, market_data: pd.DataFrame) -> pd.DataFrame:
-        """Calculate trading signals using multiple technical indicators."""
+    def __init__(self, risk_per_trade: float = 0.02, max_positions: int = 3, min_rr_ratio: float = 2.0,
+                 sma_short: int = 20, sma_long: int = 50, volume_window: int = 20,
+                 atr_period: int = 14, atr_baseline: int = 100,
+                 bollinger_period: int = 20, bollinger_width: float = 2.0,
+                 rsi_period: int = 14, rsi_long_low: float = 40, rsi_long_high: float = 70,
+                 rsi_short_low: float = 30, rsi_short_high: float = 60,
+                 macd_fast: int = 12, macd_slow: int = 26, macd_signal: int = 9,
+                 imbalance_window: int = 10, imbalance_threshold: float = 0.2,
+                 portfolio_value: float = 1_000_000):
+        self.RISK_PER_TRADE = risk_per_trade  # 2% risk per trade
+        self.MAX_POSITIONS = max_positions  # Maximum concurrent positions
+        self.MIN_RR_RATIO = min_rr_ratio  # Minimum risk-reward ratio
+        self.PORTFOLIO_VALUE = portfolio_value  # Initial portfolio value (why do we have this also set in the market data viewer?)
+
+        # Indicator windows
+        self.SMA_SHORT = sma_short
+        self.SMA_LONG = sma_long
+        self.VOLUME_WINDOW = volume_window
+        self.ATR_PERIOD = atr_period
+        self.ATR_BASELINE = atr_baseline
+        self.BOLLINGER_PERIOD = bollinger_period
+        self.BOLLINGER_WIDTH = bollinger_width
+        self.RSI_PERIOD = rsi_period
+        self.MACD_FAST = macd_fast
+        self.MACD_SLOW = macd_slow
+        self.MACD_SIGNAL = macd_signal
+        self.IMBALANCE_WINDOW = imbalance_window
+
+        # Entry thresholds
+        self.RSI_LONG_RANGE = (rsi_long_low, rsi_long_high)
+        self.RSI_SHORT_RANGE = (rsi_short_low, rsi_short_high)
+        self.IMBALANCE_THRESHOLD = imbalance_threshold  # long above +threshold, short below -threshold
+
+        self.positions = PositionBook(max(max_positions, 1))
+        self.trades = pd.DataFrame()  # ledger of the positions closed by the last calculate_pnl
+
+    def calculate_signals(self, market_data: pd.DataFrame,
+                          indicators: Optional[IndicatorCache] = None) -> pd.DataFrame:
+        """Calculate trading signals using multiple technical indicators.
+
+        Pass an IndicatorCache built on the same market_data to reuse series across strategies.
+        """
+        if indicators is None:
+            indicators = IndicatorCache(market_data)
         df = market_data.copy()
 
-        # Price action indicators
-        df['mid_price'] = (df['bidPrice'] + df['askPrice']) / 2
-        df['price_sma_20'] = df['mid_price'].rolling(window=20).mean()
-        df['price_sma_50'] = df['mid_price'].rolling(window=50).mean()
+        # Price action indicators (column names are fixed, whatever the windows)
+        df['mid_price'] = indicators.mid_price()
+        df['price_sma_20'] = indicators.sma(self.SMA_SHORT)
+        df['price_sma_50'] = indicators.sma(self.SMA_LONG)
 
         # Volume analysis
-        df['volume_ratio'] = df['bidVolume'] / df['askVolume']
-        df['volume_sma'] = df['volume_ratio'].rolling(window=20).mean()
+        df['volume_ratio'] = indicators.volume_ratio()
+        df['volume_sma'] = indicators.volume_sma(self.VOLUME_WINDOW)
 
         # Volatility indicators
-        df['atr'] = self._calculate_atr(df, period=14)
-        df['bollinger_upper'], df['bollinger_lower'] = self._calculate_bollinger_bands(df, period=20)
+        df['atr'] = indicators.atr(self.ATR_PERIOD)
+        df['bollinger_upper'], df['bollinger_lower'] = indicators.bollinger_bands(self.BOLLINGER_PERIOD,
+                                                                                   self.BOLLINGER_WIDTH)
 
         # Momentum indicators
-        df['rsi'] = self._calculate_rsi(df, period=14)
-        df['macd'], df['macd_signal'] = self._calculate_macd(df)
+        df['rsi'] = indicators.rsi(self.RSI_PERIOD)
+        df['macd'], df['macd_signal'] = indicators.macd(self.MACD_FAST, self.MACD_SLOW, self.MACD_SIGNAL)
 
         # Order book imbalance
-        df['book_imbalance'] = (df['bidVolume'] - df['askVolume']) / (df['bidVolume'] + df['askVolume'])
-        df['imbalance_sma'] = df['book_imbalance'].rolling(window=10).mean()
+        df['book_imbalance'] = indicators.book_imbalance()
+        df['imbalance_sma'] = indicators.imbalance_sma(self.IMBALANCE_WINDOW)
 
         # Generate trading signals
-        df['long_signal'] = self._generate_long_signals(df)
-        df['short_signal'] = self._generate_short_signals(df)
+        atr_baseline = indicators.atr_baseline(self.ATR_PERIOD, self.ATR_BASELINE)
+        df['long_signal'] = self._generate_long_signals(df, atr_baseline)
+        df['short_signal'] = self._generate_short_signals(df, atr_baseline)
 
         return df
 
-    def _calculate_atr(self, df: pd.DataFrame, period: int = 14) -> pd.Series:
-        """Calculate Average True Range."""
-        high = df['askPrice']
-        low = df['bidPrice']
-        close = df['mid_price']
-
-        tr1 = high - low
-        tr2 = abs(high - close.shift())
-        tr3 = abs(low - close.shift())
-
-        tr = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
-        atr = tr.rolling(window=period).mean()
-
-        return atr
-
-    def _calculate_bollinger_bands(self, df: pd.DataFrame, period: int = 20) -> Tuple[pd.Series, pd.Series]:
-        """Calculate Bollinger Bands."""
-        sma = df['mid_price'].rolling(window=period).mean()
-        std = df['mid_price'].rolling(window=period).std()
-
-        upper_band = sma + (std * 2)
-        lower_band = sma - (std * 2)
-
-        return upper_band, lower_band
-
-    def _calculate_rsi(self, df: pd.DataFrame, period: int = 14) -> pd.Series:
-        """Calculate Relative Strength Index."""
-        delta = df['mid_price'].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
-
-        rs = gain / loss
-        rsi = 100 - (100 / (1 + rs))
-
-        return rsi
-
-    def _calculate_macd(self, df: pd.DataFrame) -> Tuple[pd.Series, pd.Series]:
-        """Calculate MACD and Signal line."""
-        exp1 = df['mid_price'].ewm(span=12, adjust=False).mean()
-        exp2 = df['mid_price'].ewm(span=26, adjust=False).mean()
-        macd = exp1 - exp2
-        signal = macd.ewm(span=9, adjust=False).mean()
-
-        return macd, signal
-
-    def _generate_long_signals(self, df: pd.DataFrame) -> pd.Series:
+    def _generate_long_signals(self, df: pd.DataFrame, atr_baseline: Optional[pd.Series] = None) -> pd.Series:
         """Generate long entry signals based on multiple conditions."""
+        if atr_baseline is None:
+            atr_baseline = df['atr'].rolling(self.ATR_BASELINE).mean()
         return (
             # Trend conditions
                 (df['price_sma_20'] > df['price_sma_50']) &
                 (df['mid_price'] > df['price_sma_20']) &
 
                 # Momentum conditions
-                (df['rsi'] > 40) & (df['rsi'] < 70) &
+                (df['rsi'] > self.RSI_LONG_RANGE[0]) & (df['rsi'] < self.RSI_LONG_RANGE[1]) &
                 (df['macd'] > df['macd_signal']) &
 
                 # Volume conditions
                 (df['volume_ratio'] > df['volume_sma']) &
 
                 # Order book conditions
-                (df['book_imbalance'] > 0.2) &
+                (df['book_imbalance'] > self.IMBALANCE_THRESHOLD) &
 
                 # Volatility conditions
                 (df['mid_price'] > df['bollinger_lower']) &
-                (df['atr'] > df['atr'].rolling(100).mean())
+                (df['atr'] > atr_baseline)
         )
 
-    def _generate_short_signals(self, df: pd.DataFrame) -> pd.Series:
+    def _generate_short_signals(self, df: pd.DataFrame, atr_baseline: Optional[pd.Series] = None) -> pd.Series:
         """Generate short entry signals based on multiple conditions."""
+        if atr_baseline is None:
+            atr_baseline = df['atr'].rolling(self.ATR_BASELINE).mean()
         return (
             # Trend conditions
                 (df['price_sma_20'] < df['price_sma_50']) &
                 (df['mid_price'] < df['price_sma_20']) &
 
                 # Momentum conditions
-                (df['rsi'] < 60) & (df['rsi'] > 30) &
+                (df['rsi'] < self.RSI_SHORT_RANGE[1]) & (df['rsi'] > self.RSI_SHORT_RANGE[0]) &
                 (df['macd'] < df['macd_signal']) &
 
                 # Volume conditions
                 (df['volume_ratio'] < df['volume_sma']) &
 
                 # Order book conditions
-                (df['book_imbalance'] < -0.2) &
+                (df['book_imbalance'] < -self.IMBALANCE_THRESHOLD) &
 
                 # Volatility conditions
                 (df['mid_price'] < df['bollinger_upper']) &
-                (df['atr'] > df['atr'].rolling(100).mean())
+                (df['atr'] > atr_baseline)
         )
 
     def calculate_position_size(self, price: float, stop_loss: float, portfolio_value: float) -> int:
@@ -173,112 +249,28 @@ class TradingStrategy:
 
     def update_positions(self, current_price: float, timestamp: pd.Timestamp) -> None:
         """Update positions and check for exits."""
-        closed_positions = []
-
-        for symbol, position in self.positions.items():
-            # Check stop loss
-            if position.size > 0:  # Long position
-                if current_price <= position.stop_loss:
-                    closed_positions.append(symbol)
-                elif current_price >= position.take_profit:
-                    closed_positions.append(symbol)
-            else:  # Short position
-                if current_price >= position.stop_loss:
-                    closed_positions.append(symbol)
-                elif current_price <= position.take_profit:
-                    closed_positions.append(symbol)
-
-        # Remove closed positions
-        for symbol in closed_positions:
-            del self.positions[symbol]
-
-    def calculate_pnl(self, market_data: pd.DataFrame) -> pd.DataFrame:
+        self.positions.close_triggered(current_price)
+
+    def unrealized_pnl(self, current_price: float) -> float:
+        """Mark-to-market PnL of every open position."""
+        return self.positions.mark_to_market(current_price)
+
+    def calculate_pnl(self, market_data: pd.DataFrame,
+                      indicators: Optional[IndicatorCache] = None) -> pd.DataFrame:
         """Calculate PnL based on trading signals and positions."""
-        signals_df = self.calculate_signals(market_data)
-        portfolio_value = 1_000_000  # Initial portfolio value (why do we have this also set in the market data viewer?)
-        pnl_records = []
-
-        for i in range(len(signals_df)):
-            current_price = signals_df['mid_price'].iloc[i]
-            timestamp = signals_df.index[i]
-
-            # Update existing positions
-            self.update_positions(current_price, timestamp)
-
-            # Check for new entries
-            if len(self.positions) < self.MAX_POSITIONS:
-                if signals_df['long_signal'].iloc[i]:
-                    stop_loss = self.calculate_stop_loss(signals_df, i, True)
-                    size = self.calculate_position_size(current_price, stop_loss, portfolio_value)
-                    take_profit = self.calculate_take_profit(current_price, stop_loss, True)
-
-                    self.positions[f'long_{timestamp}'] = Position(
-                        entry_price=current_price,
-                        size=size,
-                        entry_time=timestamp,
-                        stop_loss=stop_loss,
-                        take_profit=take_profit
-                    )
-
-                elif signals_df['short_signal'].iloc[i]:
-                    stop_loss = self.calculate_stop_loss(signals_df, i, False)
-                    size = self.calculate_position_size(current_price, stop_loss, portfolio_value)
-                    take_profit = self.calculate_take_profit(current_price, stop_loss, False)
-
-                    self.positions[f'short_{timestamp}'] = Position(
-                        entry_price=current_price,
-                        size=-size,  # Negative size for short positions
-                        entry_time=timestamp,
-                        stop_loss=stop_loss,
-                        take_profit=take_profit
-                    )
-
-            # Calculate current PnL
-            total_pnl = sum(
-                position.size * (current_price - position.entry_price)
-                for position in self.positions.values()
-            )
-
-            pnl_records.append({
-                'timestamp': timestamp,
-                'pnl': total_pnl,
-                'pnl_percentage': (total_pnl / portfolio_value) * 100
-            })
-
-        return pd.DataFrame(pnl_records)
-
-
-def calculate_trading_metrics(pnl_df: pd.DataFrame) -> Dict[str, float]:
-    """Calculate trading performance metrics."""
-    metrics = {
-        'total_return': pnl_df['pnl'].iloc[-1],
-        'return_percentage': pnl_df['pnl_percentage'].iloc[-1],
-        'max_drawdown': calculate_max_drawdown(pnl_df['pnl']),
-        'sharpe_ratio': calculate_sharpe_ratio(pnl_df['pnl_percentage']),
-        'win_rate': calculate_win_rate(pnl_df['pnl'])
-    }
-    return metrics
-
-
-def calculate_max_drawdown(pnl: pd.Series) -> float:
-    """Calculate maximum drawdown."""
-    cumulative = pnl.cumsum()
-    running_max = cumulative.expanding().max()
-    drawdown = (cumulative - running_max) / running_max * 100
-    return abs(drawdown.min())
-
-
-def calculate_sharpe_ratio(returns: pd.Series) -> float:
-    """Calculate Sharpe ratio."""
-    returns_std = returns.std()
-    if returns_std == 0:
-        return 0
-    return (returns.mean() / returns_std) * np.sqrt(252)  # Annualized
-
-
-def calculate_win_rate(pnl: pd.Series) -> float:
-    """Calculate win rate."""
-    trades = pnl.diff().dropna()
-    winning_trades = (trades > 0).sum()
-    total_trades = len(trades)
-    return (winning_trades / total_trades * 100) if total_trades > 0 else 0
\ No newline at end of file
+        signals_df = self.calculate_signals(market_data, indicators)
+
+        engine = BacktestEngine(self, self.PORTFOLIO_VALUE)
+        pnl_df, remaining = engine.run(signals_df, self.positions.to_tuples())
+        self.trades = engine.trades
+
+        self.positions = PositionBook.from_tuples(remaining, max(self.MAX_POSITIONS, 1))
+        return pnl_df
+
+
+def calculate_trading_metrics(pnl_df: pd.DataFrame, trades: Optional[pd.DataFrame] = None) -> Dict[str, float]:
+    """Calculate trading performance metrics from the equity curve and the trade ledger.
+
+    Without the ledger (`strategy.trades`), trades are read off the realized PnL column.
+    """
+    return pnl_frame_metrics(pnl_df, trades)